@@ -1,5 +1,5 @@
 from auth import AuthUser
-from core.config.settings import settings
+from core.dependencies import get_app_config_service
 from entity.base import BaseResponse
 from fastapi import APIRouter, Depends, Query
 from typing import Optional
@@ -14,12 +14,11 @@ async def get_config_by_key(
     token: AuthUser,
     key: str = Query(..., description="key"),
     version: Optional[str] = Query(None, description="vesion, optional"),
+    config_service: AppConfigService = Depends(get_app_config_service),
 ):
     """
     根据key获取配置, 支持带版本和不带版本
     """
-    base_url = settings.external.WHALE_URL
-    config_service = AppConfigService(base_url)
     result = await config_service.get_config_by_key(key, version)
     resp = BaseResponse.success(result)
     return resp
\ No newline at end of file
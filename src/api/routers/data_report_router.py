@@ -1,12 +1,11 @@
 from core.middleware import skip_client_verification_for_router
-from fastapi import APIRouter, BackgroundTasks, Request
+from fastapi import APIRouter, Request
 from typing import List
 from loguru import logger
-from core.rabbitmq import RabbitMQClient
+from core.error_code import ErrorCode
 from entity.base import BaseResponse
 from entity.data_track import TrackEventRequest
-
-rabbitmq = RabbitMQClient()
+from services.tracking_publisher import get_tracking_publisher
 
 api_router = skip_client_verification_for_router(
     APIRouter(prefix="/data", tags=["auth"])
@@ -29,9 +28,7 @@ def get_client_ip(request: Request) -> str:
 
 
 @api_router.post("/tracking")
-async def tracking_events(
-    events: List[TrackEventRequest], background_tasks: BackgroundTasks, request: Request
-):
+async def tracking_events(events: List[TrackEventRequest], request: Request):
     client_ip = get_client_ip(request)
     for event in events:
         if event.extra is None:
@@ -41,5 +38,10 @@ async def tracking_events(
     logger.info(
         f"Received data tracking request, event details: {[event.model_dump() for event in events]}"
     )
-    background_tasks.add_task(rabbitmq.publish_events, events)
+    # 事件进入发布器的内存队列，由后台批量发布；队列满时返回 503 让客户端退避重试
+    if not get_tracking_publisher().offer(events):
+        logger.warning(f"Tracking queue full, rejected {len(events)} events")
+        response = BaseResponse.error_with_status(ErrorCode.TRACKING_QUEUE_FULL, 503)
+        response.headers["Retry-After"] = "1"
+        return response
     return BaseResponse.success("OK")
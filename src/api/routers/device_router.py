@@ -3,11 +3,14 @@
 # @File    : device_router.py
 from sys import prefix
 
-from fastapi import APIRouter, Path, Body
+from typing import List
+
+from fastapi import APIRouter, Path, Body, Query
 from loguru import logger
 from core.config.settings import settings
 from auth import AuthUser
 from db_wrapper import DB_SESSION
+from core.error_code import ErrorCode
 from entity.base import BaseResponse
 from entity.devices import (
     UnbindDeviceRequest,
@@ -42,6 +45,20 @@ async def update_device(
     return BaseResponse.success(result)
 
 
+@device_router.get("/states")
+async def get_device_states(
+    db: DB_SESSION,
+    token: AuthUser,
+    device_ids: List[str] = Query(..., title="device ids"),
+):
+    """批量获取当前用户已绑定设备的在线状态和最后上报的状态，设备列表一次请求渲染"""
+    if len(device_ids) > settings.device_status.MAX_BATCH:
+        return BaseResponse.fail(ErrorCode.DEVICE_BATCH_TOO_LARGE)
+    service = DeviceService(token, db=db)
+    result = await service.get_device_states(device_ids)
+    return BaseResponse.success(result)
+
+
 @device_router.get("/{device_id}")
 async def get_device_info(
     db: DB_SESSION,
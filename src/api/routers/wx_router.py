@@ -16,11 +16,17 @@ from loguru import logger
 from typing import Dict, Any
 
 from entity.base import BaseResponse
-from entity.user import SendTemplateMessageRequest, SendTemplateMessageByUserRequest, SendTemplateMessageByChildRequest, TemplateMessageResponse
+from entity.user import SendTemplateMessageRequest, SendTemplateMessageByUserRequest, SendTemplateMessageByChildRequest, TemplateMessageResponse, BroadcastTemplateMessageRequest
+from entity.weixin import ContentSecurityBatchCheckRequest
+from package.wechat_xml.parser import WechatXmlError, parse_wechat_event
 from services.weixin import WechatService
+from services.wechat_event import WechatEventDispatcher, get_wechat_event_pipeline
+from services.wechat_dedup import get_wechat_event_deduplicator
+from services.wechat_broadcast import BroadcastStatus, TemplateBroadcastEngine, run_broadcast_in_background
 from core.middleware import skip_client_verification_for_router
 from core.error_code import ErrorCode
 from db_wrapper import DB_SESSION
+from auth import AuthUser
 
 # Create router and mark as skip client verification
 wx_router = skip_client_verification_for_router(APIRouter(prefix="/wx", tags=["wechat_function"]))
@@ -60,63 +66,53 @@ async def wechat_webhook_verify(
 
 
 @wx_router.post("/webhook")
-async def wechat_webhook_event(request: Request, db: DB_SESSION):
-    """WeChat event push interface"""
+async def wechat_webhook_event(request: Request):
+    """WeChat event push interface
+
+    Replies "success" as soon as the event is enqueued; subscribe/unsubscribe/CLICK/text
+    events are processed asynchronously by the event pipeline workers, so the 5s callback
+    deadline no longer depends on DB or WeChat API latency.
+    """
     try:
         # Read XML data
         xml_data = await request.body()
-        xml_str = xml_data.decode('utf-8')
+        logger.opt(lazy=True).debug("Received WeChat push: {}", lambda: xml_data.decode('utf-8', 'replace'))
         
-        logger.info(f"Received WeChat push: {xml_str}")
+        # Parse XML (flat envelope fast path, no element tree)
+        wechat_event = parse_wechat_event(xml_data)
+        event_data = wechat_event.fields
         
-        # Parse XML
-        event_data = WechatService.parse_xml(xml_str)
+        msg_type = wechat_event.msg_type
+        event = wechat_event.event
         
-        msg_type = event_data.get('MsgType')
-        event = event_data.get('Event')
+        logger.info(f"Received WeChat push - type: {msg_type}, event: {event}, from: {wechat_event.from_user_name}")
         
-        logger.info(f"Message type: {msg_type}, event: {event}")
+        # WeChat retries unacknowledged pushes; replay the first response for retries
+        cached_response = await get_wechat_event_deduplicator().check_and_mark(event_data)
+        if cached_response is not None:
+            logger.info(f"Duplicate WeChat push skipped - type: {msg_type}, event: {event}, from: {event_data.get('FromUserName')}")
+            return PlainTextResponse(cached_response)
         
-        if msg_type == 'event':
-            if event == 'subscribe':
-                # User follow event
-                logger.info(f"User follow event: {event_data}")
-                service = WechatService(db)
-                result = await service.handle_follow_event(event_data)
-                return PlainTextResponse(result)
-            elif event == 'unsubscribe':
-                # User unfollow event
-                logger.info(f"User unfollow event: {event_data}")
-                service = WechatService(db)
-                result = await service.handle_unfollow_event(event_data)
-                return PlainTextResponse(result)
-            elif event == 'TEMPLATESENDJOBFINISH':
-                # Template message send completion event
-                logger.info(f"Template message send completion event: {event_data}")
-                msg_id = event_data.get('MsgID')
-                status = event_data.get('Status')
-                logger.info(f"Template message send completed - MsgID: {msg_id}, Status: {status}")
-                return PlainTextResponse("success")
-            elif event == 'CLICK':
-                # menu click event
-                logger.info(f"Menu click event: {event_data}")
-                service = WechatService(db)
-                result = await service.handle_click_event(event_data)
-                return PlainTextResponse(result)
-            else:
-                # Other events
-                logger.info(f"Other event: {event}")
-                return PlainTextResponse("success")
-        elif msg_type == 'text':
-            logger.info(f"Text message received: {event_data}")
-            service = WechatService(db)
-            result = await service.handle_text_message(event_data)
-            return PlainTextResponse(result)
+        if WechatEventDispatcher.should_dispatch(event_data):
+            try:
+                await get_wechat_event_pipeline().publish(event_data)
+            except Exception:
+                # Not enqueued: drop the dedup mark so WeChat's retry is processed instead of skipped
+                await get_wechat_event_deduplicator().unmark(event_data)
+                raise
+        elif msg_type == 'event' and event == 'TEMPLATESENDJOBFINISH':
+            # Template message send completion event
+            msg_id = event_data.get('MsgID')
+            status = event_data.get('Status')
+            logger.info(f"Template message send completed - MsgID: {msg_id}, Status: {status}")
         else:
-            # Other message types
-            logger.info(f"Other message type: {msg_type}")
-            return PlainTextResponse("success")
+            # Other events / message types
+            logger.info(f"Other message type: {msg_type}, event: {event}")
+        return PlainTextResponse("success")
             
+    except WechatXmlError as e:
+        logger.warning(f"Rejected malformed WeChat push: {e}")
+        return PlainTextResponse("fail", status_code=400)
     except Exception as e:
         logger.error(f"Failed to process WeChat push: {e}")
         return PlainTextResponse("fail", status_code=500)
@@ -183,6 +179,78 @@ async def send_template_message_by_user(
         return BaseResponse.fail(ErrorCode.TEMPLATE_MESSAGE_SERVICE_ERROR)
 
 
+@wx_router.post("/template/broadcast")
+async def broadcast_template_message(request: BroadcastTemplateMessageRequest):
+    """Broadcast template message to multiple users interface (runs in background)"""
+    logger.info(f"Broadcast template message interface - template_id: {request.template_id}, recipients: {len(request.user_ids)}")
+    try:
+        engine = TemplateBroadcastEngine()
+        job_id = await engine.create_job(
+            request.user_ids,
+            request.template_id,
+            {key: item.model_dump() for key, item in request.data.items()},
+            request.url,
+            request.miniprogram.model_dump() if request.miniprogram else None
+        )
+        run_broadcast_in_background(job_id, engine)
+        return BaseResponse.success({"job_id": job_id})
+
+    except Exception as e:
+        logger.error(f"Failed to create template broadcast job: {e}")
+        return BaseResponse.fail(ErrorCode.TEMPLATE_MESSAGE_SERVICE_ERROR)
+
+
+@wx_router.get("/template/broadcast/{job_id}")
+async def get_broadcast_template_message(job_id: str):
+    """Query template broadcast job progress interface"""
+    try:
+        job = await TemplateBroadcastEngine().get_job(job_id)
+        if job is None:
+            return BaseResponse.fail(ErrorCode.TEMPLATE_BROADCAST_JOB_NOT_FOUND)
+        return BaseResponse.success(job)
+
+    except Exception as e:
+        logger.error(f"Failed to query template broadcast job: {e}")
+        return BaseResponse.fail(ErrorCode.TEMPLATE_MESSAGE_SERVICE_ERROR)
+
+
+@wx_router.post("/template/broadcast/{job_id}/resume")
+async def resume_broadcast_template_message(job_id: str):
+    """Resume an interrupted template broadcast job interface"""
+    try:
+        engine = TemplateBroadcastEngine()
+        job = await engine.get_job(job_id)
+        if job is None:
+            return BaseResponse.fail(ErrorCode.TEMPLATE_BROADCAST_JOB_NOT_FOUND)
+        if await engine.is_running(job_id):
+            return BaseResponse.fail(ErrorCode.TEMPLATE_BROADCAST_JOB_RUNNING)
+        # 已完成且没有失败的接收者，无需恢复
+        if job.get("status") == "finished" and not job.get(BroadcastStatus.FAILED):
+            return BaseResponse.fail(ErrorCode.TEMPLATE_BROADCAST_JOB_FINISHED)
+        run_broadcast_in_background(job_id, engine)
+        return BaseResponse.success({"job_id": job_id})
+
+    except Exception as e:
+        logger.error(f"Failed to resume template broadcast job: {e}")
+        return BaseResponse.fail(ErrorCode.TEMPLATE_MESSAGE_SERVICE_ERROR)
+
+
+@wx_router.post("/content/security/batch")
+async def check_content_security_batch(
+    request: ContentSecurityBatchCheckRequest,
+    db: DB_SESSION,
+    token: AuthUser
+):
+    """Batch content security check interface, results keep the request order"""
+    service = WechatService(db)
+    results = await service.check_content_security_batch(
+        token.user_id,
+        request.items,
+        force_recheck=request.force_recheck
+    )
+    return BaseResponse.success(results)
+
+
 # @wx_router.post("/template/child")
 # async def send_template_message_by_child(
 #     request: SendTemplateMessageByChildRequest,
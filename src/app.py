@@ -13,11 +13,26 @@ from core.error_code import ErrorCode
 from core.config.settings import settings
 from contextlib import asynccontextmanager
 from api.router import api_router
-from core.middleware import ClientVerificationMiddleware
+from core.middleware import ClientVerificationMiddleware, DeadlineMiddleware
 from db_wrapper import async_engine
-from core.rabbitmq import RabbitMQClient
+from core.rabbitmq import close_rabbitmq, get_rabbitmq_manager
 from core.health_check import check_database_connection
 from package.redis.client import close_redis_connections
+from package.http.client import init_http_session, close_http_session
+from services.wechat_token import start_token_refreshers, stop_token_refreshers
+from services.wechat_event import start_wechat_event_pipeline, stop_wechat_event_pipeline
+from services.content_prefilter import init_content_prefilter
+from services.wechat_welcome import init_welcome_renderer
+from services.content_verdict_cache import get_content_verdict_cache
+from repositories.devices import get_device_cache
+from package.redis.near_cache import get_cache_invalidator, start_cache_invalidator, stop_cache_invalidator
+from services.wechat_qrcode import start_qrcode_prewarm, stop_qrcode_prewarm
+from services.wechat_menu import start_wechat_menu_sync, stop_wechat_menu_sync
+from services.wechat_unionid import start_unionid_resolver, stop_unionid_resolver
+from services.resilience import resilience_metrics
+from services.device_status import start_device_status_consumer, stop_device_status_consumer
+from services.tracking_publisher import get_tracking_publisher, start_tracking_publisher, stop_tracking_publisher
+from services.wechat_ratelimit import get_wechat_rate_limiter, get_wechat_retry_queue, start_wechat_retry_worker, stop_wechat_retry_worker
 
 
 logger.remove()
@@ -40,8 +55,49 @@ logger.add(
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    logger.info("Initializing HTTP client session...")
+    await init_http_session()
+    logger.info("Building content security pre-filter...")
+    init_content_prefilter()
+    logger.info("Pre-compiling welcome messages...")
+    init_welcome_renderer()
+    logger.info("Starting WeChat access_token refreshers...")
+    await start_token_refreshers()
+    logger.info("Starting WeChat event pipeline...")
+    await start_wechat_event_pipeline()
+    logger.info("Starting WeChat retry queue worker...")
+    await start_wechat_retry_worker()
+    logger.info("Pre-warming WeChat QR code cache...")
+    await start_qrcode_prewarm()
+    logger.info("Starting WeChat menu sync...")
+    await start_wechat_menu_sync()
+    logger.info("Starting service user unionid resolver...")
+    await start_unionid_resolver()
+    logger.info("Starting data tracking publisher...")
+    await start_tracking_publisher()
+    logger.info("Starting device status consumer...")
+    await start_device_status_consumer()
+    logger.info("Subscribing near cache invalidation...")
+    await start_cache_invalidator()
     yield
     logger.info("Shutting down connections...")
+    await stop_cache_invalidator()
+    await stop_device_status_consumer()
+    await stop_tracking_publisher()
+    await stop_unionid_resolver()
+    await stop_wechat_menu_sync()
+    await stop_qrcode_prewarm()
+    logger.info("Stopping WeChat event pipeline...")
+    await stop_wechat_event_pipeline()
+    logger.info("Stopping WeChat retry queue worker...")
+    await stop_wechat_retry_worker()
+    logger.info("Stopping WeChat access_token refreshers...")
+    await stop_token_refreshers()
+    logger.info("Closing RabbitMQ connection...")
+    await close_rabbitmq()
+    logger.info("Closing HTTP client session...")
+    await close_http_session()
+    logger.info("HTTP client session closed.")
     logger.info("Closing Redis connections...")
     await close_redis_connections()
     logger.info("Redis connections closed.")
@@ -80,6 +136,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(DeadlineMiddleware)
+
 if settings.api.ENABLE_CLIENT_VERIFICATION:
     app.add_middleware(ClientVerificationMiddleware)
 
@@ -115,6 +173,50 @@ async def health_database():
         )
 
 
+
+@app.get("/health/ratelimit")
+async def health_ratelimit():
+    """
+    微信接口限流指标：按接口统计当前速率、吞吐、限流 / 等待 / 重试 / 丢弃次数
+    """
+    content = {"endpoints": get_wechat_rate_limiter().metrics()}
+    try:
+        content["retry_queue_size"] = await get_wechat_retry_queue().size()
+    except Exception as e:
+        logger.warning(f"Failed to read WeChat retry queue size: {e}")
+        content["retry_queue_size"] = None
+    return content
+
+
+@app.get("/health/cache")
+async def health_cache():
+    """
+    缓存命中统计
+    """
+    verdict_cache = get_content_verdict_cache()
+    device_cache = get_device_cache()
+    return {
+        "content_verdict": verdict_cache.stats() if verdict_cache is not None else None,
+        "device_info": device_cache.stats() if device_cache is not None else None,
+        "near_cache": get_cache_invalidator().metrics(),
+    }
+
+
+@app.get("/health/dependencies")
+async def health_dependencies():
+    """
+    外部依赖熔断 / 舱壁状态：熔断器状态、连续失败、在途调用数、拒绝 / 超时 / 降级次数，以及 RabbitMQ 连接 / channel 池状态
+    """
+    return {"dependencies": resilience_metrics(), "rabbitmq": get_rabbitmq_manager().snapshot()}
+
+
+@app.get("/health/tracking")
+async def health_tracking():
+    """
+    埋点发布器状态：队列占用（背压）、发布 / 拒绝 / 失败数、平均批大小
+    """
+    return get_tracking_publisher().metrics()
+
 if __name__ == '__main__':
     uvicorn.run(app, 
                 host=settings.server.HOST, 
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 # @File    : settings.py
 
-from typing import List
+from typing import Dict, List
 import json
 
 from pydantic_settings import BaseSettings
@@ -70,6 +70,10 @@ class WeChat(BaseSettings):
     # 禁用微信内容安全验证
     DISABLE_WECHAT_CONTENT_SECURITY_CHECK: bool = False
 
+    # 模板消息群发：发送速率（条/秒）与并发数
+    TEMPLATE_BROADCAST_RATE: float = 50
+    TEMPLATE_BROADCAST_CONCURRENCY: int = 20
+
     class Config:
         env_prefix = "WECHAT_"
 
@@ -120,6 +124,25 @@ class RabbitMQConfig(BaseSettings):
     DATA_TRACKING_EXCHANGE: str = "data_tracking_prod"
     DATA_TRACKING_QUEUE: str = "data_tracking_queue_prod"
     USER_INTERACTION_QUEUE: str = "user_interaction_queue_prod"
+    WECHAT_EVENT_QUEUE: str = "wechat_event_queue_prod"  # 公众号推送事件队列
+    WECHAT_EVENT_WORKERS: int = 8  # 事件处理并发数（按 openid 分片保证顺序）
+    WECHAT_EVENT_PREFETCH: int = 64  # 消费者预取数量
+    WECHAT_EVENT_RECONNECT_DELAY: float = 5.0  # broker 不可用时重试订阅事件队列的间隔（秒）
+    TRACKING_QUEUE_SIZE: int = 10000  # 埋点事件内存队列容量，满时接口返回 503 由客户端退避重试
+    TRACKING_BATCH_SIZE: int = 200  # 单批最多发布的事件数
+    TRACKING_LINGER_MS: int = 50  # 凑批最长等待时间（毫秒）
+    TRACKING_PUBLISH_RETRIES: int = 3  # 单批发布失败的重试次数
+    TRACKING_FORMAT: str = "json"  # 埋点消息格式：json（每条事件一条消息）/ protobuf（一批事件一条消息，需下游先支持）
+    TRACKING_COMPRESSION: str = ""  # protobuf 批量消息的压缩：空 / gzip / zstd（需安装 zstandard）
+    TRACKING_SPILL_DIR: str = "./spill/tracking"  # broker 不可用时埋点事件的落盘目录
+    TRACKING_SPILL_MAX_BYTES: int = 512 * 1024 * 1024  # 落盘总上限，超出后丢弃最旧的段
+    TRACKING_SPILL_SEGMENT_BYTES: int = 8 * 1024 * 1024  # 单个段文件大小
+    TRACKING_REPLAY_INTERVAL: float = 5.0  # 落盘事件回放检查间隔（秒）
+    TRACKING_REPLAY_BATCH: int = 500  # 单次回放的事件数
+    CONNECT_TIMEOUT: float = 5.0  # 建立连接超时（秒）
+    RECONNECT_BACKOFF: float = 5.0  # 连接失败后在此时间内直接失败，避免重连风暴（秒）
+    CHANNEL_POOL_SIZE: int = 4  # 发布用 channel 池大小
+    CLOSE_DRAIN_TIMEOUT: float = 5.0  # 关闭连接前等待进行中发布完成的时间（秒）
 
     class Config:
         env_prefix = "RABBITMQ_"
@@ -171,6 +194,165 @@ class ShareConfig(BaseSettings):
         env_prefix = "SHARE_"
 
 
+class HttpClientConfig(BaseSettings):
+    """出站 HTTP 客户端（aiohttp 连接池）配置"""
+    LIMIT: int = 200  # 连接池总连接数
+    LIMIT_PER_HOST: int = 50  # 单个 host 最大连接数
+    DNS_CACHE_TTL: int = 300  # DNS 缓存时间（秒）
+    KEEPALIVE_TIMEOUT: int = 30  # 空闲长连接保持时间（秒）
+    TOTAL_TIMEOUT: float = 15  # 单次请求总超时（秒）
+    CONNECT_TIMEOUT: float = 5  # 建连超时（秒）
+    SOCK_READ_TIMEOUT: float = 10  # 读超时（秒）
+
+    class Config:
+        env_prefix = "HTTP_CLIENT_"
+
+
+class WechatRateLimitConfig(BaseSettings):
+    """微信接口自适应限流（AIMD）与重试队列配置"""
+    ENABLED: bool = True
+    MAX_RATE: float = 50  # 单接口集群总速率上限（次/秒）
+    MIN_RATE: float = 1  # 触发限流后速率下限（次/秒）
+    INCREASE_STEP: float = 1  # 加性增：每个周期提升的速率
+    INCREASE_INTERVAL: float = 1  # 加性增周期（秒）
+    DECREASE_FACTOR: float = 0.5  # 乘性减：命中限流码后速率乘以该系数
+    DECREASE_COOLDOWN: float = 1  # 两次乘性减的最小间隔（秒），避免同一波限流把速率压到底
+    RETRY_MAX_ATTEMPTS: int = 5  # 限流后最多重试次数
+    RETRY_BASE_DELAY: float = 2  # 指数退避基准延迟（秒）
+    RETRY_MAX_DELAY: float = 300  # 单次退避上限（秒）
+    RETRY_POLL_INTERVAL: float = 1  # 重试队列轮询间隔（秒）
+    RETRY_BATCH_SIZE: int = 50  # 每次轮询取出的到期任务数
+    RETRY_LEASE: float = 60  # 抢占后发送的租约（秒），节点崩溃时过期后由其它节点放回队列
+
+    class Config:
+        env_prefix = "WECHAT_RATELIMIT_"
+
+
+class ContentFilterConfig(BaseSettings):
+    """内容安全检查配置：本地预过滤（规则来自 rules/*.txt）与批量检查"""
+    ENABLED: bool = True
+    RULES_DIR: str = "./rules"
+    REJECT_CATEGORIES: List[str] = ["high_risk"]  # 命中即本地拒绝的规则类别（文件名去掉 .txt），其余类别只做标记、交给微信判定
+    BATCH_CONCURRENCY: int = 8  # 批量检查时并发调用 msg_sec_check 的上限
+
+    class Config:
+        env_prefix = "CONTENT_FILTER_"
+
+
+class ContentVerdictCacheConfig(BaseSettings):
+    """内容安全检查结果缓存配置（进程内 LRU + Redis）"""
+    ENABLED: bool = True
+    LOCAL_SIZE: int = 10000  # 进程内缓存条数
+    LOCAL_TTL: int = 300  # 进程内缓存最长时间（秒），不超过 Redis 中的 TTL
+    PASS_TTL: int = 7 * 24 * 3600  # pass 结果缓存时间（秒）
+    REVIEW_TTL: int = 3600  # review 结果缓存时间（秒）
+    RISKY_TTL: int = 24 * 3600  # risky 结果缓存时间（秒）
+    ERROR_TTL: int = 30  # 内容导致的接口错误的负缓存时间（秒），避免同一内容反复打到微信
+    ERROR_CODES: List[int] = [87014, 44004]  # 只缓存由内容本身决定的错误码（违规内容 / 内容为空）；openid、token、限频、网络错误不缓存
+
+    class Config:
+        env_prefix = "CONTENT_VERDICT_CACHE_"
+
+
+class WechatQrcodeConfig(BaseSettings):
+    """服务号带参数二维码 ticket 缓存配置"""
+    EXPIRE_SECONDS: int = 2592000  # 临时二维码有效期（秒），最长 30 天
+    EXPIRE_MARGIN: int = 3600  # 临时二维码提前失效的余量（秒），避免返回即将过期的二维码
+    LOCAL_TTL: int = 300  # 进程内副本缓存时间（秒）
+    PREWARM_SCENES: List[str] = ["FULL_DUPLEX_v1", "HALF_DUPLEX_v1"]  # 启动时预热的设备场景值
+    PREWARM_PERMANENT: bool = True  # 预热永久二维码还是临时二维码
+
+    class Config:
+        env_prefix = "WECHAT_QRCODE_"
+
+
+class WechatMenuConfig(BaseSettings):
+    """服务号自定义菜单同步配置"""
+    SYNC_ENABLED: bool = True
+    SYNC_INTERVAL: int = 3600  # 已同步后重新比对菜单哈希的间隔（秒）
+    RETRY_INTERVAL: int = 60  # 发布失败后的重试间隔（秒）
+    PUBLISH_LOCK_TTL: int = 30  # 发布锁过期时间（秒），同一时刻只有一个节点发布
+
+    class Config:
+        env_prefix = "WECHAT_MENU_"
+
+
+class WechatUnionidConfig(BaseSettings):
+    """服务号关注用户 unionid 批量回填配置"""
+    RESOLVER_ENABLED: bool = True
+    INTERVAL: int = 300  # 定时扫描缺少 unionid 的用户的间隔（秒）
+    FLUSH_DELAY: float = 2.0  # 关注事件唤醒后等待凑批的时间（秒）
+    BATCH_SIZE: int = 100  # user/info/batchget 单次最多 100 个 openid
+    SCAN_LIMIT: int = 1000  # 每轮最多处理的用户数
+    LOCK_TTL: int = 120  # 集群解析锁的过期时间（秒），需大于一轮解析耗时
+    BACKOFF_BASE: int = 600  # 解析不到 unionid 的 openid 首次重试间隔（秒），之后按失败次数翻倍
+    BACKOFF_MAX: int = 86400  # 重试间隔上限（秒）
+
+    class Config:
+        env_prefix = "WECHAT_UNIONID_"
+
+
+class ResilienceConfig(BaseSettings):
+    """外部依赖熔断 / 舱壁 / 截止时间配置，DEPENDENCIES 按依赖名覆盖默认值"""
+    FAILURE_THRESHOLD: int = 5  # 连续失败多少次后熔断
+    RECOVERY_TIMEOUT: float = 30.0  # 熔断后多久进入半开探测（秒）
+    HALF_OPEN_MAX_CALLS: int = 1  # 半开状态允许的探测调用数
+    MAX_CONCURRENT: int = 100  # 单个依赖的最大在途调用数
+    MAX_WAIT: float = 0.2  # 舱壁满时最多等待（秒）
+    TIMEOUT: float = 10.0  # 单次调用超时（秒）
+    REQUEST_DEADLINE: float = 30.0  # 请求默认总预算（秒），可由 X-Request-Timeout 请求头收紧
+    MIN_REQUEST_DEADLINE: float = 1.0  # X-Request-Timeout 请求头允许的最小值（秒），防止客户端把预算压到接近 0
+    DEPENDENCIES: Dict[str, Dict[str, float]] = {
+        "wechat": {"MAX_CONCURRENT": 200, "TIMEOUT": 8.0},
+        "whale": {"MAX_CONCURRENT": 50, "TIMEOUT": 5.0},
+        "rag": {"MAX_CONCURRENT": 50, "TIMEOUT": 5.0},
+        "rabbitmq": {"MAX_CONCURRENT": 100, "TIMEOUT": 5.0},
+    }
+
+    class Config:
+        env_prefix = "RESILIENCE_"
+
+
+class DeviceStatusConfig(BaseSettings):
+    """设备状态上报消费配置"""
+    CONSUMER_ENABLED: bool = False  # 是否在 Web 进程内消费；独立部署时运行 python -m task.status_submit
+    QUEUE: str = "KIDO-DEVICE-STATUS-REPORT"
+    PREFETCH: int = 500  # 消费者预取数量，应不小于 BATCH_SIZE
+    BATCH_SIZE: int = 200  # 每批写入 Redis 并确认的消息数
+    FLUSH_MS: int = 50  # 不足一批时的最长等待时间（毫秒）
+    STATE_TTL: int = 86400  # 设备最后一次上报的状态保留时间（秒）
+    ONLINE_TIMEOUT: int = 300  # 超过此时间未上报视为离线（秒）
+    MAX_BATCH: int = 100  # /device/states 单次最多查询的设备数
+    RETRY_DELAY: float = 1.0  # Redis 写入失败后重新投递前的等待时间（秒）
+    RECONNECT_DELAY: float = 5.0  # broker 不可用时重试订阅的间隔（秒）
+
+    class Config:
+        env_prefix = "DEVICE_STATUS_"
+
+
+class DeviceCacheConfig(BaseSettings):
+    """设备信息缓存配置"""
+    ENABLED: bool = True
+    TTL: int = 600  # 设备信息缓存时间（秒），写库时同步更新
+    NEGATIVE_TTL: int = 30  # 不存在的设备 id 的缓存时间（秒）
+
+    class Config:
+        env_prefix = "DEVICE_CACHE_"
+
+
+class NearCacheConfig(BaseSettings):
+    """进程内近端缓存配置（Redis 缓存前的本地 LRU，跨 pod 通过 Redis pub/sub 广播失效）"""
+    ENABLED: bool = True
+    MAX_ENTRIES: int = 10000  # 每个缓存的最大条目数
+    MAX_BYTES: int = 16 * 1024 * 1024  # 每个缓存按序列化大小估算的内存上限（字节）
+    TTL: float = 30  # 本地条目最长保留时间（秒），失效广播丢失时的兜底
+    CHANNEL: str = "kido:cache:invalidate"  # 失效广播频道
+    RECONNECT_DELAY: float = 1.0  # 订阅断开后的重连间隔（秒）
+
+    class Config:
+        env_prefix = "NEAR_CACHE_"
+
+
 class ProdConfig:
     static_file = StaticFileConfig()
     mysql = MySQLConfig()
@@ -184,4 +366,15 @@ class ProdConfig:
     rag = RagConfig()
     child = ChildConfig()
     wxwork = WXWorkConfig()
-    share = ShareConfig()
\ No newline at end of file
+    share = ShareConfig()
+    http_client = HttpClientConfig()
+    wechat_ratelimit = WechatRateLimitConfig()
+    content_filter = ContentFilterConfig()
+    content_verdict_cache = ContentVerdictCacheConfig()
+    wechat_qrcode = WechatQrcodeConfig()
+    wechat_menu = WechatMenuConfig()
+    wechat_unionid = WechatUnionidConfig()
+    resilience = ResilienceConfig()
+    device_status = DeviceStatusConfig()
+    device_cache = DeviceCacheConfig()
+    near_cache = NearCacheConfig()
\ No newline at end of file
@@ -1,5 +1,10 @@
 from services.storage import StorageService
+from services.app_config import AppConfigService
 from core.config.settings import settings
+from package.http.client import get_http_session
 
 def get_storage_service() -> StorageService:
-    return StorageService(base_url=settings.external.WHALE_URL)
+    return StorageService(base_url=settings.external.WHALE_URL, session=get_http_session())
+
+def get_app_config_service() -> AppConfigService:
+    return AppConfigService(base_url=settings.external.WHALE_URL, session=get_http_session())
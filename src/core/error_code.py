@@ -16,6 +16,15 @@ class ErrorCode(Enum):
     TEMPLATE_MESSAGE_USER_NOT_FOUND = (200002, 'no corresponding service account user found')
     TEMPLATE_MESSAGE_CHILD_USER_NOT_FOUND = (200003, 'no corresponding user found for child')
     TEMPLATE_MESSAGE_SERVICE_ERROR = (200004, 'template message service error')
+    TEMPLATE_BROADCAST_JOB_NOT_FOUND = (200005, 'template broadcast job not found')
+    TEMPLATE_BROADCAST_JOB_RUNNING = (200006, 'template broadcast job is still running')
+    TEMPLATE_BROADCAST_JOB_FINISHED = (200007, 'template broadcast job already finished')
+    
+    # Data Tracking Errors
+    TRACKING_QUEUE_FULL = (400001, 'tracking queue full, retry later')
+    
+    # Device Errors
+    DEVICE_BATCH_TOO_LARGE = (500001, 'too many device ids in one request')
     
     # Child Assets Errors
     CHILD_ASSET_NOT_FOUND = (300001, 'asset not found')
@@ -1,9 +1,13 @@
+import math
+
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from loguru import logger
 from core.error_code import ErrorCode
+from core.config.settings import settings
 from entity.constants import Constants
+from package.resilience.deadline import deadline_scope
 
 SKIP_VERIFICATION_ROUTERS = set()
 
@@ -50,4 +54,28 @@ class ClientVerificationMiddleware(BaseHTTPMiddleware):
             if path.startswith(full_prefix):
                 return True
         
-        return False
\ No newline at end of file
+        return False
+
+
+class DeadlineMiddleware(BaseHTTPMiddleware):
+    """
+    为每个请求设置截止时间，请求内对外部依赖的调用超时不会超过剩余时间
+    调用方可通过 X-Request-Timeout（秒）收紧，取值限制在 [MIN_REQUEST_DEADLINE, REQUEST_DEADLINE] 之间
+    """
+
+    HEADER = "X-Request-Timeout"
+
+    async def dispatch(self, request: Request, call_next):
+        config = settings.resilience
+        budget = config.REQUEST_DEADLINE
+        header = request.headers.get(self.HEADER)
+        if header:
+            try:
+                requested = float(header)
+                if not math.isfinite(requested):
+                    raise ValueError(header)
+                budget = min(budget, max(requested, config.MIN_REQUEST_DEADLINE))
+            except ValueError:
+                logger.warning(f"Invalid {self.HEADER} header: {header}")
+        with deadline_scope(budget):
+            return await call_next(request)
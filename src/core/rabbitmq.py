@@ -1,50 +1,290 @@
+import asyncio
 import json
 import aio_pika
-from typing import List
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
 from core.config.settings import settings
 from loguru import logger
+from services.resilience import RABBITMQ, get_dependency_policy
 
 from entity.data_track import TrackEventRequest
 
 
-class RabbitMQClient:
-    def __init__(self):
-        self.connection = None
-        self.channel = None
-        self.exchange = None
-        self.exchange_name = settings.rabbitmq.DATA_TRACKING_EXCHANGE
-        self.queue_name = settings.rabbitmq.DATA_TRACKING_QUEUE
-        self.rabbit_url = f"amqp://{settings.rabbitmq.USERNAME}:{settings.rabbitmq.PASSWORD}@{settings.rabbitmq.HOST}:{settings.rabbitmq.PORT}/"
+class RabbitMQConnectionManager:
+    """
+    进程内共享的 RabbitMQ 连接管理
+    - 一条 robust 连接，connect 加锁，并发调用只发起一次连接；失败后 RECONNECT_BACKOFF 内直接失败，避免重连风暴
+    - 发布用的 channel 池（开启 publisher confirms，最多 CHANNEL_POOL_SIZE 个），不同发布方并行使用不同 channel
+    - 交换机按 channel 懒声明并缓存，队列每个连接只声明一次
+    - 消费者使用独立 channel（各自设置 prefetch），不占用发布池
+    - close 先等待借出的 channel 归还（drain），再关闭连接
+    """
 
-    async def connect(self):
-        if not self.connection:
-            logger.info(f"Connecting to RabbitMQ at {self.rabbit_url}")
-            try:
-                self.connection = await aio_pika.connect_robust(self.rabbit_url)
-                self.channel = await self.connection.channel()
-                self.exchange = await self.channel.declare_exchange(
-                    self.exchange_name, aio_pika.ExchangeType.DIRECT
-                )
+    def __init__(self, config=None):
+        self.config = config or settings.rabbitmq
+        self.url = f"amqp://{self.config.USERNAME}:{self.config.PASSWORD}@{self.config.HOST}:{self.config.PORT}/"
+        self.connection: Optional[aio_pika.abc.AbstractRobustConnection] = None
+        self._connect_lock = asyncio.Lock()
+        self._reconnect_after = 0.0
+        self._slots = asyncio.Semaphore(self.config.CHANNEL_POOL_SIZE)
+        self._idle: List[aio_pika.abc.AbstractChannel] = []
+        self._in_use = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._closing = False
+        self._exchanges: Dict[aio_pika.abc.AbstractChannel, Dict[str, aio_pika.abc.AbstractExchange]] = {}
+        self._declared_queues: Set[str] = set()
+        self._consumer_channels: List[aio_pika.abc.AbstractChannel] = []
 
-                logger.info(
-                    f"Successfully connected to RabbitMQ and declared exchange '{self.exchange_name}' and queue '{self.queue_name}'"
-                )
-                logger.info(
-                    f"Successfully connected to RabbitMQ and declared exchange '{self.exchange_name}'"
-                )
+    async def connect(self) -> aio_pika.abc.AbstractRobustConnection:
+        if self.connection:
+            return self.connection
+        async with self._connect_lock:
+            if self.connection:
+                return self.connection
+            loop = asyncio.get_running_loop()
+            if loop.time() < self._reconnect_after:
+                raise ConnectionError("RabbitMQ unavailable, reconnect backoff in effect")
+            logger.info(f"Connecting to RabbitMQ at {self.config.HOST}:{self.config.PORT}")
+            try:
+                self.connection = await aio_pika.connect_robust(self.url, timeout=self.config.CONNECT_TIMEOUT)
             except Exception as e:
+                self._reconnect_after = loop.time() + self.config.RECONNECT_BACKOFF
                 logger.error(f"Failed to connect to RabbitMQ: {str(e)}")
                 raise
+            logger.info("Successfully connected to RabbitMQ")
+            return self.connection
+
+    @asynccontextmanager
+    async def channel(self) -> AsyncIterator[aio_pika.abc.AbstractChannel]:
+        """从池中借出一个发布用 channel，池满时等待其他发布方归还"""
+        if self._closing:
+            raise ConnectionError("RabbitMQ connection is closing")
+        connection = await self.connect()
+        async with self._slots:
+            channel = None
+            while self._idle and channel is None:
+                channel = self._idle.pop()
+                if channel.is_closed:
+                    # 发布出错（如 channel 级异常）被 broker 关闭的 channel 直接丢弃
+                    self._exchanges.pop(channel, None)
+                    channel = None
+            if channel is None:
+                channel = await connection.channel(publisher_confirms=True)
+            self._in_use += 1
+            self._drained.clear()
+            try:
+                yield channel
+            finally:
+                self._in_use -= 1
+                if channel.is_closed:
+                    self._exchanges.pop(channel, None)
+                else:
+                    self._idle.append(channel)
+                if self._in_use == 0:
+                    self._drained.set()
+
+    async def exchange(
+        self,
+        channel: aio_pika.abc.AbstractChannel,
+        name: str,
+        exchange_type: aio_pika.ExchangeType = aio_pika.ExchangeType.DIRECT,
+    ) -> aio_pika.abc.AbstractExchange:
+        """获取 channel 上的交换机对象，首次使用时声明（robust channel 重连后会自动重新声明）"""
+        exchanges = self._exchanges.setdefault(channel, {})
+        exchange = exchanges.get(name)
+        if exchange is None:
+            exchange = await channel.declare_exchange(name, exchange_type)
+            exchanges[name] = exchange
+        return exchange
+
+    async def declare_queue(self, channel: aio_pika.abc.AbstractChannel, name: str) -> None:
+        """声明持久化队列（每个连接只声明一次）"""
+        if name not in self._declared_queues:
+            await channel.declare_queue(name, durable=True)
+            self._declared_queues.add(name)
+
+    async def consumer_channel(self, prefetch_count: int) -> aio_pika.abc.AbstractChannel:
+        """为消费者打开独立 channel"""
+        connection = await self.connect()
+        channel = await connection.channel()
+        await channel.set_qos(prefetch_count=prefetch_count)
+        self._consumer_channels.append(channel)
+        return channel
+
+    async def close_channel(self, channel: aio_pika.abc.AbstractChannel) -> None:
+        if channel in self._consumer_channels:
+            self._consumer_channels.remove(channel)
+        if not channel.is_closed:
+            await channel.close()
+
+    async def close(self, drain_timeout: Optional[float] = None) -> None:
+        """停止借出 channel，等待进行中的发布完成后关闭连接"""
+        if self.connection is None:
+            return
+        self._closing = True
+        drain_timeout = self.config.CLOSE_DRAIN_TIMEOUT if drain_timeout is None else drain_timeout
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self._in_use} RabbitMQ channels still in use after {drain_timeout}s, closing anyway")
+        logger.info("Closing RabbitMQ connection...")
+        try:
+            await self.connection.close()
+        finally:
+            self.connection = None
+            self._idle.clear()
+            self._exchanges.clear()
+            self._declared_queues.clear()
+            self._consumer_channels.clear()
+            self._closing = False
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "connected": int(self.connection is not None and not self.connection.is_closed),
+            "channels_in_use": self._in_use,
+            "channels_idle": len(self._idle),
+            "consumer_channels": len(self._consumer_channels),
+        }
+
+
+_manager: Optional[RabbitMQConnectionManager] = None
+
+
+def get_rabbitmq_manager() -> RabbitMQConnectionManager:
+    """获取全局 RabbitMQ 连接管理（单例）"""
+    global _manager
+    if _manager is None:
+        _manager = RabbitMQConnectionManager()
+    return _manager
+
+
+async def close_rabbitmq() -> None:
+    """等待进行中的发布完成后关闭共享连接（应用关闭时调用）"""
+    global _manager
+    if _manager is not None:
+        await _manager.close()
+        _manager = None
+
+
+class RabbitMQClient:
+    """
+    面向某个交换机 / 队列的客户端，连接和 channel 由 RabbitMQConnectionManager 统一管理，
+    多个客户端（埋点、公众号事件、用户交互等队列）共享同一条连接
+    """
+
+    def __init__(
+        self,
+        manager: Optional[RabbitMQConnectionManager] = None,
+        exchange_name: Optional[str] = None,
+        queue_name: Optional[str] = None,
+    ):
+        self._manager = manager
+        self._consumers = {}
+        self.exchange_name = exchange_name or settings.rabbitmq.DATA_TRACKING_EXCHANGE
+        self.queue_name = queue_name or settings.rabbitmq.DATA_TRACKING_QUEUE
+
+    @property
+    def manager(self) -> RabbitMQConnectionManager:
+        # 默认在首次使用时才取全局单例，lifespan 关闭后重建的连接也能继续使用
+        return self._manager or get_rabbitmq_manager()
+
+    async def connect(self):
+        await self.manager.connect()
 
     async def publish_events(self, events: List[TrackEventRequest]):
-        await self.connect()
+        async def publish():
+            async with self.manager.channel() as channel:
+                exchange = await self.manager.exchange(channel, self.exchange_name)
+                for event in events:
+                    message = aio_pika.Message(
+                        body=event.model_dump_json().encode(),
+                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                    )
+                    await exchange.publish(message, routing_key=self.queue_name)
+
         try:
-            for event in events:
-                message = aio_pika.Message(
-                    body=event.model_dump_json().encode(),
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                )
-                await self.exchange.publish(message, routing_key=self.queue_name)
+            await get_dependency_policy(RABBITMQ).call(publish)
         except Exception as e:
             logger.error(f"Failed to publish events: {str(e)}")
             raise
+
+
+    async def publish_batch(
+        self,
+        bodies: List[bytes],
+        routing_key: str = None,
+        content_type: str = "application/json",
+        content_encoding: Optional[str] = None,
+    ):
+        """
+        流水线发布一批持久化消息到交换机
+        channel 开启了 publisher confirms，整批消息并发发出后统一等待 broker 确认，而不是逐条往返
+        """
+        async def publish():
+            async with self.manager.channel() as channel:
+                exchange = await self.manager.exchange(channel, self.exchange_name)
+                await asyncio.gather(*(
+                    exchange.publish(
+                        aio_pika.Message(
+                            body=body,
+                            content_type=content_type,
+                            content_encoding=content_encoding,
+                            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                        ),
+                        routing_key=routing_key or self.queue_name,
+                    )
+                    for body in bodies
+                ))
+
+        await get_dependency_policy(RABBITMQ).call(publish)
+
+    async def declare_queue(self, queue_name: str):
+        """声明持久化队列（每个连接只声明一次）"""
+        async with self.manager.channel() as channel:
+            await self.manager.declare_queue(channel, queue_name)
+
+    async def publish_to_queue(self, queue_name: str, body: bytes, content_type: str = "application/json"):
+        """通过默认交换机向指定队列投递持久化消息"""
+        async def publish():
+            async with self.manager.channel() as channel:
+                await self.manager.declare_queue(channel, queue_name)
+                message = aio_pika.Message(
+                    body=body,
+                    content_type=content_type,
+                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                )
+                await channel.default_exchange.publish(message, routing_key=queue_name)
+
+        await get_dependency_policy(RABBITMQ).call(publish)
+
+    async def consume(
+        self,
+        queue_name: str,
+        callback: Callable[[aio_pika.abc.AbstractIncomingMessage], Awaitable[None]],
+        prefetch_count: int = 10,
+    ) -> str:
+        """在独立 channel 上消费队列，返回 consumer tag"""
+        channel = await self.manager.consumer_channel(prefetch_count)
+        queue = await channel.declare_queue(queue_name, durable=True)
+        consumer_tag = await queue.consume(callback)
+        self._consumers[consumer_tag] = (channel, queue)
+        return consumer_tag
+
+    async def cancel(self, consumer_tag: str):
+        """停止消费（channel 保持打开，已投递未 ack 的消息仍可继续 ack，close 时再关闭）"""
+        consumer = self._consumers.get(consumer_tag)
+        if consumer is not None and consumer[1] is not None:
+            await consumer[1].cancel(consumer_tag)
+            self._consumers[consumer_tag] = (consumer[0], None)
+
+    async def close(self):
+        """关闭本客户端的消费 channel；共享连接由 close_rabbitmq 在应用关闭时统一关闭"""
+        consumers, self._consumers = self._consumers, {}
+        for consumer_tag, (channel, queue) in consumers.items():
+            try:
+                if queue is not None:
+                    await queue.cancel(consumer_tag)
+                await self.manager.close_channel(channel)
+            except Exception as e:
+                logger.warning(f"Failed to close RabbitMQ consumer {consumer_tag}: {e}")
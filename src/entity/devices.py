@@ -4,7 +4,7 @@
 
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from pydantic import BaseModel, Field, ConfigDict, UUID4, field_serializer, field_validator
 
@@ -34,6 +34,13 @@ class DeviceInfo(BaseModel):
         return value.isoformat()
 
 
+class DeviceState(BaseModel):
+    device_id: str = Field(description="device id")
+    online: bool = Field(description="最近 ONLINE_TIMEOUT 秒内是否有上报", default=False)
+    last_seen: Optional[int] = Field(description="最后一次上报时间（unix 秒）", default=None)
+    status: Dict[str, Any] = Field(description="最后一次上报的状态字段", default_factory=dict)
+
+
 class UnbindDeviceRequest(BaseModel):
     type: UnbindType = Field(description="unbind device info")
     child_id: str = Field(description="child uuid")
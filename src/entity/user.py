@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -94,6 +94,15 @@ class SendTemplateMessageByChildRequest(BaseModel):
     miniprogram: Optional[MiniprogramInfo] = Field(description="jump to miniprogram information", default=None)
 
 
+class BroadcastTemplateMessageRequest(BaseModel):
+    """Broadcast template message to multiple users request"""
+    user_ids: List[str] = Field(description="recipient user IDs", min_length=1)
+    template_id: str = Field(description="template ID")
+    data: Dict[str, TemplateDataItem] = Field(description="template data, parameter names correspond to template configuration")
+    url: Optional[str] = Field(description="click to jump to web page link", default=None)
+    miniprogram: Optional[MiniprogramInfo] = Field(description="jump to miniprogram information", default=None)
+
+
 class TemplateMessageResponse(BaseModel):
     """Template message response"""
     code: int = Field(description="response code, 0 means success")
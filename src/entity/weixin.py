@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from core.config.settings import settings
 
@@ -120,6 +120,8 @@ class WechatErrorCode:
     USER_REFUSE_MESSAGE = 43101
     RATE_LIMIT_SECOND_LEVEL = 40258  # 二级限流：短时间内向同一用户发送相同内容
     REQUIRE_SUBSCRIBE = 43004  # 需要用户关注公众号才能接收模板消息
+    API_DAILY_QUOTA_LIMIT = 45009  # 接口调用超过每日限额
+    API_MINUTE_QUOTA_LIMIT = 45011  # 接口调用频率超限（分钟级）
 
 
 class ContentSecurityScene:
@@ -166,4 +168,17 @@ class WechatContentSecurityResult(BaseModel):
     suggest: str = Field(..., description="建议：pass/review/risky")
     label: int = Field(..., description="标签代码")
     detail: list = Field(default=[], description="详细信息")
-    trace_id: str = Field(default="", description="追踪ID")
\ No newline at end of file
+    trace_id: str = Field(default="", description="追踪ID")
+
+
+class ContentSecurityBatchCheckRequest(BaseModel):
+    """Batch content security check request model (all items belong to the current user)"""
+    items: List[ContentSecurityCheckRequest] = Field(..., description="Items to check", min_length=1, max_length=50)
+    force_recheck: bool = Field(default=False, description="Skip cached verdicts and re-check with WeChat")
+
+
+class ContentSecurityBatchItemResult(BaseModel):
+    """批量内容安全检查的单条结果（与请求顺序一致）"""
+    index: int = Field(..., description="请求中的序号")
+    result: Optional[WechatContentSecurityResult] = Field(default=None, description="检查结果")
+    error: Optional[str] = Field(default=None, description="检查失败原因")
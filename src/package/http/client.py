@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : client.py
+
+from typing import Annotated
+
+import aiohttp
+from fastapi import Depends
+from loguru import logger
+from core.config.settings import settings
+
+# 全局 HTTP 会话（单例模式），在 app lifespan 中创建和关闭
+_http_session: aiohttp.ClientSession | None = None
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """
+    创建带连接池的 aiohttp 会话
+    开启 keep-alive、DNS 缓存，并限制总连接数和单 host 连接数
+    """
+    config = settings.http_client
+    connector = aiohttp.TCPConnector(
+        limit=config.LIMIT,
+        limit_per_host=config.LIMIT_PER_HOST,
+        ttl_dns_cache=config.DNS_CACHE_TTL,
+        keepalive_timeout=config.KEEPALIVE_TIMEOUT,
+        enable_cleanup_closed=True,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=config.TOTAL_TIMEOUT,
+        connect=config.CONNECT_TIMEOUT,
+        sock_read=config.SOCK_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def init_http_session() -> aiohttp.ClientSession:
+    """初始化全局 HTTP 会话（应用启动时调用）"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        logger.info("Creating HTTP client session", extra={
+            "limit": settings.http_client.LIMIT,
+            "limit_per_host": settings.http_client.LIMIT_PER_HOST,
+        })
+        _http_session = create_http_session()
+        logger.info("HTTP client session created successfully")
+    return _http_session
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    获取全局 HTTP 会话（单例）
+    未经 lifespan 初始化时（如脚本、测试）惰性创建，需在事件循环中调用
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        logger.info("Creating HTTP client session lazily")
+        _http_session = create_http_session()
+    return _http_session
+
+
+async def close_http_session():
+    """关闭全局 HTTP 会话（应用关闭时调用）"""
+    global _http_session
+    if _http_session is not None:
+        try:
+            logger.info("Closing HTTP client session...")
+            await _http_session.close()
+            logger.info("HTTP client session closed successfully")
+        except Exception as e:
+            logger.error(f"Error closing HTTP client session: {str(e)}", exc_info=True)
+        finally:
+            _http_session = None
+
+
+HTTP_SESSION = Annotated[aiohttp.ClientSession, Depends(get_http_session)]
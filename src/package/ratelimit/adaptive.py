@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : adaptive.py
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from loguru import logger
+from package.ratelimit.token_bucket import TokenBucket
+from package.redis.client import new_asyncio_redis_client
+
+# 单次等待的最长时间（秒），等待后重新向 Redis 申请，以便及时感知速率变化
+MAX_WAIT_SECONDS = 1.0
+# Redis 中限流状态的过期时间（秒），长时间无流量后恢复到默认速率
+STATE_TTL_SECONDS = 3600
+# 吞吐统计窗口（秒）
+THROUGHPUT_WINDOW_SECONDS = 60
+
+# 集群共享令牌桶：速率保存在同一个 hash 中，AIMD 调整对所有节点立即生效
+# KEYS[1] 状态 hash；ARGV: 默认速率, 突发秒数, 申请令牌数, 状态 TTL
+# 返回需要等待的秒数（字符串，避免 Lua 数字被截断为整数）
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate')
+local rate = tonumber(state[3]) or tonumber(ARGV[1])
+local capacity = math.max(rate * tonumber(ARGV[2]), 1)
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local requested = tonumber(ARGV[3])
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now), 'rate', tostring(rate))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return tostring(wait)
+"""
+
+# AIMD 速率调整
+# KEYS[1] 状态 hash；ARGV: 默认速率, 最小速率, 最大速率, 'inc' / 'dec', 步长 / 系数, 最小间隔（秒）, 状态 TTL
+# 返回调整后的速率
+_ADJUST_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local mode = ARGV[4]
+local field = mode .. '_at'
+local state = redis.call('HMGET', KEYS[1], 'rate', field)
+local rate = tonumber(state[1]) or tonumber(ARGV[1])
+local last = tonumber(state[2]) or 0
+if now - last < tonumber(ARGV[6]) then
+    return tostring(rate)
+end
+if mode == 'dec' then
+    rate = math.max(tonumber(ARGV[2]), rate * tonumber(ARGV[5]))
+else
+    rate = math.min(tonumber(ARGV[3]), rate + tonumber(ARGV[5]))
+end
+redis.call('HSET', KEYS[1], 'rate', tostring(rate), field, tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[7]))
+return tostring(rate)
+"""
+
+
+class EndpointMetrics:
+    """单个接口的限流指标"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.requests = 0
+        self.succeeded = 0
+        self.throttled = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.retried = 0
+        self.dropped = 0
+        # (秒, 请求数)，用于计算最近一个窗口内的吞吐
+        self._window: Deque[List[int]] = deque()
+
+    def record_request(self) -> None:
+        self.requests += 1
+        second = int(time.time())
+        if self._window and self._window[-1][0] == second:
+            self._window[-1][1] += 1
+        else:
+            self._window.append([second, 1])
+        self._trim(second)
+
+    def _trim(self, now: int) -> None:
+        while self._window and self._window[0][0] <= now - THROUGHPUT_WINDOW_SECONDS:
+            self._window.popleft()
+
+    def throughput(self) -> float:
+        """最近窗口内的平均吞吐（次/秒）"""
+        self._trim(int(time.time()))
+        return sum(count for _, count in self._window) / THROUGHPUT_WINDOW_SECONDS
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "rate": round(self.rate, 3),
+            "throughput": round(self.throughput(), 3),
+            "requests": self.requests,
+            "succeeded": self.succeeded,
+            "throttled": self.throttled,
+            "waited": self.waited,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }
+
+
+class AdaptiveRateLimiter:
+    """
+    集群共享的自适应限流器（AIMD）
+
+    - 每个接口一个 Redis 令牌桶，所有节点共用同一速率
+    - 成功时按周期加性增（+step），命中限流错误码时乘性减（*factor），并设置冷却时间避免连续减半
+    - Redis 不可用时退化为进程内令牌桶，按最近一次已知速率限流
+    - 按接口统计请求数、吞吐、限流次数、等待时间等指标
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_rate: float,
+        min_rate: float = 1,
+        increase_step: float = 1,
+        increase_interval: float = 1,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1,
+        burst_seconds: float = 1,
+    ):
+        if not 0 < min_rate <= max_rate:
+            raise ValueError("require 0 < min_rate <= max_rate")
+        self.name = name
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase_step = increase_step
+        self.increase_interval = increase_interval
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.burst_seconds = burst_seconds
+        self._metrics: Dict[str, EndpointMetrics] = {}
+        self._local_buckets: Dict[str, TokenBucket] = {}
+        self._last_increase: Dict[str, float] = {}
+
+    def _key(self, endpoint: str) -> str:
+        return f"kido:ratelimit:{self.name}:{endpoint}"
+
+    def metrics_for(self, endpoint: str) -> EndpointMetrics:
+        metrics = self._metrics.get(endpoint)
+        if metrics is None:
+            metrics = EndpointMetrics(self.max_rate)
+            self._metrics[endpoint] = metrics
+        return metrics
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {endpoint: metrics.snapshot() for endpoint, metrics in self._metrics.items()}
+
+    async def acquire(self, endpoint: str, tokens: float = 1) -> None:
+        """申请发送配额，配额不足时等待"""
+        metrics = self.metrics_for(endpoint)
+        metrics.record_request()
+        waited = False
+        while True:
+            try:
+                async with new_asyncio_redis_client() as redis_client:
+                    wait = float(await redis_client.eval(
+                        _ACQUIRE_SCRIPT, 1, self._key(endpoint),
+                        self.max_rate, self.burst_seconds, tokens, STATE_TTL_SECONDS
+                    ))
+            except Exception as e:
+                logger.warning(f"Rate limiter '{self.name}' falling back to local bucket for {endpoint}: {e}")
+                await self._acquire_local(endpoint, tokens)
+                return
+            if wait <= 0:
+                return
+            if not waited:
+                metrics.waited += 1
+                waited = True
+            wait = min(wait, MAX_WAIT_SECONDS)
+            metrics.wait_seconds += wait
+            await asyncio.sleep(wait)
+
+    async def _acquire_local(self, endpoint: str, tokens: float) -> None:
+        rate = self.metrics_for(endpoint).rate
+        bucket = self._local_buckets.get(endpoint)
+        if bucket is None or bucket.rate != rate:
+            bucket = TokenBucket(rate, max(rate * self.burst_seconds, 1))
+            self._local_buckets[endpoint] = bucket
+        await bucket.acquire(tokens)
+
+    async def on_success(self, endpoint: str) -> None:
+        """请求成功：按周期加性增"""
+        metrics = self.metrics_for(endpoint)
+        metrics.succeeded += 1
+        now = time.monotonic()
+        # 进程内先节流，避免每次成功都访问 Redis
+        if metrics.rate >= self.max_rate or now - self._last_increase.get(endpoint, 0) < self.increase_interval:
+            return
+        self._last_increase[endpoint] = now
+        await self._adjust(endpoint, "inc", self.increase_step, self.increase_interval)
+
+    async def on_throttle(self, endpoint: str) -> None:
+        """命中限流错误码：乘性减"""
+        metrics = self.metrics_for(endpoint)
+        metrics.throttled += 1
+        previous = metrics.rate
+        await self._adjust(endpoint, "dec", self.decrease_factor, self.decrease_cooldown)
+        if metrics.rate < previous:
+            logger.warning(f"Rate limiter '{self.name}' throttled on {endpoint}, rate {previous:.2f} -> {metrics.rate:.2f}/s")
+
+    async def _adjust(self, endpoint: str, mode: str, amount: float, interval: float) -> None:
+        metrics = self.metrics_for(endpoint)
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                rate = float(await redis_client.eval(
+                    _ADJUST_SCRIPT, 1, self._key(endpoint),
+                    self.max_rate, self.min_rate, self.max_rate, mode, amount, interval, STATE_TTL_SECONDS
+                ))
+        except Exception as e:
+            logger.warning(f"Failed to adjust shared rate for {endpoint}: {e}, adjusting locally")
+            if mode == "dec":
+                rate = max(self.min_rate, metrics.rate * amount)
+            else:
+                rate = min(self.max_rate, metrics.rate + amount)
+        metrics.rate = rate
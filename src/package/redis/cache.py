@@ -2,10 +2,41 @@
 # -*- coding: utf-8 -*-
 # @File    : cache.py
 
-from typing import Callable
+import asyncio
+import functools
+import inspect
+import math
+import random
+import struct
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
 
+from loguru import logger
 from redis.asyncio import Redis
 from package.redis.client import new_asyncio_redis_client
+from package.redis.serializers import PICKLE, get_serializer
+
+# 未指定过期时间时的默认缓存时长（秒）
+DEFAULT_TTL = 3600
+# 未抢到回源锁时轮询其它调用方回源结果的间隔（秒）
+LOCK_WAIT_INTERVAL = 0.05
+
+# 值头部：上次回源耗时（秒）+ 逻辑过期时间（unix 秒），供 XFetch 提前刷新使用
+_ENVELOPE = struct.Struct(">dd")
+
+# 仅当锁仍属于自己时才释放
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_MISSING = object()
+
+# (值, 回源耗时, 逻辑过期时间)
+Entry = Tuple[Any, float, float]
 
 
 class AsyncRedisCache:
@@ -15,7 +46,7 @@ class AsyncRedisCache:
         *,
         key: str,
         new_func: Callable[[], Redis] | None = None,
-        timeout: int = None, # TODO: need default
+        timeout: int = DEFAULT_TTL,
     ):
         if new_func is None:
             new_func = new_asyncio_redis_client
@@ -28,6 +59,280 @@ class AsyncRedisCache:
         async with self.new_func() as redis_client:
             return await redis_client.get(self.key)
 
-    async def set(self, value: str) -> None:
+    async def set(self, value: str, timeout: int = None, nx: bool = False) -> bool:
+        """timeout 不传时使用构造时的默认过期时间；nx=True 时 key 已存在则不写入，返回是否写入"""
+        async with self.new_func() as redis_client:
+            return bool(await redis_client.set(self.key, value, ex=timeout or self.timeout, nx=nx))
+
+    async def delete(self) -> None:
+        async with self.new_func() as redis_client:
+            await redis_client.delete(self.key)
+
+
+class KeyedCache:
+    """
+    按 key 存取的缓存（key 为 kido:cache:{namespace}:{key}）
+    - 值经 serializer 序列化，前面带上回源耗时和逻辑过期时间（XFetch 用）
+    - get_many / set_many 一次往返完成批量读写（MGET / pipeline）
+    - 附带回源锁（SET NX PX，锁值为调用方 token，仅持有者可释放）
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: int = DEFAULT_TTL,
+        serializer: str = PICKLE,
+        new_func: Callable[[], Redis] | None = None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.serializer = get_serializer(serializer)
+        self.new_func = new_func or new_asyncio_redis_client
+        self.prefix = f"kido:cache:{namespace}:"
+
+    def key(self, key: Any) -> str:
+        return f"{self.prefix}{key}"
+
+    def lock_key(self, key: Any) -> str:
+        return f"kido:cache:lock:{self.namespace}:{key}"
+
+    def _pack(self, value: Any, ttl: int, delta: float) -> bytes:
+        return _ENVELOPE.pack(delta, time.time() + ttl) + self.serializer.dumps(value)
+
+    def _unpack(self, key: Any, raw: Optional[bytes]) -> Optional[Entry]:
+        if raw is None:
+            return None
+        try:
+            delta, expiry = _ENVELOPE.unpack_from(raw)
+            return self.serializer.loads(raw[_ENVELOPE.size:]), delta, expiry
+        except Exception as e:
+            # 序列化方式变更或格式不兼容的旧值，按未命中处理（回源后覆盖）
+            logger.warning(f"Discard undecodable cache entry {self.key(key)}: {e}")
+            return None
+
+    async def get_entry(self, key: Any) -> Optional[Entry]:
+        async with self.new_func() as redis_client:
+            raw = await redis_client.get(self.key(key))
+        return self._unpack(key, raw)
+
+    async def get(self, key: Any, default: Any = None) -> Any:
+        entry = await self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    async def set(self, key: Any, value: Any, ttl: Optional[int] = None, delta: float = 0.0) -> None:
+        """写入缓存；delta 为本次回源耗时，越慢的回源越早触发提前刷新"""
+        ttl = ttl or self.ttl
+        async with self.new_func() as redis_client:
+            await redis_client.set(self.key(key), self._pack(value, ttl, delta), ex=ttl)
+
+    async def delete(self, *keys: Any) -> int:
+        if not keys:
+            return 0
+        async with self.new_func() as redis_client:
+            return await redis_client.delete(*(self.key(key) for key in keys))
+
+    async def get_many(self, keys: Iterable[Any]) -> Dict[Any, Any]:
+        """批量读取（一次 MGET），只返回命中的 key"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
         async with self.new_func() as redis_client:
-            await redis_client.set(self.key, value, ex=self.timeout)
+            rows = await redis_client.mget([self.key(key) for key in keys])
+        result = {}
+        for key, raw in zip(keys, rows):
+            entry = self._unpack(key, raw)
+            if entry is not None:
+                result[key] = entry[0]
+        return result
+
+    async def set_many(self, mapping: Mapping[Any, Any], ttl: Optional[int] = None) -> None:
+        """批量写入（一个 pipeline），每个 key 各自带过期时间"""
+        if not mapping:
+            return
+        ttl = ttl or self.ttl
+        async with self.new_func() as redis_client:
+            pipe = redis_client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(self.key(key), self._pack(value, ttl, 0.0), ex=ttl)
+            await pipe.execute()
+
+    async def acquire_lock(self, key: Any, token: str, timeout: float) -> bool:
+        async with self.new_func() as redis_client:
+            return bool(await redis_client.set(self.lock_key(key), token, px=int(timeout * 1000), nx=True))
+
+    async def release_lock(self, key: Any, token: str) -> None:
+        async with self.new_func() as redis_client:
+            await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, self.lock_key(key), token)
+
+    async def peek(self, key: Any) -> Tuple[Optional[Entry], bool]:
+        """一次往返读取缓存值和回源锁是否还被持有"""
+        async with self.new_func() as redis_client:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(self.key(key))
+            pipe.exists(self.lock_key(key))
+            raw, locked = await pipe.execute()
+        return self._unpack(key, raw), bool(locked)
+
+
+def should_refresh(delta: float, expiry: float, beta: float = 1.0, now: Optional[float] = None) -> bool:
+    """
+    XFetch 概率提前刷新：越接近过期、回源越慢，越可能提前回源
+    now - delta * beta * ln(rand) >= expiry，rand 取 (0, 1]
+    """
+    now = time.time() if now is None else now
+    return now - delta * beta * math.log(1.0 - random.random()) >= expiry
+
+
+def cached(
+    key: str | Callable[..., Any],
+    ttl: int = DEFAULT_TTL,
+    serializer: str = PICKLE,
+    *,
+    namespace: Optional[str] = None,
+    beta: float = 1.0,
+    lock_timeout: float = 10.0,
+    cache_none: bool = False,
+    new_func: Callable[[], Redis] | None = None,
+):
+    """
+    异步函数的 cache-aside 装饰器
+
+        @cached(key="{device_id}", ttl=600)
+        async def get_device(device_id: str) -> DeviceInfo: ...
+
+    - key：按参数名格式化的模板（缺省参数也可引用），或接收同样参数、返回 key 的函数
+    - namespace 默认为函数的模块路径 + 限定名，完整 key 为 kido:cache:{namespace}:{key}
+    - 防击穿：
+      * 进程内同一个 key 的并发调用合并为一次回源（独立任务执行，发起方被取消不影响其它等待方），其余调用等待同一结果
+      * 跨进程用 Redis 回源锁，未抢到锁的调用方轮询等待持锁方写入的结果，最多等 lock_timeout 秒后自行回源
+      * XFetch：临近过期时按概率提前回源，只有抢到锁的调用方回源，其余继续返回旧值，避免同时过期
+    - 返回 None 默认不缓存（cache_none=True 时缓存）
+    - Redis 不可用时直接调用原函数，不影响业务
+    被装饰的函数上挂有 cache（KeyedCache，可用 get_many / set_many 批量预热）、key_for、invalidate、stats
+    """
+
+    def decorator(func):
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError(f"@cached only supports async functions: {func.__qualname__}")
+        signature = inspect.signature(func)
+        cache = KeyedCache(
+            namespace or f"{func.__module__}.{func.__qualname__}",
+            ttl=ttl,
+            serializer=serializer,
+            new_func=new_func,
+        )
+        inflight: Dict[str, asyncio.Task] = {}
+        counters = {"hits": 0, "misses": 0, "early_refreshes": 0, "coalesced": 0, "errors": 0}
+
+        def key_for(*args, **kwargs) -> str:
+            if callable(key):
+                return str(key(*args, **kwargs))
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return key.format(**bound.arguments)
+
+        async def _store(cache_key: str, value: Any, delta: float) -> None:
+            if value is None and not cache_none:
+                return
+            try:
+                await cache.set(cache_key, value, delta=delta)
+            except Exception as e:
+                counters["errors"] += 1
+                logger.warning(f"Failed to write cache {cache.key(cache_key)}: {e}")
+
+        async def _wait_for_holder(cache_key: str) -> Any:
+            # 其它进程正在回源：等它写入结果；锁释放（回源失败或结果不缓存）或超时后由自己回源
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + lock_timeout
+            while loop.time() < deadline:
+                await asyncio.sleep(LOCK_WAIT_INTERVAL)
+                entry, locked = await cache.peek(cache_key)
+                if entry is not None:
+                    return entry[0]
+                if not locked:
+                    break
+            return _MISSING
+
+        async def _load(cache_key: str, stale: Any, args, kwargs) -> Any:
+            token = uuid.uuid4().hex
+            try:
+                locked = await cache.acquire_lock(cache_key, token, lock_timeout)
+                if not locked:
+                    if stale is not _MISSING:
+                        return stale
+                    value = await _wait_for_holder(cache_key)
+                    if value is not _MISSING:
+                        counters["coalesced"] += 1
+                        return value
+            except Exception as e:
+                counters["errors"] += 1
+                logger.warning(f"Cache lock unavailable for {cache.key(cache_key)}: {e}")
+                locked = False
+            try:
+                start = time.monotonic()
+                value = await func(*args, **kwargs)
+                await _store(cache_key, value, time.monotonic() - start)
+                return value
+            finally:
+                if locked:
+                    try:
+                        await cache.release_lock(cache_key, token)
+                    except Exception as e:
+                        # 锁会在 lock_timeout 后自动过期
+                        logger.warning(f"Failed to release cache lock {cache.lock_key(cache_key)}: {e}")
+
+        def _load_done(cache_key: str, task: asyncio.Task) -> None:
+            if inflight.get(cache_key) is task:
+                del inflight[cache_key]
+            # 所有调用方都已取消时没人取结果，避免 “exception was never retrieved” 警告
+            if not task.cancelled():
+                task.exception()
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = key_for(*args, **kwargs)
+            try:
+                entry = await cache.get_entry(cache_key)
+            except Exception as e:
+                counters["errors"] += 1
+                logger.warning(f"Failed to read cache {cache.key(cache_key)}: {e}")
+                return await func(*args, **kwargs)
+
+            stale = _MISSING
+            if entry is not None:
+                value, delta, expiry = entry
+                if cache_key in inflight or not should_refresh(delta, expiry, beta):
+                    counters["hits"] += 1
+                    return value
+                counters["early_refreshes"] += 1
+                stale = value
+            else:
+                task = inflight.get(cache_key)
+                if task is not None:
+                    counters["coalesced"] += 1
+                    return await asyncio.shield(task)
+                counters["misses"] += 1
+
+            # 回源放在独立任务中：发起调用的请求被取消（客户端断开、超时）时回源继续完成，等待同一 key 的调用方照常拿到结果
+            task = asyncio.create_task(_load(cache_key, stale, args, kwargs))
+            inflight[cache_key] = task
+            task.add_done_callback(functools.partial(_load_done, cache_key))
+            return await asyncio.shield(task)
+
+        async def invalidate(*args, **kwargs) -> None:
+            await cache.delete(key_for(*args, **kwargs))
+
+        def stats() -> Dict[str, float]:
+            lookups = counters["hits"] + counters["misses"] + counters["early_refreshes"]
+            return {
+                **counters,
+                "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+        wrapper.cache = cache
+        wrapper.key_for = key_for
+        wrapper.invalidate = invalidate
+        wrapper.stats = stats
+        return wrapper
+
+    return decorator
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : entity_cache.py
+
+from typing import Any, Awaitable, Callable, Dict, Generic, Optional, Type, TypeVar
+
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+from redis.asyncio import Redis
+from package.redis.cache import AsyncRedisCache
+from package.redis.near_cache import MISSING, CacheInvalidator, LocalCache, get_cache_invalidator
+
+T = TypeVar("T", bound=BaseModel)
+
+# 负缓存标记：实体不存在（合法实体的 JSON 不会是 null）
+_NEGATIVE = b"null"
+
+
+class EntityCache(Generic[T]):
+    """
+    按 id 缓存 pydantic 实体的读穿透缓存（基于 AsyncRedisCache，key 为 kido:cache:{name}:{id}）
+    - get_or_load 未命中时调用 loader 读库并回填；loader 返回 None 时写入负缓存（negative_ttl），
+      避免不存在的 id 每次都打到数据库
+    - 回填使用 SET NX，只填补空缺：回源期间 set 写入的新值不会被读到的旧值覆盖
+    - 写库后调用 set（写穿透）或 invalidate，保证下一次读到新值
+    - Redis 不可用时直接回源，不影响业务
+    - 传入 local 时在 Redis 前加一层进程内近端缓存，set / invalidate 通过 CacheInvalidator 广播到所有 pod；
+      失效订阅未就绪时跳过本地层；本地命中返回的是同一个实体对象，调用方不要修改
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: Type[T],
+        ttl: int,
+        negative_ttl: int,
+        new_func: Callable[[], Redis] | None = None,
+        local: Optional[LocalCache] = None,
+        invalidator: Optional[CacheInvalidator] = None,
+    ):
+        self.name = name
+        self.model = model
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.new_func = new_func
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.local = local
+        self.invalidator = None
+        if local is not None:
+            self.invalidator = invalidator or get_cache_invalidator()
+            self.invalidator.register(name, local)
+
+    def _cache(self, entity_id: str) -> AsyncRedisCache:
+        return AsyncRedisCache(key=f"{self.name}:{entity_id}", new_func=self.new_func, timeout=self.ttl)
+
+    def _local_ready(self) -> bool:
+        return self.local is not None and self.invalidator.ready
+
+    def _fill_local(self, entity_id: str, entity: Optional[T], size: int, version: int) -> None:
+        # 读 Redis / 回源期间发生过失效时，读到的可能是旧值，不放进本地缓存
+        if self._local_ready() and self.invalidator.version == version:
+            ttl = self.negative_ttl if entity is None else self.ttl
+            self.local.put(entity_id, entity, size, ttl=ttl)
+
+    async def get_or_load(self, entity_id: str, loader: Callable[[], Awaitable[Optional[T]]]) -> Optional[T]:
+        version = 0
+        if self._local_ready():
+            entity = self.local.get(entity_id)
+            if entity is not MISSING:
+                return entity
+            version = self.invalidator.version
+
+        cache = self._cache(entity_id)
+        try:
+            raw = await cache.get()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Failed to read {self.name} cache: {e}")
+            return await loader()
+
+        if raw == _NEGATIVE:
+            self.negative_hits += 1
+            self._fill_local(entity_id, None, len(raw), version)
+            return None
+        if raw is not None:
+            try:
+                entity = self.model.model_validate_json(raw)
+                self.hits += 1
+                self._fill_local(entity_id, entity, len(raw), version)
+                return entity
+            except ValidationError:
+                # 模型字段变更后的旧缓存，删除后按未命中处理，回填才能写入
+                logger.warning(f"Discard stale {self.name} cache entry: {entity_id}")
+                try:
+                    await cache.delete()
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Failed to discard stale {self.name} cache entry: {e}")
+
+        self.misses += 1
+        entity = await loader()
+        payload = await self._store(entity_id, entity, fill=True)
+        if payload is not None:
+            self._fill_local(entity_id, entity, len(payload), version)
+        return entity
+
+    async def _store(self, entity_id: str, entity: Optional[T], fill: bool = False) -> Optional[bytes]:
+        """
+        写入 Redis，返回写入的内容；写入失败返回 None
+        fill=True 为读穿透回填，key 已存在（回源期间被 set 写入）时不覆盖，同样返回 None
+        """
+        try:
+            if entity is None:
+                payload, timeout = _NEGATIVE, self.negative_ttl
+            else:
+                payload, timeout = entity.model_dump_json().encode(), self.ttl
+            if not await self._cache(entity_id).set(payload, timeout=timeout, nx=fill):
+                return None
+            return payload
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Failed to write {self.name} cache: {e}")
+            return None
+
+    async def _broadcast(self, entity_id: str) -> None:
+        if self.invalidator is None:
+            return
+        try:
+            await self.invalidator.invalidate(self.name, [entity_id])
+        except Exception as e:
+            # 其它 pod 的本地条目最多在 local.ttl 后过期
+            self.errors += 1
+            logger.warning(f"Failed to broadcast {self.name} cache invalidation: {e}")
+
+    async def set(self, entity_id: str, entity: Optional[T]) -> None:
+        """写入缓存；entity 为 None 时写入负缓存"""
+        await self._store(entity_id, entity)
+        await self._broadcast(entity_id)
+
+    async def invalidate(self, entity_id: str) -> None:
+        try:
+            await self._cache(entity_id).delete()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Failed to invalidate {self.name} cache: {e}")
+        await self._broadcast(entity_id)
+
+    def stats(self) -> Dict[str, Any]:
+        local_hits = self.local.hits if self.local is not None else 0
+        lookups = local_hits + self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round((local_hits + self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            "local": self.local.stats() if self.local is not None else None,
+        }
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : near_cache.py
+
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+from core.config.settings import settings
+from package.redis.client import new_asyncio_redis_client
+
+# 本地缓存未命中（缓存的值本身可能是 None）
+MISSING = object()
+
+
+class LocalCache:
+    """
+    进程内 LRU + TTL 缓存（Redis 前面的近端缓存）
+    - 同时按条数（max_entries）和估算字节数（max_bytes，调用方传入值的序列化大小）限制，超出时淘汰最久未用的条目
+    - 每个条目最多保留 ttl 秒，作为失效广播丢失时的兜底
+    只在事件循环线程中使用，不加锁
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return MISSING
+        value, _, expires_at = item
+        if time.monotonic() >= expires_at:
+            self.pop(key)
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any, size: int, ttl: Optional[float] = None) -> None:
+        """写入条目；ttl 不能超过构造时的 ttl（用于跟随 Redis 中更短的过期时间，如负缓存）"""
+        self.pop(key)
+        if size > self.max_bytes:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (value, size, time.monotonic() + ttl)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class CacheInvalidator:
+    """
+    近端缓存的跨 pod 失效广播（Redis pub/sub）
+    - 写缓存 / 删缓存的一方先清掉本地条目，再向 CHANNEL 发布 {origin, namespace, keys}，其它 pod 收到后删除本地条目
+    - 订阅未建立（启动中、断线重连）时 ready=False，近端缓存不读不写，全部走 Redis；
+      每次（重新）订阅成功都会清空所有本地缓存，断线期间错过的失效消息不会留下脏数据
+    - version 在每次本地失效时递增：从 Redis 读值期间发生过失效，则不把读到的（可能是旧的）值放进本地缓存
+    """
+
+    def __init__(self, redis_factory=None, config=None):
+        self.redis_factory = redis_factory or new_asyncio_redis_client
+        self.config = config or settings.near_cache
+        self.origin = uuid.uuid4().hex
+        self._locals: Dict[str, LocalCache] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.version = 0
+        self.published = 0
+        self.received = 0
+
+    def register(self, namespace: str, local: LocalCache) -> None:
+        self._locals[namespace] = local
+
+    def _evict(self, namespace: str, keys: Iterable[str]) -> None:
+        local = self._locals.get(namespace)
+        self.version += 1
+        if local is not None:
+            for key in keys:
+                local.pop(key)
+
+    def _clear_all(self) -> None:
+        self.version += 1
+        for local in self._locals.values():
+            local.clear()
+
+    async def invalidate(self, namespace: str, keys: Iterable[str]) -> None:
+        """清除本地条目并通知其它 pod"""
+        keys = [str(key) for key in keys]
+        self._evict(namespace, keys)
+        message = json.dumps({"origin": self.origin, "namespace": namespace, "keys": keys})
+        async with self.redis_factory() as redis_client:
+            await redis_client.publish(self.config.CHANNEL, message)
+        self.published += 1
+
+    def handle(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+            origin, namespace, keys = message["origin"], message["namespace"], message["keys"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Drop malformed cache invalidation message: {data[:200]!r}")
+            return
+        if origin == self.origin:
+            return
+        self.received += 1
+        self._evict(namespace, keys)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.redis_factory() as redis_client:
+                    pubsub = redis_client.pubsub()
+                    try:
+                        await pubsub.subscribe(self.config.CHANNEL)
+                        while True:
+                            message = await pubsub.get_message(timeout=1.0)
+                            if message is None:
+                                continue
+                            if message["type"] == "subscribe":
+                                # 订阅确认之前的失效消息收不到，清空后再启用本地缓存
+                                self._clear_all()
+                                self.ready = True
+                                logger.info(f"Near cache invalidation subscribed on '{self.config.CHANNEL}'")
+                            elif message["type"] == "message":
+                                self.handle(message["data"])
+                    finally:
+                        self.ready = False
+                        await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Near cache invalidation subscriber failed, retry in {self.config.RECONNECT_DELAY}s: {e}")
+                await asyncio.sleep(self.config.RECONNECT_DELAY)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen(), name="near-cache-invalidation")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.ready = False
+        self._clear_all()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "published": self.published,
+            "received": self.received,
+            "caches": {namespace: local.stats() for namespace, local in self._locals.items()},
+        }
+
+
+_invalidator: Optional[CacheInvalidator] = None
+
+
+def get_cache_invalidator() -> CacheInvalidator:
+    """获取全局近端缓存失效广播（单例）"""
+    global _invalidator
+    if _invalidator is None:
+        _invalidator = CacheInvalidator()
+    return _invalidator
+
+
+def new_local_cache() -> Optional[LocalCache]:
+    """按 NEAR_CACHE_ 配置创建本地缓存，未开启时返回 None"""
+    config = settings.near_cache
+    if not config.ENABLED:
+        return None
+    return LocalCache(max_entries=config.MAX_ENTRIES, max_bytes=config.MAX_BYTES, ttl=config.TTL)
+
+
+async def start_cache_invalidator() -> None:
+    """订阅失效广播（应用启动时调用，NEAR_CACHE_ENABLED 关闭时不启动）"""
+    if settings.near_cache.ENABLED:
+        get_cache_invalidator().start()
+
+
+async def stop_cache_invalidator() -> None:
+    """停止订阅并清空本地缓存（应用关闭时调用）"""
+    if _invalidator is not None:
+        await _invalidator.stop()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : serializers.py
+
+import pickle
+from typing import Any, Callable, Dict, NamedTuple
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时不能使用 orjson 序列化
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，未安装时不能使用 msgpack 序列化
+    msgpack = None
+
+PICKLE = "pickle"
+ORJSON = "orjson"
+MSGPACK = "msgpack"
+
+
+class Serializer(NamedTuple):
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+def _pickle() -> Serializer:
+    # 缓存只由本服务写入，可以还原任意对象（pydantic 模型、ORM 之外的普通类等）
+    return Serializer(PICKLE, lambda value: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads)
+
+
+def _orjson() -> Serializer:
+    if orjson is None:
+        raise ValueError("orjson serializer requires the orjson package")
+    # pydantic 模型按字段字典编码，读出后是 dict
+    return Serializer(ORJSON, lambda value: orjson.dumps(value, default=_model_dump), orjson.loads)
+
+
+def _msgpack() -> Serializer:
+    if msgpack is None:
+        raise ValueError("msgpack serializer requires the msgpack package")
+    return Serializer(
+        MSGPACK,
+        lambda value: msgpack.packb(value, default=_model_dump, use_bin_type=True),
+        lambda raw: msgpack.unpackb(raw, raw=False),
+    )
+
+
+def _model_dump(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+_FACTORIES: Dict[str, Callable[[], Serializer]] = {
+    PICKLE: _pickle,
+    ORJSON: _orjson,
+    MSGPACK: _msgpack,
+}
+
+
+def get_serializer(name: str) -> Serializer:
+    """按名称获取缓存值序列化方式：pickle（默认，可还原任意对象）/ orjson / msgpack（JSON 兼容类型，体积更小、跨语言）"""
+    factory = _FACTORIES.get(name)
+    if factory is None:
+        raise ValueError(f"Unsupported cache serializer: {name}")
+    return factory()
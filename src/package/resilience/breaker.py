@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : breaker.py
+
+import time
+from typing import Any, Dict
+
+from loguru import logger
+from package.resilience.errors import CircuitOpenError
+
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    - CLOSED：正常放行，连续失败 failure_threshold 次后打开
+    - OPEN：直接拒绝，recovery_timeout 秒后进入半开
+    - HALF_OPEN：最多放行 half_open_max_calls 个探测调用，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.opened_count = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def allow(self) -> None:
+        """申请一次调用许可，不允许时抛出 CircuitOpenError"""
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return
+        if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.name, "circuit open")
+
+    def release(self) -> None:
+        """归还未产生结果（如被取消）的半开探测名额"""
+        if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        if self._state != CircuitState.CLOSED:
+            logger.info(f"Circuit breaker {self.name} closed")
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self._state == CircuitState.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        if self._state != CircuitState.OPEN:
+            self.opened_count += 1
+            logger.warning(f"Circuit breaker {self.name} opened after {self._consecutive_failures} consecutive failures")
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "opened_count": self.opened_count,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : bulkhead.py
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from package.resilience.errors import BulkheadFullError
+
+
+class Bulkhead:
+    """
+    并发舱壁：限制单个依赖同时在途的调用数
+    舱壁满时最多等待 max_wait 秒，超时立即失败，避免慢依赖占满整个进程的并发
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait: Optional[float] = 0.0):
+        if max_concurrent <= 0:
+            raise ValueError("max_concurrent must be positive")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def _acquire(self, max_wait: Optional[float]) -> None:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+        if max_wait is not None and max_wait <= 0:
+            self.rejected += 1
+            raise BulkheadFullError(self.name, f"bulkhead full ({self.max_concurrent} in flight)")
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BulkheadFullError(self.name, f"bulkhead full ({self.max_concurrent} in flight)") from None
+
+    @asynccontextmanager
+    async def acquire(self, max_wait: Optional[float] = None) -> AsyncIterator[None]:
+        """max_wait 只能收紧构造时的等待上限（如受请求剩余时间约束）"""
+        wait = self.max_wait
+        if max_wait is not None:
+            wait = max_wait if wait is None else min(wait, max_wait)
+        await self._acquire(wait)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
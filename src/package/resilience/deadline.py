@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : deadline.py
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# 当前请求的截止时间（time.monotonic()），随 contextvars 传递到请求内创建的所有协程 / 任务
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+def get_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """当前请求剩余的秒数；没有截止时间时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def effective_timeout(timeout: Optional[float]) -> Optional[float]:
+    """取调用自身超时与请求剩余时间中较小者"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if timeout is None:
+        return left
+    return min(timeout, left)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    在 seconds 秒后到期的截止时间内执行；嵌套时只会收紧，不会放宽外层截止时间
+    seconds 为 None 时沿用外层截止时间
+    """
+    current = _deadline.get()
+    deadline = current
+    if seconds is not None:
+        deadline = time.monotonic() + seconds
+        if current is not None:
+            deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def no_deadline() -> Iterator[None]:
+    """脱离当前请求的截止时间（用于请求中启动、生命周期长于请求的后台任务）"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
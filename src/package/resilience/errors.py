@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : errors.py
+
+
+class ResilienceError(Exception):
+    """调用被熔断器 / 舱壁 / 截止时间快速拒绝，未真正发往下游"""
+
+    def __init__(self, dependency: str, message: str):
+        self.dependency = dependency
+        super().__init__(f"{dependency}: {message}")
+
+
+class CircuitOpenError(ResilienceError):
+    """熔断器处于打开状态"""
+
+
+class BulkheadFullError(ResilienceError):
+    """并发舱壁已满且等待超时"""
+
+
+class DeadlineExceededError(ResilienceError):
+    """请求剩余时间已耗尽"""
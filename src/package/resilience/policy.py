@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : policy.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from package.resilience.breaker import CircuitBreaker
+from package.resilience.bulkhead import Bulkhead
+from package.resilience.deadline import effective_timeout
+from package.resilience.errors import DeadlineExceededError, ResilienceError
+
+T = TypeVar("T")
+
+
+def _always_failure(exc: BaseException) -> bool:
+    return True
+
+
+class ResiliencePolicy:
+    """
+    单个外部依赖的调用策略：截止时间检查 -> 并发舱壁 -> 熔断器 -> 超时
+    被快速拒绝（ResilienceError）时若提供了 fallback 则返回降级结果；is_failure 决定哪些异常计入熔断
+    超时只有在受自身 timeout 约束时才计入熔断；受请求剩余时间约束的超时是调用方的预算不足，抛出 DeadlineExceededError
+    """
+
+    def __init__(
+        self,
+        name: str,
+        breaker: CircuitBreaker,
+        bulkhead: Bulkhead,
+        timeout: Optional[float] = None,
+        is_failure: Callable[[BaseException], bool] = _always_failure,
+    ):
+        self.name = name
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        self.timeout = timeout
+        self.is_failure = is_failure
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.fallbacks = 0
+
+    async def call(
+        self,
+        func: Callable[..., Awaitable[T]],
+        *args: Any,
+        fallback: Optional[Callable[[ResilienceError], Any]] = None,
+        **kwargs: Any,
+    ) -> T:
+        try:
+            return await self._call(func, *args, **kwargs)
+        except ResilienceError as e:
+            if fallback is None:
+                raise
+            self.fallbacks += 1
+            result = fallback(e)
+            return await result if asyncio.iscoroutine(result) else result
+
+    async def _call(self, func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        timeout = effective_timeout(self.timeout)
+        if timeout is not None and timeout <= 0:
+            raise DeadlineExceededError(self.name, "request deadline exceeded")
+        async with self.bulkhead.acquire(max_wait=timeout):
+            # 拿到舱壁名额后再申请熔断许可，半开探测名额只会被真正发出的调用占用
+            self.breaker.allow()
+            self.calls += 1
+            call_timeout = effective_timeout(self.timeout)
+            try:
+                result = await asyncio.wait_for(func(*args, **kwargs), timeout=call_timeout)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except asyncio.TimeoutError as e:
+                if self.timeout is None or call_timeout < self.timeout:
+                    # 请求截止时间先到：下游未必有问题，不计入熔断
+                    self.breaker.release()
+                    raise DeadlineExceededError(self.name, "request deadline exceeded") from e
+                self.timeouts += 1
+                self.failures += 1
+                self.breaker.record_failure()
+                raise
+            except Exception as e:
+                if self.is_failure(e):
+                    self.failures += 1
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "timeout": self.timeout,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "fallbacks": self.fallbacks,
+            "breaker": self.breaker.snapshot(),
+            "bulkhead": self.bulkhead.snapshot(),
+        }
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : segment_log.py
+
+import os
+import struct
+import threading
+import zlib
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+# 记录头：payload 长度 + crc32（大端）
+_HEADER = struct.Struct(">II")
+_SEGMENT_SUFFIX = ".seg"
+_CHECKPOINT_FILE = "checkpoint"
+
+# (段序号, 段内偏移)
+Position = Tuple[int, int]
+
+
+class SegmentLog:
+    """
+    磁盘追加日志（按段滚动）
+    - 记录格式：长度 + crc32 + payload，进程崩溃留下的半条记录在读取时被忽略
+    - 读取位置保存在 checkpoint 文件中，重启后从上次确认的位置继续按顺序回放；已读完的段直接删除
+    - 总大小超过 max_bytes 时丢弃最旧的段（计入 dropped），保证磁盘占用有上限
+    所有方法都是同步阻塞的文件 IO，在事件循环中应通过 asyncio.to_thread 调用；内部加锁，可跨线程使用
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, segment_bytes: int = 8 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self.dropped_records = 0
+        os.makedirs(directory, exist_ok=True)
+        self._segments: List[int] = sorted(
+            int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(directory) if name.endswith(_SEGMENT_SUFFIX)
+        )
+        self._read_pos: Position = self._load_checkpoint()
+        self._writer = None
+        self._writer_seq: Optional[int] = None
+        self._bytes = sum(os.path.getsize(self._path(seq)) for seq in self._segments)
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:020d}{_SEGMENT_SUFFIX}")
+
+    def _load_checkpoint(self) -> Position:
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT_FILE), "r") as f:
+                seq, offset = f.read().split()
+            position = (int(seq), int(offset))
+        except (OSError, ValueError):
+            position = (self._segments[0], 0) if self._segments else (0, 0)
+        # checkpoint 指向的段已被删除（如超限丢弃）时，从最旧的现存段开始
+        if self._segments and position[0] < self._segments[0]:
+            position = (self._segments[0], 0)
+        return position
+
+    def _save_checkpoint(self) -> None:
+        path = os.path.join(self.directory, _CHECKPOINT_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{self._read_pos[0]} {self._read_pos[1]}")
+        os.replace(tmp, path)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def has_pending(self) -> bool:
+        """是否还有未回放的记录"""
+        with self._lock:
+            if not self._segments:
+                return False
+            last = self._segments[-1]
+            seq, offset = self._read_pos
+            return seq < last or offset < os.path.getsize(self._path(last))
+
+    def _open_writer(self) -> None:
+        if self._writer is not None and self._writer.tell() < self.segment_bytes:
+            return
+        if self._writer is not None:
+            self._writer.close()
+        seq = self._segments[-1] + 1 if self._segments else max(self._read_pos[0], 1)
+        self._segments.append(seq)
+        self._writer = open(self._path(seq), "ab")
+        self._writer_seq = seq
+
+    def _enforce_cap(self) -> None:
+        # 至少保留正在写的段
+        while self._bytes > self.max_bytes and len(self._segments) > 1:
+            seq = self._segments.pop(0)
+            path = self._path(seq)
+            size = os.path.getsize(path)
+            start = self._read_pos[1] if self._read_pos[0] == seq else 0
+            self.dropped_records += self._count_records(path, start)
+            os.remove(path)
+            self._bytes -= size
+            if self._read_pos[0] <= seq:
+                self._read_pos = (self._segments[0], 0)
+                self._save_checkpoint()
+            logger.warning(f"Spill log {self.directory} over {self.max_bytes} bytes, dropped segment {seq}")
+
+    @staticmethod
+    def _count_records(path: str, offset: int) -> int:
+        count = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return count
+                length, _ = _HEADER.unpack(header)
+                f.seek(length, os.SEEK_CUR)
+                count += 1
+
+    def append(self, records: List[bytes], sync: bool = False) -> None:
+        """追加一批记录；sync=True 时 fsync 落盘"""
+        if not records:
+            return
+        data = b"".join(_HEADER.pack(len(r), zlib.crc32(r)) + r for r in records)
+        with self._lock:
+            self._open_writer()
+            self._writer.write(data)
+            self._writer.flush()
+            if sync:
+                os.fsync(self._writer.fileno())
+            self._bytes += len(data)
+            self._enforce_cap()
+
+    def read(self, max_records: int) -> Tuple[List[bytes], Position]:
+        """从 checkpoint 开始按顺序读取最多 max_records 条记录，返回记录和读完后的位置（需 commit 确认）"""
+        records: List[bytes] = []
+        with self._lock:
+            seq, offset = self._read_pos
+            for segment in [s for s in self._segments if s >= seq]:
+                if segment != seq:
+                    seq, offset = segment, 0
+                with open(self._path(segment), "rb") as f:
+                    f.seek(offset)
+                    while len(records) < max_records:
+                        header = f.read(_HEADER.size)
+                        if len(header) < _HEADER.size:
+                            break
+                        length, crc = _HEADER.unpack(header)
+                        payload = f.read(length)
+                        if len(payload) < length:
+                            # 写入中途崩溃留下的半条记录
+                            break
+                        if zlib.crc32(payload) != crc:
+                            logger.error(f"Corrupted record in spill segment {segment} at offset {offset}, skip segment")
+                            offset = os.path.getsize(self._path(segment))
+                            break
+                        records.append(payload)
+                        offset = f.tell()
+                if len(records) >= max_records:
+                    break
+        return records, (seq, offset)
+
+    def commit(self, position: Position) -> None:
+        """确认 position 之前的记录已处理，删除已读完的段"""
+        with self._lock:
+            self._read_pos = position
+            while self._segments and self._segments[0] < position[0]:
+                seq = self._segments.pop(0)
+                self._bytes -= os.path.getsize(self._path(seq))
+                os.remove(self._path(seq))
+            # 当前段也已读完时一并删除（写入段先关闭，下次追加时新建段）
+            seq, offset = position
+            if self._segments and self._segments[0] == seq and offset >= os.path.getsize(self._path(seq)):
+                if seq == self._writer_seq:
+                    self._writer.close()
+                    self._writer = None
+                    self._writer_seq = None
+                self._segments.pop(0)
+                self._bytes -= os.path.getsize(self._path(seq))
+                os.remove(self._path(seq))
+                # 段已全部删除时指向下一个新建的段
+                self._read_pos = (self._segments[0], 0) if self._segments else (seq + 1, 0)
+            self._save_checkpoint()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+                self._writer_seq = None
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : aho_corasick.py
+
+from collections import deque
+from typing import Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class AhoCorasick(Generic[V]):
+    """
+    Aho-Corasick 多模式匹配自动机
+    构建一次后，单次扫描即可找出文本中出现的所有关键词，耗时与文本长度线性相关，与词表大小无关
+    匹配不区分大小写；每个关键词可以携带一个附加值（如所属规则类别）
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个节点命中的 (关键词, 附加值)，build 时会合并失败链上的输出
+        self._output: List[List[Tuple[str, V]]] = [[]]
+        self._size = 0
+        self._built = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, word: str, value: V) -> None:
+        if self._built:
+            raise RuntimeError("cannot add words after build()")
+        word = word.lower()
+        if not word:
+            return
+        node = 0
+        for char in word:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append((word, value))
+        self._size += 1
+
+    def build(self) -> "AhoCorasick[V]":
+        """按 BFS 计算失败指针"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._built = True
+        return self
+
+    def iter(self, text: str) -> Iterator[Tuple[int, str, V]]:
+        """依次产出 (结束位置, 关键词, 附加值)"""
+        if not self._built:
+            raise RuntimeError("call build() before matching")
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for index, char in enumerate(text.lower()):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                for word, value in output[node]:
+                    yield index, word, value
+
+    def find_first(self, text: str) -> Optional[Tuple[int, str, V]]:
+        return next(self.iter(text), None)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : domain.py
+
+import fnmatch
+import re
+from typing import Iterator, List, Optional, Pattern, Set
+
+# 文本中的网址 / 裸域名（仅 ASCII 域名）
+_HOST_PATTERN = re.compile(
+    r"(?:[a-z][a-z0-9+.-]*://)?((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63})(?![a-z0-9-])",
+    re.IGNORECASE,
+)
+
+
+class WildcardDomainMatcher:
+    """
+    域名通配匹配
+    - "*.example.com" 匹配 example.com 及其任意子域名，"*.tk" 匹配整个顶级域
+    - 不含通配符的规则精确匹配域名
+    - 其它通配写法（如 "ads*.example.com"）回退为 fnmatch
+    前两类规则按后缀逐级查集合，匹配耗时只与域名层级数相关
+    """
+
+    def __init__(self, patterns: Optional[List[str]] = None):
+        self._suffixes: Set[str] = set()
+        self._exact: Set[str] = set()
+        self._globs: List[Pattern] = []
+        for pattern in patterns or []:
+            self.add(pattern)
+
+    def __len__(self) -> int:
+        return len(self._suffixes) + len(self._exact) + len(self._globs)
+
+    def add(self, pattern: str) -> None:
+        pattern = pattern.strip().lower()
+        # 规则中可能带协议或路径，只保留域名部分
+        pattern = pattern.split("://", 1)[-1].split("/", 1)[0]
+        if not pattern:
+            return
+        if pattern.startswith("*.") and not any(c in pattern[2:] for c in "*?["):
+            self._suffixes.add(pattern[2:])
+        elif not any(c in pattern for c in "*?["):
+            self._exact.add(pattern)
+        else:
+            self._globs.append(re.compile(fnmatch.translate(pattern)))
+
+    def match_host(self, host: str) -> bool:
+        host = host.lower().rstrip(".")
+        if host in self._exact:
+            return True
+        if self._suffixes:
+            labels = host.split(".")
+            for i in range(len(labels)):
+                if ".".join(labels[i:]) in self._suffixes:
+                    return True
+        return any(glob.match(host) for glob in self._globs)
+
+    @staticmethod
+    def extract_hosts(text: str) -> Iterator[str]:
+        # 绝大多数文本不含 "."，直接跳过正则
+        if "." not in text:
+            return iter(())
+        return (match.group(1) for match in _HOST_PATTERN.finditer(text))
+
+    def find_first(self, text: str) -> Optional[str]:
+        """返回文本中第一个命中规则的域名"""
+        for host in self.extract_hosts(text):
+            if self.match_host(host):
+                return host
+        return None
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : parser.py
+"""
+微信推送 XML 快速解析
+微信服务器推送的是扁平信封：<xml> 下一层子元素，取值为文本或 CDATA。这里按顺序扫描字符串，不构建元素树。
+- 只接受 <?xml ...?> 声明，拒绝 DOCTYPE / ENTITY 等 DTD 声明，文本中只展开 XML 预定义实体和字符引用，杜绝实体膨胀（XML 炸弹）
+- 限制报文大小与字段个数
+- 遇到嵌套元素（如 ScanCodeInfo）时回退到 ElementTree，结果与 ET 解析一致：{子元素标签: 文本}
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, Optional, Union
+
+MAX_PAYLOAD_SIZE = 64 * 1024
+MAX_FIELDS = 64
+
+# 一个扁平字段：<Tag/>、<Tag><![CDATA[...]]></Tag> 或 <Tag>text</Tag>
+_FIELD_RE = re.compile(r"\s*<([A-Za-z_][\w.\-]*)(?:/>|>(?:<!\[CDATA\[(.*?)\]\]>|([^<]*))</\1>)", re.S)
+_END_RE = re.compile(r"\s*</xml>\s*\Z")
+_ENTITY_RE = re.compile(r"&(#[0-9]+|#x[0-9a-fA-F]+|amp|lt|gt|quot|apos);")
+_PREDEFINED_ENTITIES = {"amp": "&", "lt": "<", "gt": ">", "quot": '"', "apos": "'"}
+
+
+class WechatXmlError(ValueError):
+    """推送报文不是合法的微信 XML 信封"""
+
+
+class _NestedElement(Exception):
+    """信封中存在嵌套元素，需要回退到 ElementTree"""
+
+
+class WechatEvent:
+    """微信推送事件，常用字段带类型，其余字段保留在 fields 中"""
+
+    __slots__ = ("to_user_name", "from_user_name", "create_time", "msg_type", "event", "event_key", "msg_id", "fields")
+
+    def __init__(self, fields: Dict[str, Optional[str]]):
+        self.fields = fields
+        self.to_user_name: Optional[str] = fields.get("ToUserName")
+        self.from_user_name: Optional[str] = fields.get("FromUserName")
+        self.msg_type: Optional[str] = fields.get("MsgType")
+        self.event: Optional[str] = fields.get("Event")
+        self.event_key: Optional[str] = fields.get("EventKey")
+        self.msg_id: Optional[str] = fields.get("MsgId") or fields.get("MsgID")
+        create_time = fields.get("CreateTime")
+        self.create_time: int = int(create_time) if create_time and create_time.isdigit() else 0
+
+    def __repr__(self) -> str:
+        return (
+            f"WechatEvent(msg_type={self.msg_type!r}, event={self.event!r}, "
+            f"from_user_name={self.from_user_name!r}, create_time={self.create_time})"
+        )
+
+
+def _is_xml_char(code: int) -> bool:
+    # XML 1.0 Char：#x9 | #xA | #xD | [#x20-#xD7FF] | [#xE000-#xFFFD] | [#x10000-#x10FFFF]
+    return (
+        code in (0x9, 0xA, 0xD)
+        or 0x20 <= code <= 0xD7FF
+        or 0xE000 <= code <= 0xFFFD
+        or 0x10000 <= code <= 0x10FFFF
+    )
+
+
+def _unescape(text: str) -> str:
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name[0] != "#":
+            return _PREDEFINED_ENTITIES[name]
+        try:
+            code = int(name[2:], 16) if name[1] == "x" else int(name[1:])
+        except ValueError as e:
+            # 位数超过 int 解析上限
+            raise WechatXmlError(f"Invalid character reference: &{name[:16]};") from e
+        if not _is_xml_char(code):
+            # 与 ElementTree 一致：&#0;、代理区、超出 Unicode 范围的字符引用都不合法
+            raise WechatXmlError(f"Invalid character reference: &{name[:16]};")
+        return chr(code)
+
+    unescaped = _ENTITY_RE.sub(replace, text)
+    if "&" in _ENTITY_RE.sub("", text):
+        raise WechatXmlError("Undefined entity reference")
+    return unescaped
+
+
+def _skip_prolog(text: str) -> int:
+    pos = len(text) - len(text.lstrip())
+    if text.startswith("<?xml", pos):
+        end = text.find("?>", pos)
+        if end < 0:
+            raise WechatXmlError("Unterminated XML declaration")
+        pos = end + 2
+        pos += len(text[pos:]) - len(text[pos:].lstrip())
+    if text.startswith("<!", pos):
+        # DOCTYPE / ENTITY 声明是实体膨胀攻击的入口，微信推送从不携带
+        raise WechatXmlError("DTD declarations are not allowed")
+    if not text.startswith("<xml>", pos):
+        raise WechatXmlError("Missing <xml> root element")
+    return pos + len("<xml>")
+
+
+def _scan(text: str, pos: int) -> Dict[str, Optional[str]]:
+    fields: Dict[str, Optional[str]] = {}
+    match_field = _FIELD_RE.match
+    while True:
+        match = match_field(text, pos)
+        if match is None:
+            break
+        tag, cdata, value = match.groups()
+        if cdata is not None:
+            value = cdata
+        elif value and "&" in value:
+            value = _unescape(value)
+        fields[tag] = value or None
+        if len(fields) > MAX_FIELDS:
+            raise WechatXmlError(f"Too many fields (> {MAX_FIELDS})")
+        pos = match.end()
+
+    if _END_RE.match(text, pos):
+        return fields
+    rest = text[pos:].lstrip()
+    if rest.startswith("<!"):
+        raise WechatXmlError("Declarations are not allowed inside the envelope")
+    if rest.startswith("<") and not rest.startswith("</"):
+        # 嵌套元素、属性等非扁平结构
+        raise _NestedElement()
+    raise WechatXmlError(f"Unexpected content at offset {pos}")
+
+
+def _parse_with_element_tree(text: str) -> Dict[str, Optional[str]]:
+    # 调用前已经确认没有 DTD，ElementTree 只会展开预定义实体
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as e:
+        raise WechatXmlError(str(e)) from e
+    if len(root) > MAX_FIELDS:
+        raise WechatXmlError(f"Too many fields (> {MAX_FIELDS})")
+    return {child.tag: child.text for child in root}
+
+
+def parse_wechat_xml(data: Union[bytes, str], max_size: int = MAX_PAYLOAD_SIZE) -> Dict[str, Optional[str]]:
+    """解析微信推送 XML，返回 {字段名: 文本}"""
+    if len(data) > max_size:
+        raise WechatXmlError(f"Payload too large ({len(data)} > {max_size})")
+    if isinstance(data, bytes):
+        try:
+            data = data.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise WechatXmlError(str(e)) from e
+
+    pos = _skip_prolog(data)
+    try:
+        return _scan(data, pos)
+    except _NestedElement:
+        return _parse_with_element_tree(data)
+
+
+def parse_wechat_event(data: Union[bytes, str], max_size: int = MAX_PAYLOAD_SIZE) -> WechatEvent:
+    """解析微信推送 XML，返回事件对象"""
+    return WechatEvent(parse_wechat_xml(data, max_size))
@@ -2,11 +2,31 @@
 # -*- coding: utf-8 -*-
 # @File    : devices.py
 from os import wait3
-from typing import List, Sequence
+from typing import List, Optional, Sequence
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from core.config.settings import settings
+from entity.devices import DeviceInfo as DeviceInfoEntity
+from package.redis.entity_cache import EntityCache
+from package.redis.near_cache import new_local_cache
 from repositories.model.device_info import DeviceInfo
 
+_device_cache: Optional[EntityCache[DeviceInfoEntity]] = None
+
+
+def get_device_cache() -> Optional[EntityCache[DeviceInfoEntity]]:
+    """设备信息缓存（单例），未开启时返回 None"""
+    global _device_cache
+    if _device_cache is None and settings.device_cache.ENABLED:
+        _device_cache = EntityCache(
+            "device_info",
+            DeviceInfoEntity,
+            ttl=settings.device_cache.TTL,
+            negative_ttl=settings.device_cache.NEGATIVE_TTL,
+            local=new_local_cache(),
+        )
+    return _device_cache
+
 
 class DeviceRepository:
 
@@ -27,8 +47,26 @@ class DeviceRepository:
         self.session.add(device)
         await self.session.commit()
         await self.session.refresh(device)
+        await self._write_cache(device)
         return device
 
+    async def _write_cache(self, device: DeviceInfo) -> None:
+        # 写穿透：覆盖旧值和“不存在”的负缓存
+        cache = get_device_cache()
+        if cache is not None:
+            await cache.set(device.device_id, DeviceInfoEntity.model_validate(device))
+
+    async def get_info(self, device_id: str) -> Optional[DeviceInfoEntity]:
+        """读穿透缓存获取设备信息（只读场景使用；需要修改 ORM 对象时用 get）"""
+        async def load() -> Optional[DeviceInfoEntity]:
+            device = await self.get(device_id)
+            return DeviceInfoEntity.model_validate(device) if device else None
+
+        cache = get_device_cache()
+        if cache is None:
+            return await load()
+        return await cache.get_or_load(device_id, load)
+
     async def get(self, device_id: str) -> DeviceInfo:
         stmt = select(DeviceInfo).where(DeviceInfo.device_id == device_id)
         query = await self.session.execute(stmt)
@@ -58,4 +96,5 @@ class DeviceRepository:
         self.session.add(device)
         await self.session.commit()
         await self.session.refresh(device)
+        await self._write_cache(device)
         return device
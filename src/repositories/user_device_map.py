@@ -3,7 +3,7 @@
 # @File    : user_device_map.py
 
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Sequence
+from typing import Iterable, Optional, Sequence, Set
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from repositories.model.user_device_map import UserDeviceMap
@@ -48,6 +48,21 @@ class UserDeviceMapRepository:
         query = await self.session.execute(stmt)
         return query.scalars().all()
 
+    async def get_bound_device_ids(self, user_id: str, device_ids: Iterable[str]) -> Set[str]:
+        """返回 device_ids 中已绑定到该用户的设备ID（一次查询）"""
+        device_ids = list(device_ids)
+        if not device_ids:
+            return set()
+        stmt = select(UserDeviceMap.device_id).where(
+            and_(
+                UserDeviceMap.user_id == user_id,
+                UserDeviceMap.device_id.in_(device_ids),
+                UserDeviceMap.deleted_at.is_(None)
+            )
+        )
+        query = await self.session.execute(stmt)
+        return set(query.scalars().all())
+
     async def get_by_device_id(self, device_id: str) -> Optional[UserDeviceMap]:
         """根据设备ID获取绑定关系"""
         stmt = select(UserDeviceMap).where(
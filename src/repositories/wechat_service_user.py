@@ -3,10 +3,11 @@
 # @File    : wechat_service_user.py
 
 from datetime import datetime, timezone, timedelta
-from typing import Optional, List
-from sqlalchemy import select, desc
+from typing import Optional, List, Dict, Tuple
+from sqlalchemy import select, desc, update, case
 from db_wrapper import DB_SESSION
 from repositories.model.wechat_service_user import WechatServiceUser
+from repositories.model.userid_unionid_mapping import UseridUnionidMapping
 
 
 class WechatServiceUserRepository:
@@ -68,6 +69,25 @@ class WechatServiceUserRepository:
             query = await self.session.execute(stmt)
         return query.scalars().first()
 
+    async def get_service_openids_by_user_ids(self, user_ids: List[str]) -> Dict[str, str]:
+        """
+        Batch resolve service account openids for user_ids via unionid
+        一次 JOIN 查询完成 user_id -> unionid -> service_openid 的映射
+        """
+        if not user_ids:
+            return {}
+        stmt = select(UseridUnionidMapping.user_id, WechatServiceUser.service_openid).join(
+            WechatServiceUser,
+            WechatServiceUser.unionid == UseridUnionidMapping.unionid
+        ).where(
+            UseridUnionidMapping.user_id.in_(user_ids),
+            UseridUnionidMapping.deleted_at.is_(None),
+            WechatServiceUser.deleted_at.is_(None)
+        )
+        async with self.session.begin():
+            query = await self.session.execute(stmt)
+        return {user_id: service_openid for user_id, service_openid in query.all()}
+
     async def update_unionid(self, service_openid: str, unionid: str) -> Optional[WechatServiceUser]:
         """
         Update unionid
@@ -101,6 +121,38 @@ class WechatServiceUserRepository:
             
             return latest_user
 
+    async def get_openids_missing_unionid(self, after_id: int = 0, limit: int = 1000) -> List[Tuple[int, str]]:
+        """
+        Get (id, service_openid) of active users without unionid
+        按 id 递增分页（keyset），避免一直拿到同一批无法解析的 openid
+        """
+        stmt = select(WechatServiceUser.id, WechatServiceUser.service_openid).where(
+            WechatServiceUser.id > after_id,
+            WechatServiceUser.unionid.is_(None),
+            WechatServiceUser.deleted_at.is_(None)
+        ).order_by(WechatServiceUser.id).limit(limit)
+        async with self.session.begin():
+            query = await self.session.execute(stmt)
+        return [(row_id, service_openid) for row_id, service_openid in query.all()]
+
+    async def bulk_update_unionids(self, unionids: Dict[str, str]) -> int:
+        """
+        Bulk update unionid by service_openid
+        单条 UPDATE ... SET unionid = CASE service_openid WHEN ... END 完成批量回填，只更新 unionid 仍为空的记录
+        """
+        if not unionids:
+            return 0
+        stmt = update(WechatServiceUser).where(
+            WechatServiceUser.service_openid.in_(list(unionids)),
+            WechatServiceUser.unionid.is_(None),
+            WechatServiceUser.deleted_at.is_(None)
+        ).values(
+            unionid=case(unionids, value=WechatServiceUser.service_openid)
+        ).execution_options(synchronize_session=False)
+        async with self.session.begin():
+            result = await self.session.execute(stmt)
+        return result.rowcount
+
     async def soft_delete_by_service_openid(self, service_openid: str) -> Optional[WechatServiceUser]:
         """Soft delete user by service account openid"""
         stmt = select(WechatServiceUser).where(
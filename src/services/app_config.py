@@ -1,10 +1,18 @@
+from typing import Optional
+
+import asyncio
 import aiohttp
 from fastapi import HTTPException
+from loguru import logger
+from package.http.client import get_http_session
+from package.resilience.errors import ResilienceError
+from services.resilience import WHALE, get_dependency_policy
 
 
 class AppConfigService:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, session: Optional[aiohttp.ClientSession] = None):
         self.base_url = base_url
+        self.session = session or get_http_session()
         self.endpoint = f"{base_url}/v1/miniprogram/config"
 
     async def get_config_by_key(self, key: str, version: str = None) -> dict:
@@ -14,20 +22,24 @@ class AppConfigService:
         :param version: 版本号，可选
         :return: 配置数据
         """
-        async with aiohttp.ClientSession() as sess:
-            try:
-                url = f"{self.endpoint}/current"
-                params = {"key": key}
-                if version:
-                    params["version"] = version
-                
-                response = await sess.get(
+        try:
+            url = f"{self.endpoint}/current"
+            params = {"key": key}
+            if version:
+                params["version"] = version
+
+            async def fetch() -> dict:
+                async with self.session.get(
                     url,
                     params=params
-                )
-                response.raise_for_status()
-                result = await response.json()
-                print(result)
-                return result.get('data', result)
-            except aiohttp.ClientError as e:
-                raise HTTPException(status_code=500, detail=f"Error fetching config: {str(e)}") 
\ No newline at end of file
+                ) as response:
+                    response.raise_for_status()
+                    return await response.json()
+
+            result = await get_dependency_policy(WHALE).call(fetch)
+            logger.opt(lazy=True).debug("Fetched app config {}: {}", lambda: key, lambda: result)
+            return result.get('data', result)
+        except ResilienceError as e:
+            raise HTTPException(status_code=503, detail=f"Config service unavailable: {str(e)}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching config: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : content_prefilter.py
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+from core.config.settings import settings
+from entity.weixin import ContentSecurityLabel
+from package.textfilter.aho_corasick import AhoCorasick
+from package.textfilter.domain import WildcardDomainMatcher
+
+URL_FILTER_CATEGORY = "url_filter"
+
+# 本地拒绝时返回给调用方的标签
+CATEGORY_LABELS = {
+    "high_risk": ContentSecurityLabel.OTHER,
+    "sensitive_words": ContentSecurityLabel.OTHER,
+    "political_sensitive": ContentSecurityLabel.POLITICS,
+    "advertisement": ContentSecurityLabel.AD,
+    "contact_info": ContentSecurityLabel.AD,
+    URL_FILTER_CATEGORY: ContentSecurityLabel.AD,
+}
+
+
+class PreFilterVerdict:
+    """本地预过滤结论"""
+    REJECT = "reject"  # 命中高精度规则（high_risk），本地直接拒绝
+    REVIEW = "review"  # 命中宽泛规则（敏感词、网址等），只做标记，交给微信判定
+    CLEAN = "clean"  # 未命中任何规则，交给微信判定
+
+
+class PreFilterResult:
+    __slots__ = ("verdict", "category", "matches")
+
+    def __init__(self, verdict: str, category: Optional[str] = None, matches: Optional[Dict[str, List[str]]] = None):
+        self.verdict = verdict
+        self.category = category
+        self.matches = matches or {}
+
+    @property
+    def label(self) -> int:
+        return CATEGORY_LABELS.get(self.category, ContentSecurityLabel.OTHER)
+
+    def detail(self) -> Dict:
+        return {"strategy": "local_prefilter", "category": self.category, "matches": self.matches}
+
+
+def _read_rules(path: Path) -> List[str]:
+    """每行一条规则，忽略空行与 # 注释，去重并保持顺序"""
+    rules = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            rules.append(line)
+    return list(dict.fromkeys(rules))
+
+
+class ContentPreFilter:
+    """
+    内容安全本地预过滤
+    rules/*.txt 中的关键词构建为一个 Aho-Corasick 自动机，url_filter.txt 构建为域名通配匹配器
+    只有命中 reject 类别（默认仅 high_risk.txt，收录无歧义的违规词）的内容在本地直接拒绝，不再调用 msg_sec_check；
+    宽泛词表（如“黄色”“成人”）和网址规则误伤多，命中后只记录标记，仍由微信判定
+    """
+
+    def __init__(self, keywords: AhoCorasick[str], domains: WildcardDomainMatcher, reject_categories: Iterable[str]):
+        self.keywords = keywords
+        self.domains = domains
+        self.reject_categories = frozenset(reject_categories)
+
+    @classmethod
+    def load(cls, rules_dir: str, reject_categories: Iterable[str]) -> "ContentPreFilter":
+        keywords: AhoCorasick[str] = AhoCorasick()
+        domains = WildcardDomainMatcher()
+        for path in sorted(Path(rules_dir).glob("*.txt")):
+            category = path.stem
+            rules = _read_rules(path)
+            if category == URL_FILTER_CATEGORY:
+                for pattern in rules:
+                    domains.add(pattern)
+            else:
+                for word in rules:
+                    keywords.add(word, category)
+            logger.info(f"Loaded {len(rules)} content filter rules from {path.name}")
+        return cls(keywords.build(), domains, reject_categories)
+
+    def check(self, *texts: Optional[str]) -> PreFilterResult:
+        text = "\n".join(t for t in texts if t)
+        matches: Dict[str, List[str]] = {}
+        for _, word, category in self.keywords.iter(text):
+            words = matches.setdefault(category, [])
+            if word not in words:
+                words.append(word)
+        host = self.domains.find_first(text)
+        if host:
+            matches[URL_FILTER_CATEGORY] = [host]
+
+        if not matches:
+            return PreFilterResult(PreFilterVerdict.CLEAN)
+        for category in matches:
+            if category in self.reject_categories:
+                return PreFilterResult(PreFilterVerdict.REJECT, category, matches)
+        return PreFilterResult(PreFilterVerdict.REVIEW, next(iter(matches)), matches)
+
+
+_prefilter: Optional[ContentPreFilter] = None
+_loaded = False
+
+
+def init_content_prefilter() -> Optional[ContentPreFilter]:
+    """加载规则并构建预过滤器（应用启动时调用）；规则加载失败时不启用预过滤"""
+    global _prefilter, _loaded
+    _loaded = True
+    config = settings.content_filter
+    if not config.ENABLED:
+        _prefilter = None
+        return None
+    try:
+        _prefilter = ContentPreFilter.load(config.RULES_DIR, config.REJECT_CATEGORIES)
+        logger.info(f"Content pre-filter ready: {len(_prefilter.keywords)} keywords, {len(_prefilter.domains)} domain rules")
+    except OSError as e:
+        logger.error(f"Failed to load content filter rules from {config.RULES_DIR}: {e}")
+        _prefilter = None
+    return _prefilter
+
+
+def get_content_prefilter() -> Optional[ContentPreFilter]:
+    """获取全局预过滤器（单例），未启用时返回 None"""
+    if not _loaded:
+        init_content_prefilter()
+    return _prefilter
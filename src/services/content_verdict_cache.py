@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : content_verdict_cache.py
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from core.config.settings import settings
+from entity.weixin import ContentSecuritySuggest, WechatContentSecurityResult
+from package.cache.lru import LRUCache
+from package.redis.client import new_asyncio_redis_client
+
+
+class ContentVerdictCache:
+    """
+    内容安全检查结果缓存
+    键为检查内容（content / scene / title / nickname / signature）的 sha256，与用户无关
+    先查进程内 LRU，再查 Redis；pass / review / risky 使用不同 TTL
+    只有由内容本身决定的错误（ERROR_CODES）做短时负缓存：键与用户无关，openid / token / 网络等错误不能影响其他用户
+    """
+
+    def __init__(self, config=None):
+        self.config = config or settings.content_verdict_cache
+        self.local = LRUCache[Dict[str, Any]](maxsize=self.config.LOCAL_SIZE, ttl=self.config.LOCAL_TTL)
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+    @staticmethod
+    def key(
+        content: str,
+        scene: int,
+        title: Optional[str] = None,
+        nickname: Optional[str] = None,
+        signature: Optional[str] = None,
+    ) -> str:
+        raw = json.dumps([content, scene, title, nickname, signature], ensure_ascii=False)
+        return f"kido:wechat:content_verdict:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def _ttl_for(self, suggest: str) -> int:
+        if suggest == ContentSecuritySuggest.PASS:
+            return self.config.PASS_TTL
+        if suggest == ContentSecuritySuggest.RISKY:
+            return self.config.RISKY_TTL
+        return self.config.REVIEW_TTL
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        返回缓存条目：{"result": {...}} 为检查结果，{"error": "..."} 为负缓存；未命中返回 None
+        """
+        entry = self.local.get(key)
+        if entry is not None:
+            self.local_hits += 1
+        else:
+            try:
+                async with new_asyncio_redis_client() as redis_client:
+                    pipe = redis_client.pipeline(transaction=False)
+                    pipe.get(key)
+                    pipe.ttl(key)
+                    raw, ttl = await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to read content verdict cache: {e}")
+                raw = None
+            if not raw:
+                self.misses += 1
+                return None
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                self.misses += 1
+                return None
+            self.redis_hits += 1
+            # 本地副本不能比 Redis 中活得更久
+            self.local.set(key, entry, ttl=min(ttl, self.config.LOCAL_TTL) if ttl and ttl > 0 else None)
+
+        if "error" in entry:
+            self.negative_hits += 1
+        return entry
+
+    async def _store(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        self.local.set(key, entry, ttl=min(ttl, self.config.LOCAL_TTL))
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.set(key, json.dumps(entry, ensure_ascii=False), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write content verdict cache: {e}")
+
+    async def set_result(self, key: str, result: WechatContentSecurityResult) -> None:
+        await self._store(key, {"result": result.model_dump()}, self._ttl_for(result.suggest))
+
+    def is_cacheable_error(self, errcode: Any) -> bool:
+        return errcode in self.config.ERROR_CODES
+
+    async def set_error(self, key: str, message: str) -> None:
+        await self._store(key, {"error": message}, self.config.ERROR_TTL)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "hit_rate": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else 0,
+            "local_size": len(self.local),
+        }
+
+
+_verdict_cache: Optional[ContentVerdictCache] = None
+
+
+def get_content_verdict_cache() -> Optional[ContentVerdictCache]:
+    """获取全局检查结果缓存（单例），未启用时返回 None"""
+    global _verdict_cache
+    if not settings.content_verdict_cache.ENABLED:
+        return None
+    if _verdict_cache is None:
+        _verdict_cache = ContentVerdictCache()
+    return _verdict_cache
@@ -2,12 +2,14 @@
 # -*- coding: utf-8 -*-
 # @File    : device.py
 import json
+from typing import List
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from entity.devices import UnbindDeviceRequest, UnbindType, AddDeviceRequest, UpdateDeviceRequest, DeviceInfo
+from entity.devices import UnbindDeviceRequest, UnbindType, AddDeviceRequest, UpdateDeviceRequest, DeviceInfo, DeviceState
 from entity.login import TokenData
 from repositories.devices import DeviceRepository
-from package.redis.cache import AsyncRedisCache
+from repositories.user_device_map import UserDeviceMapRepository
+from services.device_state import get_device_state_store
 from loguru import logger
 
 
@@ -17,9 +19,10 @@ class DeviceService:
         self.token = token
         if db:
             self.device_repo = DeviceRepository(db)
+            self.user_device_map_repo = UserDeviceMapRepository(db)
 
     async def create(self, device_info: AddDeviceRequest):
-        existing_device = await self.device_repo.get(device_info.device_id)
+        existing_device = await self.device_repo.get_info(device_info.device_id)
         if existing_device:
             logger.info(
                 f"Device already exists, device_id: {device_info.device_id}, device_name: {existing_device.device_name}"
@@ -39,7 +42,7 @@ class DeviceService:
 
     async def update(self, device_id: str, device_info: UpdateDeviceRequest):
         # 检查设备是否存在
-        existing_device = await self.device_repo.get(device_id)
+        existing_device = await self.device_repo.get_info(device_id)
         if not existing_device:
             logger.warning(
                 f"Device not found, skip update: device_id={device_id}"
@@ -57,13 +60,24 @@ class DeviceService:
         return device
 
     async def get_device_info(self, device_id: str):
-        device = await self.device_repo.get(device_id)
-        if not device:
-            return None
-        device_info = DeviceInfo.model_validate(device)
-        return device_info
+        return await self.device_repo.get_info(device_id)
+
+    async def get_device_state(self, device_id: str) -> DeviceState:
+        return await get_device_state_store().get_state(device_id)
 
-    async def get_device_state(self, device_id: str):
-        return await self.whale.get_device_state_async(device_id)
+    async def get_device_states(self, device_ids: List[str]) -> List[DeviceState]:
+        """批量获取当前用户已绑定设备的实时状态（一次 Redis 往返），按请求顺序返回；未绑定的设备不返回"""
+        requested = list(dict.fromkeys(device_ids))
+        bound = await self.user_device_map_repo.get_bound_device_ids(self.token.user_id, requested)
+        device_ids = [device_id for device_id in requested if device_id in bound]
+        if len(device_ids) < len(requested):
+            logger.info(
+                f"Skip device states not bound to user {self.token.user_id}: "
+                f"{[device_id for device_id in requested if device_id not in bound]}"
+            )
+        if not device_ids:
+            return []
+        states = await get_device_state_store().get_states(device_ids)
+        return [states[device_id] for device_id in device_ids]
 
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : device_state.py
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from core.config.settings import settings
+from entity.devices import DeviceState
+from package.redis.client import new_asyncio_redis_client
+
+DEVICE_STATE_KEY = "kido:device:state:{device_id}"
+LAST_SEEN_FIELD = "last_seen"
+
+
+class DeviceStateStore:
+    """
+    设备实时状态存储（Redis，每个设备一个 hash）
+    - 字段值统一 JSON 编码，读出时还原类型；last_seen 为最后一次上报的 unix 秒
+    - key 保留 STATE_TTL，online 按 last_seen 是否在 ONLINE_TIMEOUT 内判断，离线设备仍可查到最后状态
+    - 批量写入 / 读取都在一个 pipeline 中完成（一次往返）
+    """
+
+    def __init__(self, redis_factory=None, config=None):
+        self.redis_factory = redis_factory or new_asyncio_redis_client
+        self.config = config or settings.device_status
+
+    @staticmethod
+    def key(device_id: str) -> str:
+        return DEVICE_STATE_KEY.format(device_id=device_id)
+
+    async def put_many(self, statuses: Sequence[Dict[str, Any]], now: Optional[int] = None) -> int:
+        """写入一批状态上报（同一设备按顺序合并），返回写入的设备数"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        now = int(time.time()) if now is None else now
+        for status in statuses:
+            fields = merged.setdefault(str(status["device_id"]), {})
+            fields.update({
+                key: json.dumps(value, ensure_ascii=False)
+                for key, value in status.items() if key != "device_id"
+            })
+            fields[LAST_SEEN_FIELD] = now
+        if not merged:
+            return 0
+        async with self.redis_factory() as redis_client:
+            pipe = redis_client.pipeline(transaction=False)
+            for device_id, fields in merged.items():
+                pipe.hset(self.key(device_id), mapping=fields)
+                pipe.expire(self.key(device_id), self.config.STATE_TTL)
+            await pipe.execute()
+        return len(merged)
+
+    def _to_state(self, device_id: str, raw: Dict[bytes, bytes], now: int) -> DeviceState:
+        status: Dict[str, Any] = {}
+        last_seen = None
+        for field, value in raw.items():
+            name = field.decode()
+            if name == LAST_SEEN_FIELD:
+                last_seen = int(value)
+                continue
+            try:
+                status[name] = json.loads(value)
+            except ValueError:
+                status[name] = value.decode(errors="replace")
+        online = last_seen is not None and now - last_seen <= self.config.ONLINE_TIMEOUT
+        return DeviceState(device_id=device_id, online=online, last_seen=last_seen, status=status)
+
+    async def get_states(self, device_ids: Sequence[str]) -> Dict[str, DeviceState]:
+        """批量读取设备状态（一个 pipeline），没有上报过的设备返回 online=False 的空状态"""
+        device_ids = list(dict.fromkeys(device_ids))
+        if not device_ids:
+            return {}
+        async with self.redis_factory() as redis_client:
+            pipe = redis_client.pipeline(transaction=False)
+            for device_id in device_ids:
+                pipe.hgetall(self.key(device_id))
+            rows: List[Dict[bytes, bytes]] = await pipe.execute()
+        now = int(time.time())
+        return {device_id: self._to_state(device_id, raw or {}, now) for device_id, raw in zip(device_ids, rows)}
+
+    async def get_state(self, device_id: str) -> DeviceState:
+        return (await self.get_states([device_id]))[device_id]
+
+
+_store: Optional[DeviceStateStore] = None
+
+
+def get_device_state_store() -> DeviceStateStore:
+    """获取全局设备状态存储（单例）"""
+    global _store
+    if _store is None:
+        _store = DeviceStateStore()
+    return _store
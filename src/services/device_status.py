@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : device_status.py
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional
+
+import aio_pika
+from loguru import logger
+from core.config.settings import settings
+from core.rabbitmq import RabbitMQClient
+from services.device_state import DeviceStateStore
+
+
+def parse_status(body: bytes) -> Optional[Dict[str, Any]]:
+    """解析设备状态上报消息（JSON 对象，必须带 device_id），无法解析返回 None"""
+    try:
+        status = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(status, dict) or not status.get("device_id"):
+        return None
+    return status
+
+
+class DeviceStatusConsumer:
+    """
+    设备状态上报消费者（aio_pika）
+    - 回调只把消息放进缓冲区，后台 flusher 按条数（BATCH_SIZE）或时间（FLUSH_MS）凑批
+    - 每批同一设备的多次上报合并为一次写入，整批通过 DeviceStateStore 的一个 Redis pipeline 写完后用 ack(multiple=True) 一次确认
+    - Redis 写入失败时整批 nack 重新投递；无法解析的消息直接拒绝，不阻塞后面的消息
+    - 连接由 robust connection 自动恢复；启动时 broker 不可用则按 RECONNECT_DELAY 循环重试（不递归）
+    """
+
+    def __init__(self, client: Optional[RabbitMQClient] = None, config=None, store: Optional[DeviceStateStore] = None):
+        self.config = config or settings.device_status
+        self.client = client or RabbitMQClient(queue_name=self.config.QUEUE)
+        self.store = store or DeviceStateStore(config=self.config)
+        self._buffer: List[aio_pika.abc.AbstractIncomingMessage] = []
+        self._batch_full = asyncio.Event()
+        self._consumer_tag: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._subscribe_task: Optional[asyncio.Task] = None
+        self.consumed = 0
+        self.written = 0
+        self.rejected = 0
+        self.requeued = 0
+        self.batches = 0
+
+    async def _on_message(self, message: aio_pika.abc.AbstractIncomingMessage) -> None:
+        self._buffer.append(message)
+        if len(self._buffer) >= self.config.BATCH_SIZE:
+            self._batch_full.set()
+
+    async def _subscribe(self) -> None:
+        while self._consumer_tag is None:
+            try:
+                self._consumer_tag = await self.client.consume(
+                    self.config.QUEUE, self._on_message, prefetch_count=self.config.PREFETCH
+                )
+                logger.info(f"Consuming device status from queue '{self.config.QUEUE}'")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to subscribe device status queue, retry in {self.config.RECONNECT_DELAY}s: {e}")
+                await asyncio.sleep(self.config.RECONNECT_DELAY)
+
+    async def flush(self, batch: List[aio_pika.abc.AbstractIncomingMessage]) -> None:
+        statuses = []
+        last = None
+        for message in batch:
+            status = parse_status(message.body)
+            if status is None:
+                logger.warning(f"Drop malformed device status message: {message.body[:200]!r}")
+                await message.reject(requeue=False)
+                self.rejected += 1
+            else:
+                statuses.append(status)
+                last = message
+        self.consumed += len(batch)
+        if last is None:
+            return
+        try:
+            self.written += await self.store.put_many(statuses)
+        except Exception as e:
+            logger.error(f"Failed to write {len(statuses)} device statuses, requeue: {e}")
+            self.requeued += len(statuses)
+            await asyncio.sleep(self.config.RETRY_DELAY)
+            await self._settle(last, ack=False)
+            return
+        self.batches += 1
+        await self._settle(last, ack=True)
+
+    @staticmethod
+    async def _settle(last: aio_pika.abc.AbstractIncomingMessage, ack: bool) -> None:
+        # 同一 channel 上按投递顺序处理，确认最后一条有效消息即确认整批（已单独拒绝的消息不受影响）
+        try:
+            if ack:
+                await last.ack(multiple=True)
+            else:
+                await last.nack(multiple=True, requeue=True)
+        except Exception as e:
+            # 连接断开后 delivery tag 失效，broker 会重新投递未确认的消息（写入是幂等的）
+            logger.warning(f"Failed to settle device status batch: {e}")
+
+    def _take_batch(self) -> List[aio_pika.abc.AbstractIncomingMessage]:
+        batch, self._buffer = self._buffer, []
+        self._batch_full.clear()
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            if len(self._buffer) < self.config.BATCH_SIZE:
+                waiter = asyncio.ensure_future(self._batch_full.wait())
+                try:
+                    await asyncio.wait({waiter}, timeout=self.config.FLUSH_MS / 1000)
+                finally:
+                    waiter.cancel()
+            if self._buffer:
+                await self.flush(self._take_batch())
+
+    def start(self) -> None:
+        if self._subscribe_task is None or self._subscribe_task.done():
+            self._subscribe_task = asyncio.create_task(self._subscribe(), name="device-status-subscribe")
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="device-status-flusher")
+
+    async def stop(self) -> None:
+        """停止拉取新消息，写入并确认已收到的消息后关闭消费 channel"""
+        await self._cancel_task(self._subscribe_task)
+        self._subscribe_task = None
+        if self._consumer_tag is not None:
+            try:
+                await self.client.cancel(self._consumer_tag)
+            except Exception as e:
+                logger.warning(f"Failed to cancel device status consumer: {e}")
+            self._consumer_tag = None
+        await self._cancel_task(self._task)
+        self._task = None
+        if self._buffer:
+            await self.flush(self._take_batch())
+        await self.client.close()
+
+    @staticmethod
+    async def _cancel_task(task: Optional[asyncio.Task]) -> None:
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "consumed": self.consumed,
+            "written": self.written,
+            "rejected": self.rejected,
+            "requeued": self.requeued,
+            "batches": self.batches,
+        }
+
+
+_consumer: Optional[DeviceStatusConsumer] = None
+
+
+async def start_device_status_consumer() -> None:
+    """在 Web 进程内启动设备状态消费（DEVICE_STATUS_CONSUMER_ENABLED 开启时，应用启动时调用）"""
+    global _consumer
+    if not settings.device_status.CONSUMER_ENABLED:
+        return
+    _consumer = DeviceStatusConsumer()
+    _consumer.start()
+
+
+async def stop_device_status_consumer() -> None:
+    """停止设备状态消费（应用关闭时调用）"""
+    global _consumer
+    if _consumer is not None:
+        await _consumer.stop()
+        _consumer = None
@@ -13,9 +13,11 @@ fi
 
 # Generate Python code from proto file
 python -m grpc_tools.protoc -I. --python_out=. --grpc_python_out=. rag.proto
+python -m grpc_tools.protoc -I. --python_out=. tracking.proto
 
 echo "Generated files:"
 echo "- rag_pb2.py (message classes)"
 echo "- rag_pb2_grpc.py (service classes)"
+echo "- tracking_pb2.py (tracking event messages)"
 
 echo "Done!" 
\ No newline at end of file
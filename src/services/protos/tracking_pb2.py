@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: tracking.proto
+# Protobuf Python Version: 5.28.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    5,
+    28,
+    1,
+    '',
+    'tracking.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0etracking.proto\x12\x08tracking\"\xa0\x07\n\nTrackEvent\x12\x16\n\tdevice_id\x18\x01 \x01(\tH\x00\x88\x01\x01\x12\x14\n\x07user_id\x18\x02 \x01(\tH\x01\x88\x01\x01\x12\x15\n\x08\x61gent_id\x18\x03 \x01(\tH\x02\x88\x01\x01\x12\x15\n\x08\x63hild_id\x18\x04 \x01(\tH\x03\x88\x01\x01\x12 \n\x13\x64\x65vice_network_type\x18\x05 \x01(\tH\x04\x88\x01\x01\x12\x1a\n\rmobile_system\x18\x06 \x01(\tH\x05\x88\x01\x01\x12\x19\n\x0cmobile_model\x18\x07 \x01(\tH\x06\x88\x01\x01\x12\x19\n\x0cmobile_brand\x18\x08 \x01(\tH\x07\x88\x01\x01\x12\x13\n\x06module\x18\t \x01(\tH\x08\x88\x01\x01\x12\x11\n\x04page\x18\n \x01(\tH\t\x88\x01\x01\x12\x17\n\nevent_name\x18\x0b \x01(\tH\n\x88\x01\x01\x12\x17\n\nevent_type\x18\x0c \x01(\tH\x0b\x88\x01\x01\x12\x1a\n\rreport_source\x18\r \x01(\tH\x0c\x88\x01\x01\x12\x17\n\ncontent_id\x18\x0e \x01(\tH\r\x88\x01\x01\x12\x15\n\x08position\x18\x0f \x01(\tH\x0e\x88\x01\x01\x12\x11\n\x04name\x18\x10 \x01(\tH\x0f\x88\x01\x01\x12\x1d\n\x10\x65vent_properties\x18\x11 \x01(\x0cH\x10\x88\x01\x01\x12\x12\n\x05\x65xtra\x18\x12 \x01(\x0cH\x11\x88\x01\x01\x12\x15\n\x08mp_scene\x18\x13 \x01(\tH\x12\x88\x01\x01\x12\x17\n\nmp_version\x18\x14 \x01(\tH\x13\x88\x01\x01\x12\x18\n\x0bmp_platform\x18\x15 \x01(\tH\x14\x88\x01\x01\x12\x1b\n\x0emp_sdk_version\x18\x16 \x01(\tH\x15\x88\x01\x01\x12\x18\n\x0bmp_language\x18\x17 \x01(\tH\x16\x88\x01\x01\x42\x0c\n\n_device_idB\n\n\x08_user_idB\x0b\n\t_agent_idB\x0b\n\t_child_idB\x16\n\x14_device_network_typeB\x10\n\x0e_mobile_systemB\x0f\n\r_mobile_modelB\x0f\n\r_mobile_brandB\t\n\x07_moduleB\x07\n\x05_pageB\r\n\x0b_event_nameB\r\n\x0b_event_typeB\x10\n\x0e_report_sourceB\r\n\x0b_content_idB\x0b\n\t_positionB\x07\n\x05_nameB\x13\n\x11_event_propertiesB\x08\n\x06_extraB\x0b\n\t_mp_sceneB\r\n\x0b_mp_versionB\x0e\n\x0c_mp_platformB\x11\n\x0f_mp_sdk_versionB\x0e\n\x0c_mp_language\"7\n\x0fTrackEventBatch\x12$\n\x06\x65vents\x18\x01 \x03(\x0b\x32\x14.tracking.TrackEventb\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'tracking_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_TRACKEVENT']._serialized_start=29
+  _globals['_TRACKEVENT']._serialized_end=957
+  _globals['_TRACKEVENTBATCH']._serialized_start=959
+  _globals['_TRACKEVENTBATCH']._serialized_end=1014
+# @@protoc_insertion_point(module_scope)
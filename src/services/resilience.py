@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : resilience.py
+
+from typing import Any, Dict
+
+import aiohttp
+from core.config.settings import settings
+from package.resilience.breaker import CircuitBreaker
+from package.resilience.bulkhead import Bulkhead
+from package.resilience.policy import ResiliencePolicy
+
+# 外部依赖名称
+WECHAT = "wechat"
+WHALE = "whale"
+RAG = "rag"
+RABBITMQ = "rabbitmq"
+
+_policies: Dict[str, ResiliencePolicy] = {}
+
+
+def is_dependency_failure(exc: BaseException) -> bool:
+    """4xx 是调用方的问题，不代表依赖不可用，不计入熔断"""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status >= 500
+    return True
+
+
+def _option(name: str, key: str) -> Any:
+    config = settings.resilience
+    return config.DEPENDENCIES.get(name, {}).get(key, getattr(config, key))
+
+
+def get_dependency_policy(name: str) -> ResiliencePolicy:
+    """获取外部依赖的调用策略（每个依赖一个单例，熔断 / 舱壁状态在进程内共享）"""
+    policy = _policies.get(name)
+    if policy is None:
+        breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(_option(name, "FAILURE_THRESHOLD")),
+            recovery_timeout=_option(name, "RECOVERY_TIMEOUT"),
+            half_open_max_calls=int(_option(name, "HALF_OPEN_MAX_CALLS")),
+        )
+        bulkhead = Bulkhead(name, int(_option(name, "MAX_CONCURRENT")), _option(name, "MAX_WAIT"))
+        policy = ResiliencePolicy(name, breaker, bulkhead, _option(name, "TIMEOUT"), is_failure=is_dependency_failure)
+        _policies[name] = policy
+    return policy
+
+
+def resilience_metrics() -> Dict[str, Any]:
+    """各依赖的熔断 / 舱壁状态"""
+    return {name: policy.snapshot() for name, policy in _policies.items()}
@@ -1,12 +1,17 @@
 from typing import Optional
 
+import asyncio
 import aiohttp
 from fastapi import HTTPException
+from package.http.client import get_http_session
+from package.resilience.errors import ResilienceError
+from services.resilience import WHALE, get_dependency_policy
 
 
 class StorageService:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, session: Optional[aiohttp.ClientSession] = None):
         self.base_url = base_url
+        self.session = session or get_http_session()
         self.upload_endpoint = f"{base_url}/v1/storage/upload"
 
     async def upload_file(
@@ -33,30 +38,37 @@ class StorageService:
         Raises:
             HTTPException: 当上传失败时抛出
         """
-        async with aiohttp.ClientSession() as sess:
-            try:
-                form_data = aiohttp.FormData()
-                form_data.add_field(
-                    'file',
-                    file,
-                    filename=filename or 'file'
-                )
-                form_data.add_field('bucket_name', bucket_name)
-                form_data.add_field('directory_prefix', directory_prefix)
-                form_data.add_field('file_type', file_type)
+        try:
+            form_data = aiohttp.FormData()
+            form_data.add_field(
+                'file',
+                file,
+                filename=filename or 'file'
+            )
+            form_data.add_field('bucket_name', bucket_name)
+            form_data.add_field('directory_prefix', directory_prefix)
+            form_data.add_field('file_type', file_type)
 
-                response = await sess.post(
+            async def upload() -> dict:
+                async with self.session.post(
                     self.upload_endpoint,
                     data=form_data
-                )
-                response.raise_for_status()
-                result = await response.json()
-                if result['code'] == 200:
-                    return result['data']
-            except aiohttp.ClientError as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Error uploading file: {str(e)}"
-                )
+                ) as response:
+                    response.raise_for_status()
+                    return await response.json()
 
-            return None
+            result = await get_dependency_policy(WHALE).call(upload)
+            if result['code'] == 200:
+                return result['data']
+        except ResilienceError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Storage service unavailable: {str(e)}"
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error uploading file: {str(e)}"
+            )
+
+        return None
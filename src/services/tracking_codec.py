@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : tracking_codec.py
+
+import gzip
+from typing import Any, Dict, List, Optional, Tuple
+
+from entity.data_track import TrackEventRequest
+from pydantic_core import from_json, to_json
+from services.protos.tracking_pb2 import TrackEvent, TrackEventBatch
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时不能使用 zstd 压缩
+    zstandard = None
+
+# 消息 content_type：旧格式为每条消息一个 JSON 事件，新格式为一条消息一批 protobuf 事件
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_PROTOBUF_BATCH = "application/x-protobuf; messageType=tracking.TrackEventBatch"
+
+FORMAT_JSON = "json"
+FORMAT_PROTOBUF = "protobuf"
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# 以 JSON 编码存放在 bytes 字段中的字典字段
+_DICT_FIELDS = ("event_properties", "extra")
+# TrackEventBatch.events（field 1, wire type 2）的 tag
+_BATCH_EVENT_TAG = b"\x0a"
+# 落盘记录首字节的格式标记（JSON 记录以 "{" 开头，不会与之混淆；没有标记的旧记录按 JSON 处理）
+_SPILL_TAGS = {FORMAT_JSON: b"\x01", FORMAT_PROTOBUF: b"\x02"}
+_SPILL_FORMATS = {tag[0]: fmt for fmt, tag in _SPILL_TAGS.items()}
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class TrackingCodec:
+    """
+    埋点事件编解码
+    - json：沿用原格式，每个事件单独一条消息（content_type=application/json），不压缩
+    - protobuf：值为 None 的字段不编码；一批事件拼成一条 TrackEventBatch 消息，可选 gzip / zstd 压缩（content_encoding）
+    单个事件在入队时就编码好（也是落盘的记录格式），凑批时只需拼接，不用重新序列化
+    消费端用 decode_message 按 content_type / content_encoding 解码，新旧格式的消息可以混在同一队列中
+    """
+
+    def __init__(self, fmt: str = FORMAT_JSON, compression: Optional[str] = None, level: Optional[int] = None):
+        if fmt not in (FORMAT_JSON, FORMAT_PROTOBUF):
+            raise ValueError(f"Unsupported tracking format: {fmt}")
+        if compression not in (None, "", GZIP, ZSTD):
+            raise ValueError(f"Unsupported tracking compression: {compression}")
+        if compression == ZSTD and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.format = fmt
+        self.compression = compression or None
+        self.level = level
+        self._zstd = zstandard.ZstdCompressor(level=level or 3) if compression == ZSTD else None
+
+    @property
+    def batched(self) -> bool:
+        return self.format == FORMAT_PROTOBUF
+
+    def encode_event(self, event: TrackEventRequest) -> bytes:
+        if self.format == FORMAT_JSON:
+            return event.model_dump_json().encode()
+        # 字段都是标量或普通字典，直接读模型的字段字典，省去 model_dump 的递归拷贝
+        data = {key: value for key, value in event.__dict__.items() if value is not None}
+        for key in _DICT_FIELDS:
+            if key in data:
+                data[key] = to_json(data[key])
+        return TrackEvent(**data).SerializeToString()
+
+    def frame(self, records: List[bytes]) -> Tuple[List[bytes], str, Optional[str]]:
+        """把一批已编码的事件组装成消息体，返回 (bodies, content_type, content_encoding)"""
+        if not self.batched:
+            return records, CONTENT_TYPE_JSON, None
+        # repeated message 的编码就是逐个 tag + 长度 + 内容，直接拼接即为合法的 TrackEventBatch
+        body = b"".join(_BATCH_EVENT_TAG + _varint(len(r)) + r for r in records)
+        return [self.compress(body)], CONTENT_TYPE_PROTOBUF_BATCH, self.compression
+
+    def tag(self, record: bytes) -> bytes:
+        """落盘前在记录前加上编码格式标记，重启后格式配置变更也能按原格式回放"""
+        return _SPILL_TAGS[self.format] + record
+
+    def compress(self, body: bytes) -> bytes:
+        if self.compression == GZIP:
+            return gzip.compress(body, compresslevel=self.level or 6)
+        if self.compression == ZSTD:
+            return self._zstd.compress(body)
+        return body
+
+
+def untag(record: bytes) -> Tuple[str, bytes]:
+    """拆出落盘记录的编码格式和事件内容"""
+    fmt = _SPILL_FORMATS.get(record[0]) if record else None
+    if fmt is None:
+        return FORMAT_JSON, record
+    return fmt, record[1:]
+
+
+def decompress(body: bytes, content_encoding: Optional[str]) -> bytes:
+    if not content_encoding:
+        return body
+    if content_encoding == GZIP:
+        return gzip.decompress(body)
+    if content_encoding == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"Unsupported content encoding: {content_encoding}")
+
+
+def _event_to_dict(event: TrackEvent) -> Dict[str, Any]:
+    data = {}
+    for field, value in event.ListFields():
+        data[field.name] = from_json(value) if field.name in _DICT_FIELDS else value
+    return data
+
+
+def decode_message(body: bytes, content_type: Optional[str] = None, content_encoding: Optional[str] = None) -> List[Dict[str, Any]]:
+    """解码一条埋点消息，返回事件字典列表（未设置的字段不出现）；未标注 content_type 的视为旧 JSON 格式"""
+    body = decompress(body, content_encoding)
+    if content_type == CONTENT_TYPE_PROTOBUF_BATCH:
+        batch = TrackEventBatch()
+        batch.ParseFromString(body)
+        return [_event_to_dict(event) for event in batch.events]
+    event = from_json(body)
+    return [{key: value for key, value in event.items() if value is not None}]
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : tracking_publisher.py
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from core.config.settings import settings
+from core.rabbitmq import RabbitMQClient
+from entity.data_track import TrackEventRequest
+from package.resilience.errors import ResilienceError
+from package.spill.segment_log import SegmentLog
+from services.tracking_codec import TrackingCodec, untag
+
+# 落盘 / 回放速率的统计窗口（秒）
+RATE_WINDOW = 60
+
+
+class TrackingPublisher:
+    """
+    埋点事件批量发布器（常驻，由应用 lifespan 启停）
+    - 请求只把序列化后的事件放入有界内存队列，队列满时 offer 返回 False，由接口返回 503 让客户端退避（背压）
+    - 后台 flusher 按条数（TRACKING_BATCH_SIZE）或时间（TRACKING_LINGER_MS）凑批，整批流水线发布并统一等待 publisher confirms
+    - 编码格式由 codec 决定：默认每条事件一条 JSON 消息（下游无需改动）；protobuf 格式下一批事件一条消息，可选压缩
+    - 配置了 spill 时，broker 不可用（重试耗尽或熔断打开）的批次写入磁盘段日志而不是丢弃；
+      磁盘上有积压期间新批次也追加到磁盘，由后台回放任务按写入顺序重新发布，保证事件顺序；
+      落盘记录带有编码格式标记，回放时用写入时的格式组装消息（TRACKING_FORMAT 可能在重启之间变更）
+    """
+
+    def __init__(
+        self,
+        client: Optional[RabbitMQClient] = None,
+        config=None,
+        spill: Optional[SegmentLog] = None,
+        codec: Optional[TrackingCodec] = None,
+    ):
+        self.config = config or settings.rabbitmq
+        self.client = client or RabbitMQClient()
+        self.codec = codec or TrackingCodec()
+        self.spill = spill
+        # 磁盘上有未回放的事件（上次进程退出前留下的也算）
+        self._spilling = spill is not None and spill.has_pending()
+        self._spill_lock = asyncio.Lock()
+        self._replay_task: Optional[asyncio.Task] = None
+        self._rate_samples: deque = deque()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.config.TRACKING_QUEUE_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[bytes] = []
+        self._batch_full = asyncio.Event()
+        self.enqueued = 0
+        self.rejected = 0
+        self.published = 0
+        self.failed = 0
+        self.batches = 0
+        self.bytes_published = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    def serialize(self, event: TrackEventRequest) -> bytes:
+        return self.codec.encode_event(event)
+
+    def _codec_for(self, fmt: str) -> TrackingCodec:
+        if fmt == self.codec.format:
+            return self.codec
+        return TrackingCodec(fmt, self.codec.compression, self.codec.level)
+
+    async def _publish(self, records: List[bytes], codec: Optional[TrackingCodec] = None) -> None:
+        bodies, content_type, content_encoding = (codec or self.codec).frame(records)
+        await self.client.publish_batch(bodies, content_type=content_type, content_encoding=content_encoding)
+        self.bytes_published += sum(len(body) for body in bodies)
+
+    def offer(self, events: Sequence[TrackEventRequest]) -> bool:
+        """入队一次请求的全部事件；剩余容量不足时整体拒绝，不会只收下一部分"""
+        if self.queue.maxsize and self.queue.qsize() + len(events) > self.queue.maxsize:
+            self.rejected += len(events)
+            return False
+        for event in events:
+            self.queue.put_nowait(self.serialize(event))
+        self.enqueued += len(events)
+        if self.queue.qsize() + len(self._batch) >= self.config.TRACKING_BATCH_SIZE:
+            self._batch_full.set()
+        return True
+
+    @property
+    def pressure(self) -> float:
+        """队列占用率（0 ~ 1）"""
+        return self.queue.qsize() / self.queue.maxsize if self.queue.maxsize else 0.0
+
+    async def _next_batch(self) -> List[bytes]:
+        # 凑批中的事件放在 self._batch 上，停止时被取消也不会丢失
+        batch = self._batch
+        batch.append(await self.queue.get())
+        batch_size = self.config.TRACKING_BATCH_SIZE
+        if self.queue.qsize() + len(batch) < batch_size:
+            # 不用 wait_for(queue.get())：Python 3.10 下取消与取到数据同时发生时会吞掉取消
+            self._batch_full.clear()
+            waiter = asyncio.ensure_future(self._batch_full.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=self.config.TRACKING_LINGER_MS / 1000)
+            finally:
+                waiter.cancel()
+        while len(batch) < batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def publish_batch(self, batch: List[bytes]) -> bool:
+        if self._spilling and await self._spill_batch(batch):
+            return True
+        for attempt in range(self.config.TRACKING_PUBLISH_RETRIES + 1):
+            try:
+                await self._publish(batch)
+                self.published += len(batch)
+                self.batches += 1
+                return True
+            except ResilienceError as e:
+                # 熔断打开 / 舱壁已满时重试没有意义
+                logger.warning(f"Failed to publish {len(batch)} tracking events: {e}")
+                break
+            except Exception as e:
+                logger.warning(f"Failed to publish {len(batch)} tracking events (attempt {attempt + 1}): {e}")
+                if attempt < self.config.TRACKING_PUBLISH_RETRIES:
+                    await asyncio.sleep(min(2 ** attempt * 0.1, 2.0))
+        if await self._spill_batch(batch):
+            return True
+        self.failed += len(batch)
+        logger.error(f"Dropped {len(batch)} tracking events after {self.config.TRACKING_PUBLISH_RETRIES} retries")
+        return False
+
+    async def _spill_batch(self, batch: List[bytes]) -> bool:
+        if self.spill is None:
+            return False
+        try:
+            async with self._spill_lock:
+                await asyncio.to_thread(self.spill.append, [self.codec.tag(record) for record in batch])
+                self._spilling = True
+        except OSError as e:
+            logger.error(f"Failed to spill {len(batch)} tracking events to disk: {e}")
+            return False
+        self.spilled += len(batch)
+        return True
+
+    async def replay_once(self) -> int:
+        """按写入顺序回放一批落盘事件，返回回放的事件数；发布失败时不确认，下次从同一位置重试"""
+        records, position = await asyncio.to_thread(self.spill.read, self.config.TRACKING_REPLAY_BATCH)
+        if not records:
+            async with self._spill_lock:
+                # 加锁确认期间没有新的追加，之后的批次恢复直接发布
+                if not await asyncio.to_thread(self.spill.has_pending):
+                    self._spilling = False
+            await asyncio.to_thread(self.spill.commit, position)
+            return 0
+        # 按格式切成连续的几段，各自用写入时的 codec 组装，保持原有顺序
+        runs: List[Tuple[str, List[bytes]]] = []
+        for record in records:
+            fmt, event = untag(record)
+            if not runs or runs[-1][0] != fmt:
+                runs.append((fmt, []))
+            runs[-1][1].append(event)
+        for fmt, events in runs:
+            await self._publish(events, self._codec_for(fmt))
+        await asyncio.to_thread(self.spill.commit, position)
+        self.published += len(records)
+        self.replayed += len(records)
+        self.batches += len(runs)
+        return len(records)
+
+    async def _replay(self) -> None:
+        while True:
+            self._sample_rates()
+            if self._spilling:
+                try:
+                    # 回放成功就继续，直到磁盘积压清空
+                    while await self.replay_once():
+                        pass
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Failed to replay spilled tracking events: {e}")
+            await asyncio.sleep(self.config.TRACKING_REPLAY_INTERVAL)
+
+    def _sample_rates(self) -> None:
+        now = time.monotonic()
+        self._rate_samples.append((now, self.spilled, self.replayed))
+        while self._rate_samples and self._rate_samples[0][0] < now - RATE_WINDOW:
+            self._rate_samples.popleft()
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            await self.publish_batch(batch)
+            self._batch = []
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="tracking-publisher")
+        if self.spill is not None and (self._replay_task is None or self._replay_task.done()):
+            self._replay_task = asyncio.create_task(self._replay(), name="tracking-spill-replay")
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """停止 flusher，并在 drain_timeout 内尽量把队列中剩余的事件发出（或落盘，留待下次启动回放）"""
+        for task in (self._task, self._replay_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._replay_task = None
+
+        # 被取消时正在凑批 / 发布的事件重新发送（至少一次）
+        remaining, self._batch = self._batch, []
+        while not self.queue.empty():
+            remaining.append(self.queue.get_nowait())
+        if remaining:
+            try:
+                batch_size = self.config.TRACKING_BATCH_SIZE
+                await asyncio.wait_for(self._drain(remaining, batch_size), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                logger.error("Timed out draining tracking events on shutdown")
+        if self.spill is not None:
+            self.spill.close()
+
+    async def _drain(self, events: List[bytes], batch_size: int) -> None:
+        for start in range(0, len(events), batch_size):
+            await self.publish_batch(events[start:start + batch_size])
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_size": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "pressure": round(self.pressure, 4),
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "published": self.published,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch_size": round(self.published / self.batches, 2) if self.batches else 0,
+            "format": self.codec.format,
+            "compression": self.codec.compression,
+            "bytes_published": self.bytes_published,
+            "avg_event_bytes": round(self.bytes_published / self.published, 2) if self.published else 0,
+            **self._spill_metrics(),
+        }
+
+    def _spill_metrics(self) -> Dict[str, Any]:
+        if self.spill is None:
+            return {}
+        spill_rate = replay_rate = 0.0
+        if self._rate_samples:
+            since, spilled, replayed = self._rate_samples[0]
+            elapsed = time.monotonic() - since
+            if elapsed > 0:
+                spill_rate = (self.spilled - spilled) / elapsed
+                replay_rate = (self.replayed - replayed) / elapsed
+        return {
+            "spilling": self._spilling,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "spill_dropped": self.spill.dropped_records,
+            "spill_bytes": self.spill.size_bytes,
+            "spill_rate": round(spill_rate, 2),
+            "replay_rate": round(replay_rate, 2),
+        }
+
+
+_publisher: Optional[TrackingPublisher] = None
+
+
+def get_tracking_publisher() -> TrackingPublisher:
+    """获取全局埋点发布器（单例）"""
+    global _publisher
+    if _publisher is None:
+        config = settings.rabbitmq
+        spill = None
+        if config.TRACKING_SPILL_DIR:
+            spill = SegmentLog(
+                config.TRACKING_SPILL_DIR,
+                max_bytes=config.TRACKING_SPILL_MAX_BYTES,
+                segment_bytes=config.TRACKING_SPILL_SEGMENT_BYTES,
+            )
+        codec = TrackingCodec(config.TRACKING_FORMAT, config.TRACKING_COMPRESSION)
+        _publisher = TrackingPublisher(config=config, spill=spill, codec=codec)
+    return _publisher
+
+
+async def start_tracking_publisher() -> None:
+    """启动埋点发布器（应用启动时调用）"""
+    get_tracking_publisher().start()
+
+
+async def stop_tracking_publisher() -> None:
+    """停止埋点发布器并发出剩余事件（应用关闭时调用）"""
+    global _publisher
+    if _publisher is not None:
+        await _publisher.stop()
+        await _publisher.client.close()
+        _publisher = None
@@ -21,6 +21,7 @@ from repositories.userid_unionid_mapping import UseridUnionidMappingRepository
 from repositories.miniprogram_config import MiniprogramConfigRepository
 from repositories.user_device_map import UserDeviceMapRepository
 from services.weixin import WechatService
+from services.device_state import get_device_state_store
 from auth import create_access_token, create_refresh_token
 
 
@@ -236,9 +237,22 @@ class UserService:
         return result
 
     async def get_user_devices(self) -> list:
-        """获取用户的所有设备"""
+        """获取用户的所有设备，附带在线状态（一次 Redis 往返批量读取）"""
         mappings = await self.user_device_map_repo.get_by_user_id(self.token.user_id)
-        return [{"device_id": m.device_id, "created_at": m.created_at} for m in mappings]
+        devices = [{"device_id": m.device_id, "created_at": m.created_at} for m in mappings]
+        if not devices:
+            return devices
+        try:
+            states = await get_device_state_store().get_states([d["device_id"] for d in devices])
+        except Exception as e:
+            # 状态只是附加信息，Redis 不可用时仍返回设备列表
+            logger.warning(f"Failed to load device states: {e}")
+            return devices
+        for device in devices:
+            state = states[device["device_id"]]
+            device["online"] = state.online
+            device["last_seen"] = state.last_seen
+        return devices
 
     async def get_device_user(self, device_id: str) -> dict | None:
         """获取设备绑定的用户"""
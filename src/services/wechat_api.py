@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_api.py
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import quote
+
+import aiohttp
+from loguru import logger
+from package.http.client import get_http_session
+from package.resilience.errors import ResilienceError
+from services.resilience import WECHAT, get_dependency_policy
+
+WECHAT_API_BASE = "https://api.weixin.qq.com"
+WECHAT_MP_BASE = "https://mp.weixin.qq.com"
+TEMPLATE_SEND_PATH = "/cgi-bin/message/template/send"
+
+
+class WechatApiError(Exception):
+    """微信接口网络/协议层异常，或被熔断 / 舱壁快速拒绝（业务 errcode 由调用方自行判断）"""
+
+    def __init__(self, path: str, message: str):
+        self.path = path
+        super().__init__(f"WeChat API {path} failed: {message}")
+
+
+class WechatApiClient:
+    """
+    微信开放接口异步客户端
+    覆盖 sns / cgi-bin / wxa 接口，全部基于共享的 aiohttp 会话，不阻塞事件循环
+    返回值为微信原始 JSON（dict），errcode 语义由上层业务处理
+    """
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, base_url: str = WECHAT_API_BASE):
+        self.session = session or get_http_session()
+        self.base_url = base_url
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        async def send() -> Dict[str, Any]:
+            async with self.session.get(f"{self.base_url}{path}", params=params) as response:
+                # 微信部分接口返回 text/plain，不校验 content-type
+                return await response.json(content_type=None)
+
+        try:
+            return await get_dependency_policy(WECHAT).call(send)
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError, ResilienceError) as e:
+            logger.error(f"WeChat API GET {path} failed: {e}")
+            raise WechatApiError(path, str(e)) from e
+
+    async def _post(
+        self,
+        path: str,
+        payload: Union[Dict[str, Any], bytes],
+        access_token: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        params = {"access_token": access_token} if access_token else None
+        # 手动序列化并指定 ensure_ascii=False，保证中文内容原样发送；已序列化的请求体原样发送
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+
+        async def send() -> Dict[str, Any]:
+            async with self.session.post(
+                f"{self.base_url}{path}",
+                params=params,
+                data=body,
+                headers={'Content-Type': 'application/json; charset=utf-8'},
+                **kwargs
+            ) as response:
+                return await response.json(content_type=None)
+
+        try:
+            return await get_dependency_policy(WECHAT).call(send)
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError, ResilienceError) as e:
+            logger.error(f"WeChat API POST {path} failed: {e}")
+            raise WechatApiError(path, str(e)) from e
+
+    # ---------- sns ----------
+
+    async def code2session(self, appid: str, secret: str, js_code: str) -> Dict[str, Any]:
+        """小程序登录凭证校验（sns/jscode2session）"""
+        return await self._get("/sns/jscode2session", {
+            'appid': appid,
+            'secret': secret,
+            'grant_type': 'authorization_code',
+            'js_code': js_code
+        })
+
+    # ---------- cgi-bin ----------
+
+    async def get_stable_token(self, appid: str, secret: str, force_refresh: bool = False) -> Dict[str, Any]:
+        """获取稳定版 access_token（cgi-bin/stable_token）"""
+        return await self._post("/cgi-bin/stable_token", {
+            "grant_type": "client_credential",
+            "appid": appid,
+            "secret": secret,
+            "force_refresh": force_refresh
+        })
+
+    async def get_user_info(self, access_token: str, openid: str, lang: str = "zh_CN") -> Dict[str, Any]:
+        """获取服务号用户基本信息（cgi-bin/user/info）"""
+        return await self._get("/cgi-bin/user/info", {
+            'access_token': access_token,
+            'openid': openid,
+            'lang': lang
+        })
+
+    async def batch_get_user_info(self, access_token: str, openids: List[str], lang: str = "zh_CN") -> Dict[str, Any]:
+        """批量获取服务号用户基本信息（cgi-bin/user/info/batchget，最多 100 个）"""
+        return await self._post("/cgi-bin/user/info/batchget", {
+            "user_list": [{"openid": openid, "lang": lang} for openid in openids]
+        }, access_token=access_token)
+
+    async def send_custom_message(self, access_token: str, message: Union[Dict[str, Any], bytes]) -> Dict[str, Any]:
+        """发送客服消息（cgi-bin/message/custom/send），message 可为预先序列化的 JSON 请求体"""
+        return await self._post("/cgi-bin/message/custom/send", message, access_token=access_token)
+
+    async def send_template_message(self, access_token: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """发送模板消息（cgi-bin/message/template/send）"""
+        return await self._post(TEMPLATE_SEND_PATH, message, access_token=access_token)
+
+    async def create_qrcode(self, access_token: str, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """生成带参数二维码（cgi-bin/qrcode/create）"""
+        return await self._post("/cgi-bin/qrcode/create", request_data, access_token=access_token)
+
+    async def create_menu(self, access_token: str, menu_config: Dict[str, Any], timeout: float = 10) -> Dict[str, Any]:
+        """创建自定义菜单（cgi-bin/menu/create）"""
+        return await self._post("/cgi-bin/menu/create", menu_config, access_token=access_token, timeout=timeout)
+
+    @staticmethod
+    def qrcode_image_url(ticket: str) -> str:
+        """根据 ticket 生成二维码图片 URL（ticket 需要 URL 编码）"""
+        return f"{WECHAT_MP_BASE}/cgi-bin/showqrcode?ticket={quote(ticket)}"
+
+    # ---------- wxa ----------
+
+    async def get_user_phone_number(self, access_token: str, code: str) -> Dict[str, Any]:
+        """获取小程序用户手机号（wxa/business/getuserphonenumber）"""
+        return await self._post("/wxa/business/getuserphonenumber", {"code": code}, access_token=access_token)
+
+    async def msg_sec_check(self, access_token: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """文本内容安全识别（wxa/msg_sec_check）"""
+        return await self._post("/wxa/msg_sec_check", payload, access_token=access_token)
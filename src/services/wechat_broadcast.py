@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_broadcast.py
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+from core.config.settings import settings
+from entity.weixin import WechatErrorCode
+from package.ratelimit.token_bucket import TokenBucket
+from package.resilience.deadline import no_deadline
+from package.redis.client import new_asyncio_redis_client
+from repositories.wechat_service_user import WechatServiceUserRepository
+from services.wechat_api import WechatApiClient, TEMPLATE_SEND_PATH
+from services.wechat_ratelimit import RATE_LIMIT_ERRCODES, send_rate_limited
+
+# 任务元数据与结果保留时间（秒）
+JOB_TTL_SECONDS = 7 * 24 * 3600
+# 与单条发送一致的防重窗口（秒）
+DEDUP_TTL_SECONDS = 60
+# 每批解析 openid / 占位防重键的用户数
+RESOLVE_BATCH_SIZE = 500
+# 执行租约时长（秒），执行中定期续期；进程崩溃后租约过期即可恢复
+RUN_LEASE_SECONDS = 60
+RUN_LEASE_REFRESH_SECONDS = 20
+
+# 仅当租约仍属于自己时才释放
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class BroadcastStatus:
+    """单个接收者的发送结果"""
+    SENT = "sent"
+    NO_OPENID = "no_openid"
+    DUPLICATE = "duplicate"
+    REFUSED = "refused"
+    UNSUBSCRIBED = "unsubscribed"
+    FAILED = "failed"
+    # 被微信限流，已交给重试队列延迟重发
+    RETRYING = "retrying"
+    # 发送中（请求发出前写入，结果返回后覆盖）
+    SENDING = "sending"
+    # 发送中途进程崩溃，无法确定是否已送达；为避免重复推送，恢复时不再重发
+    UNCERTAIN = "uncertain"
+
+    # 终态：恢复任务时不再重发
+    TERMINAL = frozenset({SENT, NO_OPENID, DUPLICATE, REFUSED, UNSUBSCRIBED, RETRYING, UNCERTAIN})
+
+
+class TemplateBroadcastEngine:
+    """
+    模板消息群发引擎
+
+    - openid 按批 JOIN 查询，替代逐个用户两次查库
+    - 防重键用 Redis pipeline 一次往返批量 SET NX，值为 job_id；恢复时本任务自己占位但未发出的接收者继续发送
+    - 信号量限制并发、令牌桶限制发送速率（对齐微信接口频率限制）
+    - 每个接收者发送前写入 sending 标记，发送完成后立即写入结果（Redis hash），进程崩溃后可按 job_id 恢复：
+      已到终态的接收者不会重发，崩溃时停在 sending 的接收者记为 uncertain（不确定是否送达，不重发）
+    - 同一任务同一时刻只有一个执行者（Redis 租约，执行中续期）
+    """
+
+    def __init__(
+        self,
+        session_factory=None,
+        api_client: Optional[WechatApiClient] = None,
+        token_provider: Optional[Callable[[], Awaitable[str]]] = None,
+        rate: Optional[float] = None,
+        concurrency: Optional[int] = None,
+    ):
+        if session_factory is None:
+            from db_wrapper import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+        if token_provider is None:
+            from services.weixin import WechatService
+            token_provider = WechatService.get_access_token
+        self.session_factory = session_factory
+        self._api_client = api_client
+        self.token_provider = token_provider
+        self.rate = rate or settings.wechat.TEMPLATE_BROADCAST_RATE
+        self.concurrency = concurrency or settings.wechat.TEMPLATE_BROADCAST_CONCURRENCY
+
+    @property
+    def api(self) -> WechatApiClient:
+        if self._api_client is None:
+            self._api_client = WechatApiClient()
+        return self._api_client
+
+    @staticmethod
+    def job_key(job_id: str) -> str:
+        return f"kido:wechat:broadcast:{job_id}"
+
+    @staticmethod
+    def results_key(job_id: str) -> str:
+        return f"kido:wechat:broadcast:{job_id}:results"
+
+    @staticmethod
+    def lease_key(job_id: str) -> str:
+        return f"kido:wechat:broadcast:{job_id}:lease"
+
+    @staticmethod
+    def _decode(value: Any) -> Any:
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    async def create_job(
+        self,
+        user_ids: List[str],
+        template_id: str,
+        data: Dict[str, Any],
+        url: Optional[str] = None,
+        miniprogram: Optional[Dict] = None,
+    ) -> str:
+        """创建群发任务并持久化到 Redis，返回 job_id"""
+        job_id = uuid.uuid4().hex
+        # 去重并保持原顺序
+        user_ids = list(dict.fromkeys(user_ids))
+        payload = {
+            "user_ids": user_ids,
+            "template_id": template_id,
+            "data": data,
+            "url": url,
+            "miniprogram": miniprogram,
+        }
+        async with new_asyncio_redis_client() as redis_client:
+            await redis_client.hset(self.job_key(job_id), mapping={
+                "payload": json.dumps(payload, ensure_ascii=False),
+                "status": "pending",
+                "total": len(user_ids),
+                "created_at": int(time.time()),
+            })
+            await redis_client.expire(self.job_key(job_id), JOB_TTL_SECONDS)
+        logger.info(f"Template broadcast job created: {job_id}, template_id: {template_id}, recipients: {len(user_ids)}")
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务进度（不含 payload）"""
+        async with new_asyncio_redis_client() as redis_client:
+            raw = await redis_client.hgetall(self.job_key(job_id))
+        if not raw:
+            return None
+        job = {self._decode(k): self._decode(v) for k, v in raw.items()}
+        job.pop("payload", None)
+        for field, value in job.items():
+            if isinstance(value, str) and value.isdigit():
+                job[field] = int(value)
+        job["job_id"] = job_id
+        return job
+
+    async def is_running(self, job_id: str) -> bool:
+        """任务是否正在被某个进程执行（持有未过期的租约）"""
+        async with new_asyncio_redis_client() as redis_client:
+            return bool(await redis_client.exists(self.lease_key(job_id)))
+
+    async def _acquire_lease(self, job_id: str, token: str) -> bool:
+        async with new_asyncio_redis_client() as redis_client:
+            return bool(await redis_client.set(self.lease_key(job_id), token, nx=True, ex=RUN_LEASE_SECONDS))
+
+    async def _keep_lease(self, job_id: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(RUN_LEASE_REFRESH_SECONDS)
+            try:
+                async with new_asyncio_redis_client() as redis_client:
+                    if await redis_client.get(self.lease_key(job_id)) == token.encode():
+                        await redis_client.expire(self.lease_key(job_id), RUN_LEASE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Failed to refresh template broadcast lease for job {job_id}: {e}")
+
+    async def _release_lease(self, job_id: str, token: str) -> None:
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.eval(_RELEASE_LEASE_SCRIPT, 1, self.lease_key(job_id), token)
+        except Exception as e:
+            # 租约会在 RUN_LEASE_SECONDS 后自动过期
+            logger.warning(f"Failed to release template broadcast lease for job {job_id}: {e}")
+
+    async def _load_done(self, job_id: str) -> Tuple[Set[str], Set[str]]:
+        """返回 (已到终态的接收者, 上次执行中途停在 sending 的接收者)"""
+        async with new_asyncio_redis_client() as redis_client:
+            raw = await redis_client.hgetall(self.results_key(job_id))
+        done, interrupted = set(), set()
+        for user_id, result in raw.items():
+            status = self._decode(result).split(":", 1)[0]
+            if status in BroadcastStatus.TERMINAL:
+                done.add(self._decode(user_id))
+            elif status == BroadcastStatus.SENDING:
+                interrupted.add(self._decode(user_id))
+        return done, interrupted
+
+    async def run(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """执行（或恢复）群发任务；已到终态的接收者会被跳过，任务正在其它进程执行时直接返回 None"""
+        async with new_asyncio_redis_client() as redis_client:
+            raw_payload = await redis_client.hget(self.job_key(job_id), "payload")
+        if not raw_payload:
+            logger.warning(f"Template broadcast job not found: {job_id}")
+            return None
+        payload = json.loads(raw_payload)
+
+        token = uuid.uuid4().hex
+        if not await self._acquire_lease(job_id, token):
+            logger.warning(f"Template broadcast job {job_id} is already running, skip")
+            return None
+        heartbeat = asyncio.create_task(self._keep_lease(job_id, token))
+        try:
+            return await self._run(job_id, payload)
+        finally:
+            heartbeat.cancel()
+            await self._release_lease(job_id, token)
+
+    async def _run(self, job_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        done, interrupted = await self._load_done(job_id)
+        if interrupted:
+            logger.warning(f"Template broadcast job {job_id}: {len(interrupted)} recipients interrupted while sending, mark uncertain")
+            await self._record(job_id, {user_id: BroadcastStatus.UNCERTAIN for user_id in interrupted})
+            done |= interrupted
+        pending = [user_id for user_id in payload["user_ids"] if user_id not in done]
+        logger.info(f"Template broadcast job {job_id} running: {len(pending)} pending, {len(done)} already done")
+
+        async with new_asyncio_redis_client() as redis_client:
+            await redis_client.hset(self.job_key(job_id), mapping={
+                "status": "running",
+                "started_at": int(time.time()),
+                # 失败的接收者会在本次重新发送，计数重新累计
+                BroadcastStatus.FAILED: 0,
+            })
+
+        bucket = TokenBucket(self.rate)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        for start in range(0, len(pending), RESOLVE_BATCH_SIZE):
+            await self._run_batch(job_id, payload, pending[start:start + RESOLVE_BATCH_SIZE], bucket, semaphore)
+
+        async with new_asyncio_redis_client() as redis_client:
+            await redis_client.hset(self.job_key(job_id), mapping={
+                "status": "finished",
+                "finished_at": int(time.time()),
+            })
+        job = await self.get_job(job_id)
+        logger.info(f"Template broadcast job finished: {job}")
+        return job
+
+    async def _run_batch(
+        self,
+        job_id: str,
+        payload: Dict[str, Any],
+        user_ids: List[str],
+        bucket: TokenBucket,
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        from services.weixin import WechatService
+
+        async with self.session_factory() as db:
+            openids = await WechatServiceUserRepository(db).get_service_openids_by_user_ids(user_ids)
+
+        results: Dict[str, str] = {
+            user_id: BroadcastStatus.NO_OPENID for user_id in user_ids if user_id not in openids
+        }
+        recipients = [(user_id, openids[user_id]) for user_id in user_ids if user_id in openids]
+
+        # 与单条发送共用防重键，批量 SET NX 一次往返
+        dedup_keys = {
+            user_id: "wechat:template_msg:{}:{}".format(openid, WechatService._generate_message_hash(
+                openid, payload["template_id"], payload["data"], payload.get("url"), payload.get("miniprogram")
+            ))
+            for user_id, openid in recipients
+        }
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                pipe = redis_client.pipeline(transaction=False)
+                for user_id, _ in recipients:
+                    pipe.set(dedup_keys[user_id], job_id, nx=True, ex=DEDUP_TTL_SECONDS)
+                    pipe.get(dedup_keys[user_id])
+                rows = await pipe.execute()
+            claimed, owners = rows[0::2], [self._decode(owner) for owner in rows[1::2]]
+        except Exception as e:
+            # Redis 出错时允许发送，与单条发送行为一致
+            logger.warning(f"Failed to check duplicate template messages in Redis: {e}, will proceed with sending")
+            claimed, owners = [True] * len(recipients), [job_id] * len(recipients)
+
+        to_send = []
+        for (user_id, openid), first, owner in zip(recipients, claimed, owners):
+            # 防重键属于本任务：上次执行占位后还没发出就中断了（发出过的已有结果，不会进入 pending），继续发送
+            if first or owner == job_id:
+                to_send.append((user_id, openid))
+            else:
+                results[user_id] = BroadcastStatus.DUPLICATE
+        await self._record(job_id, results)
+
+        async def _send(user_id: str, openid: str) -> None:
+            async with semaphore:
+                await bucket.acquire()
+                await self._mark_sending(job_id, user_id)
+                result = await self._send_one(openid, payload)
+                # 失败的接收者释放防重键以便恢复时重发
+                failed = result.startswith(BroadcastStatus.FAILED)
+                await self._record(job_id, {user_id: result}, [dedup_keys[user_id]] if failed else [])
+
+        await asyncio.gather(*(_send(user_id, openid) for user_id, openid in to_send))
+
+    async def _send_one(self, openid: str, payload: Dict[str, Any]) -> str:
+        message = {
+            "touser": openid,
+            "template_id": payload["template_id"],
+            "data": payload["data"],
+        }
+        if payload.get("miniprogram"):
+            message["miniprogram"] = payload["miniprogram"]
+        elif payload.get("url"):
+            message["url"] = payload["url"]
+
+        try:
+            access_token = await self.token_provider()
+            result = await send_rate_limited(
+                TEMPLATE_SEND_PATH,
+                lambda: self.api.send_template_message(access_token, message),
+                message
+            )
+        except Exception as e:
+            logger.error(f"Failed to send broadcast template message to {openid}: {e}")
+            return BroadcastStatus.FAILED
+
+        errcode = result.get('errcode')
+        if errcode == 0:
+            return BroadcastStatus.SENT
+        if errcode == WechatErrorCode.USER_REFUSE_MESSAGE:
+            return BroadcastStatus.REFUSED
+        if errcode == WechatErrorCode.REQUIRE_SUBSCRIBE:
+            return BroadcastStatus.UNSUBSCRIBED
+        if errcode in RATE_LIMIT_ERRCODES:
+            return BroadcastStatus.RETRYING
+        logger.warning(f"Broadcast template message to {openid} failed: {result}")
+        return f"{BroadcastStatus.FAILED}:{errcode}"
+
+    async def _mark_sending(self, job_id: str, user_id: str) -> None:
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.hset(self.results_key(job_id), user_id, BroadcastStatus.SENDING)
+        except Exception as e:
+            logger.warning(f"Failed to mark template broadcast recipient {user_id} as sending: {e}")
+
+    async def _record(self, job_id: str, results: Dict[str, str], retry_keys: Sequence[str] = ()) -> None:
+        """一次 pipeline 写入结果与计数，并删除 retry_keys 中的防重键"""
+        if not results:
+            return
+        counts: Dict[str, int] = {}
+        for result in results.values():
+            status = result.split(":", 1)[0]
+            counts[status] = counts.get(status, 0) + 1
+
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.hset(self.results_key(job_id), mapping=results)
+                pipe.expire(self.results_key(job_id), JOB_TTL_SECONDS)
+                for status, count in counts.items():
+                    pipe.hincrby(self.job_key(job_id), status, count)
+                if retry_keys:
+                    pipe.delete(*retry_keys)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record template broadcast results for job {job_id}: {e}")
+
+
+_broadcast_tasks: Set[asyncio.Task] = set()
+
+
+def run_broadcast_in_background(job_id: str, engine: Optional[TemplateBroadcastEngine] = None) -> asyncio.Task:
+    """在后台执行群发任务；持有任务引用，避免被垃圾回收"""
+    engine = engine or TemplateBroadcastEngine()
+
+    async def _run():
+        try:
+            # 群发任务由请求触发，但不受该请求截止时间约束
+            with no_deadline():
+                await engine.run(job_id)
+        except Exception as e:
+            logger.error(f"Template broadcast job {job_id} aborted: {e}")
+
+    task = asyncio.create_task(_run(), name=f"wechat-broadcast-{job_id}")
+    _broadcast_tasks.add(task)
+    task.add_done_callback(_broadcast_tasks.discard)
+    return task
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_dedup.py
+
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from package.cache.lru import LRUCache
+from package.redis.client import new_asyncio_redis_client
+
+# 微信最多重推 3 次（5s 超时 * 3），窗口留足余量
+DEDUP_WINDOW_SECONDS = 300
+LOCAL_CACHE_SIZE = 10000
+DEFAULT_RESPONSE = "success"
+
+
+class WechatEventDeduplicator:
+    """
+    公众号推送幂等去重
+    去重键：MsgId；无 MsgId 的事件使用 FromUserName + CreateTime + Event
+    先查进程内 LRU，再用 Redis SET NX 在集群内占位；重推直接返回首次的响应，不触达 MySQL / 微信
+    """
+
+    def __init__(self, window_seconds: int = DEDUP_WINDOW_SECONDS, local_size: int = LOCAL_CACHE_SIZE):
+        self.window_seconds = window_seconds
+        self.local = LRUCache[str](maxsize=local_size, ttl=window_seconds)
+
+    @staticmethod
+    def dedup_key(event_data: Dict[str, Any]) -> Optional[str]:
+        msg_id = event_data.get('MsgId') or event_data.get('MsgID')
+        if msg_id:
+            return f"kido:wechat:event:msg:{msg_id}"
+        from_user = event_data.get('FromUserName')
+        create_time = event_data.get('CreateTime')
+        if not from_user or not create_time:
+            return None
+        return f"kido:wechat:event:{from_user}:{create_time}:{event_data.get('Event') or ''}"
+
+    async def check_and_mark(self, event_data: Dict[str, Any], response: str = DEFAULT_RESPONSE) -> Optional[str]:
+        """
+        首次出现的事件返回 None 并记录；重复事件返回首次记录的响应
+        """
+        key = self.dedup_key(event_data)
+        if key is None:
+            return None
+
+        cached = self.local.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                first = await redis_client.set(key, response, nx=True, ex=self.window_seconds)
+                if not first:
+                    cached = await redis_client.get(key)
+                    cached = cached.decode('utf-8') if isinstance(cached, bytes) else (cached or response)
+        except Exception as e:
+            # Redis 不可用时仅依赖本地 LRU，宁可重复处理也不丢事件
+            logger.warning(f"Failed to check WeChat event dedup key in Redis: {e}")
+
+        self.local.set(key, cached or response)
+        return cached
+
+    async def unmark(self, event_data: Dict[str, Any]) -> None:
+        """
+        撤销 check_and_mark 的占位：事件未能入队时调用，让微信的重推可以重新处理
+        """
+        key = self.dedup_key(event_data)
+        if key is None:
+            return
+        self.local.pop(key)
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.delete(key)
+        except Exception as e:
+            logger.warning(f"Failed to clear WeChat event dedup key in Redis: {e}")
+
+
+_deduplicator: Optional[WechatEventDeduplicator] = None
+
+
+def get_wechat_event_deduplicator() -> WechatEventDeduplicator:
+    """获取全局去重器（单例）"""
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = WechatEventDeduplicator()
+    return _deduplicator
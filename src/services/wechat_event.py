@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_event.py
+
+import asyncio
+import json
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aio_pika
+from loguru import logger
+from core.config.settings import settings
+from core.rabbitmq import RabbitMQClient
+
+Ack = Callable[[], Awaitable[None]]
+EventCallback = Callable[[Dict[str, Any], Ack], Awaitable[None]]
+
+
+async def _noop_ack() -> None:
+    return None
+
+
+class WechatEventQueue(ABC):
+    """公众号推送事件队列抽象，便于用进程内实现替换 RabbitMQ 做测试"""
+
+    @abstractmethod
+    async def publish(self, event: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def start_consuming(self, on_event: EventCallback) -> None:
+        ...
+
+    async def stop_consuming(self) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+
+class RabbitMQEventQueue(WechatEventQueue):
+    """基于 RabbitMQ 持久化队列的事件队列，处理完成后才 ack"""
+
+    def __init__(self, client: Optional[RabbitMQClient] = None, queue_name: Optional[str] = None):
+        self.client = client or RabbitMQClient()
+        self.queue_name = queue_name or settings.rabbitmq.WECHAT_EVENT_QUEUE
+        self._consumer_tag: Optional[str] = None
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        body = json.dumps(event, ensure_ascii=False).encode('utf-8')
+        await self.client.publish_to_queue(self.queue_name, body)
+
+    async def start_consuming(self, on_event: EventCallback) -> None:
+        async def _on_message(message: aio_pika.abc.AbstractIncomingMessage):
+            try:
+                event = json.loads(message.body)
+            except ValueError:
+                logger.error(f"Drop malformed WeChat event message: {message.body[:200]!r}")
+                await message.reject(requeue=False)
+                return
+            await on_event(event, message.ack)
+
+        self._consumer_tag = await self.client.consume(
+            self.queue_name,
+            _on_message,
+            prefetch_count=settings.rabbitmq.WECHAT_EVENT_PREFETCH,
+        )
+        logger.info(f"Consuming WeChat events from queue '{self.queue_name}'")
+
+    async def stop_consuming(self) -> None:
+        if self._consumer_tag is not None:
+            await self.client.cancel(self._consumer_tag)
+            self._consumer_tag = None
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class InMemoryEventQueue(WechatEventQueue):
+    """进程内事件队列（测试 / 本地开发用）"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.acked = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        await self.queue.put(event)
+
+    async def start_consuming(self, on_event: EventCallback) -> None:
+        async def _ack():
+            self.acked += 1
+
+        async def _consume():
+            while True:
+                event = await self.queue.get()
+                await on_event(event, _ack)
+
+        self._task = asyncio.create_task(_consume())
+
+    async def stop_consuming(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class WechatEventDispatcher:
+    """按 MsgType / Event 将推送事件路由到 WechatService 的处理方法"""
+
+    def __init__(self, session_factory=None):
+        if session_factory is None:
+            from db_wrapper import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+        self.session_factory = session_factory
+
+    @staticmethod
+    def should_dispatch(event_data: Dict[str, Any]) -> bool:
+        """是否需要异步处理（需要访问数据库或微信接口的事件）"""
+        msg_type = event_data.get('MsgType')
+        if msg_type == 'text':
+            return True
+        return msg_type == 'event' and event_data.get('Event') in ('subscribe', 'unsubscribe', 'CLICK')
+
+    async def dispatch(self, event_data: Dict[str, Any]) -> str:
+        from services.weixin import WechatService
+
+        msg_type = event_data.get('MsgType')
+        event = event_data.get('Event')
+        async with self.session_factory() as db:
+            service = WechatService(db)
+            if msg_type == 'event':
+                if event == 'subscribe':
+                    return await service.handle_follow_event(event_data)
+                if event == 'unsubscribe':
+                    return await service.handle_unfollow_event(event_data)
+                if event == 'CLICK':
+                    return await service.handle_click_event(event_data)
+            elif msg_type == 'text':
+                return await service.handle_text_message(event_data)
+        logger.info(f"Ignore WeChat event - type: {msg_type}, event: {event}")
+        return "success"
+
+
+class WechatEventWorkerPool:
+    """
+    事件处理 worker 池
+    按 FromUserName 哈希分片到固定 lane，同一 openid 的事件严格按顺序处理，不同 openid 并发处理
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[Any]], workers: int):
+        self.handler = handler
+        self.lanes: List[asyncio.Queue] = [asyncio.Queue() for _ in range(workers)]
+        self._tasks: List[asyncio.Task] = []
+
+    def _lane_for(self, event: Dict[str, Any]) -> asyncio.Queue:
+        openid = event.get('FromUserName') or ''
+        return self.lanes[zlib.crc32(openid.encode('utf-8')) % len(self.lanes)]
+
+    async def submit(self, event: Dict[str, Any], ack: Ack = _noop_ack) -> None:
+        await self._lane_for(event).put((event, ack))
+
+    async def _run_lane(self, lane: asyncio.Queue) -> None:
+        while True:
+            event, ack = await lane.get()
+            try:
+                await self.handler(event)
+            except Exception as e:
+                # 与原同步流程一致：处理失败只记录日志，不让微信重推
+                logger.error(f"Failed to process WeChat event {event.get('MsgType')}/{event.get('Event')}: {e}")
+            finally:
+                try:
+                    await ack()
+                except Exception as e:
+                    logger.error(f"Failed to ack WeChat event: {e}")
+                lane.task_done()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run_lane(lane)) for lane in self.lanes]
+
+    async def drain(self) -> None:
+        """等待已提交的事件全部处理完"""
+        await asyncio.gather(*(lane.join() for lane in self.lanes))
+
+    async def stop(self, timeout: float = 10) -> None:
+        try:
+            await asyncio.wait_for(self.drain(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out draining WeChat event workers")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+class WechatEventPipeline:
+    """
+    公众号推送事件管道
+    webhook 只负责入队并立即回复 success，worker 池异步消费处理
+    订阅在后台循环重试：启动时 broker 不可用，恢复后也会开始消费，不会出现只入队不消费
+    """
+
+    def __init__(
+        self,
+        queue: WechatEventQueue,
+        dispatcher: Optional[WechatEventDispatcher] = None,
+        workers: Optional[int] = None,
+        reconnect_delay: Optional[float] = None,
+    ):
+        self.queue = queue
+        self.dispatcher = dispatcher or WechatEventDispatcher()
+        self.pool = WechatEventWorkerPool(
+            self.dispatcher.dispatch,
+            workers or settings.rabbitmq.WECHAT_EVENT_WORKERS,
+        )
+        self.reconnect_delay = reconnect_delay or settings.rabbitmq.WECHAT_EVENT_RECONNECT_DELAY
+        self._started = False
+        self._subscribe_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """启动 worker 并在后台订阅事件队列，不阻塞应用启动"""
+        self.pool.start()
+        if self._subscribe_task is None or self._subscribe_task.done():
+            self._subscribe_task = asyncio.create_task(self._subscribe(), name="wechat-event-subscribe")
+
+    async def _subscribe(self) -> None:
+        while not self._started:
+            try:
+                await self.queue.start_consuming(self.pool.submit)
+                self._started = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to start WeChat event consumer, retry in {self.reconnect_delay}s: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        """事件入队；队列不可用时退化为本进程 worker 直接处理，保证事件不丢"""
+        try:
+            await self.queue.publish(event)
+        except Exception as e:
+            logger.error(f"Failed to enqueue WeChat event, processing locally: {e}")
+            self.pool.start()
+            await self.pool.submit(event)
+
+    async def stop(self) -> None:
+        # 先停止订阅重试和拉取新消息，处理完已取到的事件并 ack 后再断开连接
+        if self._subscribe_task is not None:
+            self._subscribe_task.cancel()
+            try:
+                await self._subscribe_task
+            except asyncio.CancelledError:
+                pass
+            self._subscribe_task = None
+        try:
+            await self.queue.stop_consuming()
+        except Exception as e:
+            logger.warning(f"Failed to stop consuming WeChat events: {e}")
+        await self.pool.stop()
+        await self.queue.close()
+        self._started = False
+
+
+_pipeline: Optional[WechatEventPipeline] = None
+
+
+def get_wechat_event_pipeline() -> WechatEventPipeline:
+    """获取全局事件管道（单例）"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = WechatEventPipeline(RabbitMQEventQueue())
+    return _pipeline
+
+
+async def start_wechat_event_pipeline() -> None:
+    """启动事件消费（应用启动时调用），broker 不可用时在后台重试订阅，不阻塞启动"""
+    await get_wechat_event_pipeline().start()
+
+
+async def stop_wechat_event_pipeline() -> None:
+    """停止事件消费并等待处理中的事件完成（应用关闭时调用）"""
+    global _pipeline
+    if _pipeline is not None:
+        await _pipeline.stop()
+        _pipeline = None
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_menu.py
+
+import asyncio
+import hashlib
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+from core.config.settings import settings
+from entity.weixin import WechatMiniLink
+from package.redis.client import new_asyncio_redis_client
+from services.wechat_api import WechatApiClient
+
+# 只删除自己持有的锁（值相等才删除）
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class WechatMenuSync:
+    """
+    服务号自定义菜单同步
+    对 WechatMiniLink.get_menu_config() 计算内容哈希，仅当与 Redis 中记录的“上次发布哈希”不同时才调用 menu/create
+    发布时持有短期 Redis 锁，集群内同一时刻只有一个节点发布，发布结束（成功或失败）即释放；后台任务由应用 lifespan 启停
+    """
+
+    def __init__(
+        self,
+        appid: Optional[str] = None,
+        api_client: Optional[WechatApiClient] = None,
+        token_provider: Optional[Callable[[], Awaitable[str]]] = None,
+        config=None,
+    ):
+        self.appid = appid or settings.wechat.SERVICE_APPID
+        self.config = config or settings.wechat_menu
+        self._api_client = api_client
+        self._token_provider = token_provider
+        self.hash_key = f"kido:wechat:menu:hash:{self.appid}"
+        self.lock_key = f"kido:wechat:menu:lock:{self.appid}"
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def api(self) -> WechatApiClient:
+        if self._api_client is None:
+            self._api_client = WechatApiClient()
+        return self._api_client
+
+    async def _get_token(self) -> str:
+        if self._token_provider is None:
+            from services.weixin import WechatService
+            self._token_provider = WechatService.get_access_token
+        return await self._token_provider()
+
+    @staticmethod
+    def menu_hash(menu_config: Dict[str, Any]) -> str:
+        raw = json.dumps(menu_config, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    async def sync_once(self, force: bool = False) -> bool:
+        """
+        比对并在需要时发布菜单
+        返回 True 表示线上菜单已是最新（本次发布成功或无需发布），False 表示需要稍后重试
+        """
+        menu_config = WechatMiniLink.get_menu_config()
+        menu_hash = self.menu_hash(menu_config)
+
+        token = uuid.uuid4().hex
+        async with new_asyncio_redis_client() as redis_client:
+            published = await redis_client.get(self.hash_key)
+            if not force and published and published.decode('utf-8') == menu_hash:
+                logger.debug(f"WeChat menu unchanged ({menu_hash[:8]}), skip publishing")
+                return True
+            # 其它节点正在发布时跳过，下一轮再比对
+            if not await redis_client.set(self.lock_key, token, nx=True, ex=self.config.PUBLISH_LOCK_TTL):
+                logger.info("WeChat menu is being published by another instance")
+                return False
+
+        try:
+            result = await self.api.create_menu(await self._get_token(), menu_config)
+            if result.get('errcode') != 0:
+                logger.warning(f"WeChat menu publishing failed: {result}")
+                return False
+
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.set(self.hash_key, menu_hash)
+            logger.info(f"WeChat menu published, hash: {menu_hash[:8]}")
+            return True
+        finally:
+            # 锁只防并发发布；不释放的话 PUBLISH_LOCK_TTL 内的菜单变更会被当作“其它节点正在发布”跳过
+            try:
+                async with new_asyncio_redis_client() as redis_client:
+                    await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, self.lock_key, token)
+            except Exception as e:
+                logger.warning(f"Failed to release WeChat menu publish lock: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                synced = await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WeChat menu sync failed: {e}")
+                synced = False
+            await asyncio.sleep(self.config.SYNC_INTERVAL if synced else self.config.RETRY_INTERVAL)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="wechat-menu-sync")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_menu_sync: Optional[WechatMenuSync] = None
+
+
+async def start_wechat_menu_sync() -> None:
+    """启动菜单同步（应用启动时调用）"""
+    global _menu_sync
+    # 部分环境未配置服务号
+    if not settings.wechat_menu.SYNC_ENABLED or not getattr(settings.wechat, "SERVICE_APPID", None):
+        return
+    _menu_sync = WechatMenuSync()
+    _menu_sync.start()
+
+
+async def stop_wechat_menu_sync() -> None:
+    """停止菜单同步（应用关闭时调用）"""
+    global _menu_sync
+    if _menu_sync is not None:
+        await _menu_sync.stop()
+        _menu_sync = None
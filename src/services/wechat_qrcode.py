@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_qrcode.py
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+from core.config.settings import settings
+from package.cache.lru import LRUCache
+from package.redis.client import new_asyncio_redis_client
+
+QrcodeCreator = Callable[[str, bool], Awaitable[Dict[str, Any]]]
+
+
+class WechatQrcodeCache:
+    """
+    服务号带参数二维码缓存（按 scene_str + 是否永久）
+    - Redis 中集群共享：永久二维码不过期，临时二维码在 expire_seconds 之前提前失效
+    - 进程内 LRU 保留副本，命中时不访问网络
+    - 同一进程内同一场景并发未命中时只调用一次微信接口；场景锁在没有等待者时移除，锁表大小只与并发度有关
+    """
+
+    def __init__(self, config=None):
+        self.config = config or settings.wechat_qrcode
+        self.local = LRUCache[Dict[str, Any]](maxsize=1024, ttl=self.config.LOCAL_TTL)
+        # key -> [锁, 持有或等待该锁的协程数]
+        self._locks: Dict[str, List[Any]] = {}
+
+    @staticmethod
+    def key(scene_str: str, is_permanent: bool) -> str:
+        return f"kido:wechat:qrcode:{'permanent' if is_permanent else 'temporary'}:{scene_str}"
+
+    @staticmethod
+    def _is_fresh(entry: Dict[str, Any]) -> bool:
+        expires_at = entry.get("expires_at")
+        return expires_at is None or time.time() < expires_at
+
+    def _local_ttl(self, entry: Dict[str, Any]) -> float:
+        expires_at = entry.get("expires_at")
+        if expires_at is None:
+            return self.config.LOCAL_TTL
+        return max(min(self.config.LOCAL_TTL, expires_at - time.time()), 0)
+
+    @asynccontextmanager
+    async def _key_lock(self, key: str) -> AsyncIterator[None]:
+        slot = self._locks.get(key)
+        if slot is None:
+            slot = self._locks[key] = [asyncio.Lock(), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                yield
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del self._locks[key]
+
+    async def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                raw = await redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to load QR code cache from Redis: {e}")
+            return None
+        if not raw:
+            return None
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            return None
+        return entry if self._is_fresh(entry) else None
+
+    async def _store(self, key: str, entry: Dict[str, Any]) -> None:
+        expires_at = entry.get("expires_at")
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                if expires_at is None:
+                    await redis_client.set(key, json.dumps(entry))
+                else:
+                    await redis_client.set(key, json.dumps(entry), ex=max(int(expires_at - time.time()), 1))
+        except Exception as e:
+            logger.warning(f"Failed to store QR code cache in Redis: {e}")
+
+    async def get_or_create(self, scene_str: str, is_permanent: bool, creator: QrcodeCreator) -> str:
+        """返回二维码图片 URL；缓存未命中时调用 creator 生成"""
+        key = self.key(scene_str, is_permanent)
+        entry = self.local.get(key)
+        if entry is not None and self._is_fresh(entry):
+            return entry["url"]
+
+        async with self._key_lock(key):
+            entry = self.local.get(key)
+            if entry is None or not self._is_fresh(entry):
+                entry = await self._load(key)
+            if entry is None:
+                result = await creator(scene_str, is_permanent)
+                entry = {"url": result["url"], "ticket": result["ticket"], "expires_at": None}
+                if not is_permanent:
+                    expire_seconds = result.get("expire_seconds") or self.config.EXPIRE_SECONDS
+                    # 提前失效，保证返回给用户的二维码仍有足够的有效期
+                    entry["expires_at"] = time.time() + max(expire_seconds - self.config.EXPIRE_MARGIN, 1)
+                await self._store(key, entry)
+            self.local.set(key, entry, ttl=self._local_ttl(entry))
+            return entry["url"]
+
+    async def invalidate(self, scene_str: str, is_permanent: bool) -> None:
+        key = self.key(scene_str, is_permanent)
+        self.local.pop(key)
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.delete(key)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate QR code cache: {e}")
+
+
+_qrcode_cache: Optional[WechatQrcodeCache] = None
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+def get_wechat_qrcode_cache() -> WechatQrcodeCache:
+    """获取全局二维码缓存（单例）"""
+    global _qrcode_cache
+    if _qrcode_cache is None:
+        _qrcode_cache = WechatQrcodeCache()
+    return _qrcode_cache
+
+
+async def prewarm_wechat_qrcodes() -> None:
+    """预热已知设备场景的二维码"""
+    from services.weixin import WechatService
+
+    config = settings.wechat_qrcode
+    warmed = []
+    for scene_str in config.PREWARM_SCENES:
+        try:
+            await WechatService.generate_wechat_qrcode_with_scene(scene_str, config.PREWARM_PERMANENT)
+            warmed.append(scene_str)
+        except Exception as e:
+            logger.warning(f"Failed to pre-warm QR code for scene {scene_str}: {e}")
+    logger.info(f"QR code cache pre-warmed {len(warmed)}/{len(config.PREWARM_SCENES)}: {warmed}")
+
+
+async def start_qrcode_prewarm() -> None:
+    """后台预热二维码缓存（应用启动时调用），不阻塞启动"""
+    global _prewarm_task
+    # 部分环境未配置服务号，无法生成二维码
+    if not getattr(settings.wechat, "SERVICE_APPID", None) or not settings.wechat_qrcode.PREWARM_SCENES:
+        return
+    _prewarm_task = asyncio.create_task(prewarm_wechat_qrcodes(), name="wechat-qrcode-prewarm")
+
+
+async def stop_qrcode_prewarm() -> None:
+    """取消尚未完成的预热任务（应用关闭时调用）"""
+    global _prewarm_task
+    if _prewarm_task is not None and not _prewarm_task.done():
+        _prewarm_task.cancel()
+        try:
+            await _prewarm_task
+        except asyncio.CancelledError:
+            pass
+    _prewarm_task = None
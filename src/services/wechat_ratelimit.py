@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_ratelimit.py
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+from core.config.settings import settings
+from entity.weixin import WechatErrorCode
+from package.ratelimit.adaptive import AdaptiveRateLimiter
+from package.redis.client import new_asyncio_redis_client
+from services.wechat_api import WechatApiClient, TEMPLATE_SEND_PATH
+
+# 视为限流、需要降速并延迟重试的错误码
+RATE_LIMIT_ERRCODES = frozenset({
+    WechatErrorCode.RATE_LIMIT_SECOND_LEVEL,
+    WechatErrorCode.API_DAILY_QUOTA_LIMIT,
+    WechatErrorCode.API_MINUTE_QUOTA_LIMIT,
+})
+
+RETRY_QUEUE_KEY = "kido:wechat:retry"
+
+# 把成员从一个 ZSET 原子地移到另一个 ZSET；只有移出成功的节点才算抢到
+_MOVE_SCRIPT = """
+if redis.call('zrem', KEYS[1], ARGV[1]) == 1 then
+    redis.call('zadd', KEYS[2], ARGV[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+def is_rate_limited(result: Dict[str, Any]) -> bool:
+    return result.get('errcode') in RATE_LIMIT_ERRCODES
+
+
+_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_wechat_rate_limiter() -> AdaptiveRateLimiter:
+    """微信接口自适应限流器（单例）"""
+    global _limiter
+    if _limiter is None:
+        config = settings.wechat_ratelimit
+        _limiter = AdaptiveRateLimiter(
+            "wechat",
+            max_rate=config.MAX_RATE,
+            min_rate=config.MIN_RATE,
+            increase_step=config.INCREASE_STEP,
+            increase_interval=config.INCREASE_INTERVAL,
+            decrease_factor=config.DECREASE_FACTOR,
+            decrease_cooldown=config.DECREASE_COOLDOWN,
+        )
+    return _limiter
+
+
+class WechatRetryQueue:
+    """
+    被限流消息的延迟重试队列
+    Redis ZSET 保存待重试消息（score 为到期时间）；发送前逐条原子地移入处理中 ZSET（score 为租约到期时间），
+    只有移动成功的节点会重发，发送完成后才从处理中集合删除
+    任务被取消时未完成的消息放回队列；进程崩溃留下的消息在租约（RETRY_LEASE）过期后由任一节点放回队列
+    退避采用带抖动的指数退避，超过最大次数后丢弃并记录
+    """
+
+    def __init__(
+        self,
+        limiter: Optional[AdaptiveRateLimiter] = None,
+        api_client: Optional[WechatApiClient] = None,
+        token_provider: Optional[Callable[[], Awaitable[str]]] = None,
+        key: str = RETRY_QUEUE_KEY,
+    ):
+        self.limiter = limiter or get_wechat_rate_limiter()
+        self._api_client = api_client
+        self._token_provider = token_provider
+        self.key = key
+        self.processing_key = f"{key}:processing"
+        self.config = settings.wechat_ratelimit
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def api(self) -> WechatApiClient:
+        if self._api_client is None:
+            self._api_client = WechatApiClient()
+        return self._api_client
+
+    async def _get_token(self) -> str:
+        if self._token_provider is None:
+            from services.weixin import WechatService
+            self._token_provider = WechatService.get_access_token
+        return await self._token_provider()
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间：指数增长，取上限后在 [d/2, d] 内随机抖动"""
+        delay = min(self.config.RETRY_MAX_DELAY, self.config.RETRY_BASE_DELAY * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def schedule(self, path: str, message: Dict[str, Any], attempt: int = 0) -> bool:
+        """加入重试队列；超过最大重试次数时丢弃并返回 False"""
+        metrics = self.limiter.metrics_for(path)
+        if attempt >= self.config.RETRY_MAX_ATTEMPTS:
+            metrics.dropped += 1
+            logger.error(f"Drop WeChat message after {attempt} rate limited attempts: {path}, touser: {message.get('touser')}")
+            return False
+
+        item = json.dumps({
+            "id": uuid.uuid4().hex,
+            "path": path,
+            "message": message,
+            "attempt": attempt,
+        }, ensure_ascii=False)
+        due = time.time() + self.backoff(attempt)
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.zadd(self.key, {item: due})
+        except Exception as e:
+            metrics.dropped += 1
+            logger.error(f"Failed to schedule WeChat retry for {path}: {e}")
+            return False
+        metrics.retried += 1
+        return True
+
+    async def size(self) -> int:
+        """待重试与处理中的消息总数"""
+        async with new_asyncio_redis_client() as redis_client:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zcard(self.key)
+            pipe.zcard(self.processing_key)
+            return sum(await pipe.execute())
+
+    async def _move(self, source: str, target: str, raw: bytes, score: float) -> bool:
+        async with new_asyncio_redis_client() as redis_client:
+            return bool(await redis_client.eval(_MOVE_SCRIPT, 2, source, target, raw, score))
+
+    async def requeue_expired(self) -> int:
+        """把租约已过期（处理中的节点崩溃）的消息放回待重试队列，返回放回的条数"""
+        now = time.time()
+        async with new_asyncio_redis_client() as redis_client:
+            expired = await redis_client.zrangebyscore(self.processing_key, 0, now)
+        requeued = 0
+        for raw in expired:
+            requeued += await self._move(self.processing_key, self.key, raw, now)
+        if requeued:
+            logger.warning(f"Requeued {requeued} WeChat retry item(s) with expired lease")
+        return requeued
+
+    async def poll_once(self) -> int:
+        """取出到期消息并逐条重发，返回本次处理的条数"""
+        await self.requeue_expired()
+        async with new_asyncio_redis_client() as redis_client:
+            due_items = await redis_client.zrangebyscore(
+                self.key, 0, time.time(), start=0, num=self.config.RETRY_BATCH_SIZE
+            )
+        processed = 0
+        for raw in due_items:
+            processed += await self._process(raw)
+        return processed
+
+    async def _process(self, raw: bytes) -> bool:
+        # 发送前才抢占这一条，批次中其余消息仍留在待重试队列，不会因本节点停止 / 崩溃而丢失
+        if not await self._move(self.key, self.processing_key, raw, time.time() + self.config.RETRY_LEASE):
+            return False
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            logger.error(f"Drop malformed WeChat retry item: {raw[:200]!r}")
+        else:
+            try:
+                await self._deliver(item)
+            except BaseException:
+                # 被取消（停止）或意外出错：放回队列稍后重发（可能重复发送一次，但不会丢失）
+                await self._move(self.processing_key, self.key, raw, time.time())
+                raise
+        async with new_asyncio_redis_client() as redis_client:
+            await redis_client.zrem(self.processing_key, raw)
+        return True
+
+    async def _deliver(self, item: Dict[str, Any]) -> None:
+        path, message, attempt = item["path"], item["message"], item["attempt"] + 1
+        send = {
+            TEMPLATE_SEND_PATH: self.api.send_template_message,
+        }.get(path)
+        if send is None:
+            logger.error(f"Unsupported WeChat retry path: {path}")
+            return
+
+        await self.limiter.acquire(path)
+        try:
+            result = await send(await self._get_token(), message)
+        except Exception as e:
+            logger.warning(f"WeChat retry {path} failed: {e}")
+            await self.schedule(path, message, attempt)
+            return
+
+        if result.get('errcode') == 0:
+            await self.limiter.on_success(path)
+            logger.info(f"WeChat retry {path} succeeded after {attempt} attempt(s), touser: {message.get('touser')}")
+        elif is_rate_limited(result):
+            await self.limiter.on_throttle(path)
+            await self.schedule(path, message, attempt)
+        else:
+            logger.error(f"WeChat retry {path} failed with non-retryable result: {result}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"WeChat retry queue poll failed: {e}")
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.config.RETRY_POLL_INTERVAL)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="wechat-retry-queue")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_retry_queue: Optional[WechatRetryQueue] = None
+
+
+def get_wechat_retry_queue() -> WechatRetryQueue:
+    """微信限流重试队列（单例）"""
+    global _retry_queue
+    if _retry_queue is None:
+        _retry_queue = WechatRetryQueue()
+    return _retry_queue
+
+
+async def send_rate_limited(
+    path: str,
+    send: Callable[[], Awaitable[Dict[str, Any]]],
+    message: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    经过自适应限流发送微信消息
+    命中限流错误码时全局降速，并把消息放入重试队列延迟重发
+    """
+    if not settings.wechat_ratelimit.ENABLED:
+        return await send()
+
+    limiter = get_wechat_rate_limiter()
+    await limiter.acquire(path)
+    result = await send()
+    if result.get('errcode') == 0:
+        await limiter.on_success(path)
+    elif is_rate_limited(result):
+        await limiter.on_throttle(path)
+        await get_wechat_retry_queue().schedule(path, message)
+    return result
+
+
+async def start_wechat_retry_worker() -> None:
+    """启动重试队列消费（应用启动时调用）"""
+    if settings.wechat_ratelimit.ENABLED:
+        get_wechat_retry_queue().start()
+
+
+async def stop_wechat_retry_worker() -> None:
+    """停止重试队列消费（应用关闭时调用）"""
+    if _retry_queue is not None:
+        await _retry_queue.stop()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_token.py
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, Optional
+
+from loguru import logger
+from core.config.settings import settings
+from package.redis.client import new_asyncio_redis_client
+from services.wechat_api import WechatApiClient
+
+# 距过期多少秒时后台主动刷新
+REFRESH_AHEAD_SECONDS = 300
+# 请求路径上允许使用的最短剩余有效期，低于该值视为过期
+MIN_VALID_SECONDS = 30
+# 分布式刷新锁的过期时间（毫秒），防止持锁进程崩溃后死锁
+REFRESH_LOCK_TTL_MS = 10000
+# 未抢到锁时等待其它节点刷新结果的轮询间隔（秒）
+LOCK_WAIT_INTERVAL = 0.2
+# 刷新失败后的重试间隔（秒）
+RETRY_INTERVAL = 30
+# 两次后台刷新的最小间隔（秒）；stable_token 普通模式在有效期内返回同一 token，避免临近过期时空转
+MIN_REFRESH_INTERVAL = 60
+
+# 仅当锁仍属于自己时才释放
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class WechatTokenManager:
+    """
+    微信 access_token 管理器（集群共享）
+
+    - Redis 中保存共享 token（带 TTL），所有 pod / worker 共用
+    - 进程内保留一份副本，请求路径上直接返回，不访问网络
+    - 使用 Redis SET NX 分布式锁实现 single-flight，整个集群同一时刻只有一个刷新者
+    - 后台任务在过期前主动刷新，请求路径不等待 token 获取
+    """
+
+    def __init__(
+        self,
+        appid: str,
+        secret: str,
+        api_client: Optional[WechatApiClient] = None,
+    ):
+        self.appid = appid
+        self.secret = secret
+        self._api_client = api_client
+        self.token_key = f"kido:wechat:access_token:{appid}"
+        self.lock_key = f"kido:wechat:access_token:lock:{appid}"
+
+        self._token: Optional[str] = None
+        self._expires_at: float = 0
+        self._local_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def api(self) -> WechatApiClient:
+        if self._api_client is None:
+            self._api_client = WechatApiClient()
+        return self._api_client
+
+    def _is_valid(self, min_remaining: float = MIN_VALID_SECONDS) -> bool:
+        return bool(self._token) and time.time() < self._expires_at - min_remaining
+
+    async def get_token(self) -> str:
+        """获取 access_token：进程内副本 -> Redis 共享副本 -> 冷启动刷新"""
+        if self._is_valid():
+            return self._token
+
+        await self._load_shared_token()
+        if self._is_valid():
+            return self._token
+
+        # 冷启动或后台刷新失败时才会走到这里
+        return await self.refresh()
+
+    async def _load_shared_token(self) -> None:
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                raw = await redis_client.get(self.token_key)
+        except Exception as e:
+            logger.warning(f"Failed to load shared access_token from Redis: {e}")
+            return
+
+        if not raw:
+            return
+        try:
+            cached = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        if cached.get("expires_at", 0) > self._expires_at:
+            self._token = cached["access_token"]
+            self._expires_at = cached["expires_at"]
+
+    async def refresh(self, force: bool = False) -> str:
+        """
+        刷新 access_token
+        进程内用 asyncio.Lock 合并并发刷新，集群内用 Redis 锁保证只有一个刷新者
+        """
+        async with self._local_lock:
+            # 等锁期间可能已被其它协程或其它节点刷新
+            if not force:
+                await self._load_shared_token()
+                if self._is_valid(REFRESH_AHEAD_SECONDS):
+                    return self._token
+
+            lock_value = uuid.uuid4().hex
+            acquired = await self._acquire_lock(lock_value)
+            if acquired is False:
+                token = await self._wait_for_peer_refresh()
+                if token:
+                    return token
+                logger.warning(f"Timed out waiting for peer access_token refresh, appid: {self.appid}")
+
+            try:
+                return await self._fetch_and_store(force)
+            finally:
+                if acquired:
+                    await self._release_lock(lock_value)
+
+    async def _acquire_lock(self, lock_value: str) -> Optional[bool]:
+        """获取分布式刷新锁；Redis 不可用时返回 None，降级为本进程直接刷新"""
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                return bool(await redis_client.set(self.lock_key, lock_value, nx=True, px=REFRESH_LOCK_TTL_MS))
+        except Exception as e:
+            logger.warning(f"Failed to acquire access_token refresh lock: {e}, refreshing locally")
+            return None
+
+    async def _release_lock(self, lock_value: str) -> None:
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, self.lock_key, lock_value)
+        except Exception as e:
+            logger.warning(f"Failed to release access_token refresh lock: {e}")
+
+    async def _wait_for_peer_refresh(self) -> Optional[str]:
+        deadline = time.monotonic() + REFRESH_LOCK_TTL_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_WAIT_INTERVAL)
+            await self._load_shared_token()
+            if self._is_valid(REFRESH_AHEAD_SECONDS):
+                return self._token
+        return None
+
+    async def _fetch_and_store(self, force: bool) -> str:
+        logger.info(f"Initiating access_token refresh via stable_token, appid: {self.appid}")
+        data = await self.api.get_stable_token(self.appid, self.secret, force_refresh=force)
+        if "access_token" not in data:
+            logger.error(f"Access_token acquisition failed: {data}")
+            raise Exception(f"Access_token acquisition failed: {data}")
+
+        expires_in = data.get("expires_in", 7200)
+        self._token = data["access_token"]
+        self._expires_at = time.time() + expires_in
+        logger.info(f"Stable token refreshed successfully, appid: {self.appid}. Expires in: {expires_in}s")
+
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.set(
+                    self.token_key,
+                    json.dumps({"access_token": self._token, "expires_at": self._expires_at}),
+                    ex=max(int(expires_in - MIN_VALID_SECONDS), 1),
+                )
+        except Exception as e:
+            logger.warning(f"Failed to store shared access_token in Redis: {e}")
+
+        return self._token
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                if not self._is_valid(REFRESH_AHEAD_SECONDS):
+                    await self.refresh()
+                delay = max(self._expires_at - REFRESH_AHEAD_SECONDS - time.time(), MIN_REFRESH_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Background access_token refresh failed, appid: {self.appid}: {e}")
+                delay = RETRY_INTERVAL
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        """启动后台主动刷新任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop(), name=f"wechat-token-{self.appid}")
+
+    async def stop(self) -> None:
+        """停止后台刷新任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_token_managers: Dict[str, WechatTokenManager] = {}
+
+
+def get_token_manager(appid: str, secret: str) -> WechatTokenManager:
+    """按 appid 获取 token 管理器（进程内单例）"""
+    manager = _token_managers.get(appid)
+    if manager is None:
+        manager = WechatTokenManager(appid, secret)
+        _token_managers[appid] = manager
+    return manager
+
+
+def get_service_token_manager() -> WechatTokenManager:
+    """服务号 access_token 管理器"""
+    return get_token_manager(settings.wechat.SERVICE_APPID, settings.wechat.SERVICE_SECRET)
+
+
+def get_miniprogram_token_manager() -> WechatTokenManager:
+    """当前小程序 access_token 管理器"""
+    return get_token_manager(settings.wechat.APPID, settings.wechat.SECRET)
+
+
+async def start_token_refreshers() -> None:
+    """启动服务号和小程序 token 的后台刷新（应用启动时调用）"""
+    # 部分环境未配置服务号，只刷新已配置的 appid
+    if getattr(settings.wechat, "SERVICE_APPID", None):
+        get_service_token_manager().start()
+    get_miniprogram_token_manager().start()
+
+
+async def stop_token_refreshers() -> None:
+    """停止所有后台刷新任务（应用关闭时调用）"""
+    for manager in _token_managers.values():
+        await manager.stop()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_unionid.py
+
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+from core.config.settings import settings
+from package.redis.client import new_asyncio_redis_client
+from repositories.wechat_service_user import WechatServiceUserRepository
+from services.wechat_api import WechatApiClient
+
+# 集群内同一时刻只有一个 pod 执行解析
+LOCK_KEY = "kido:wechat:unionid:lock"
+# 新关注、待优先解析的 openid（zset，score 为关注时间）
+PENDING_KEY = "kido:wechat:unionid:pending"
+# 解析失败的 openid 的重试状态（hash，值为 "失败次数:下次重试时间"）
+BACKOFF_KEY = "kido:wechat:unionid:backoff"
+
+# 仅当锁仍属于自己时才释放
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class ServiceUnionidResolver:
+    """
+    服务号关注用户 unionid 批量回填
+    后台按间隔扫描 wechat_service_users 中缺少 unionid 的记录，通过 user/info/batchget（每次最多 100 个）解析，
+    每轮用一条 UPDATE ... CASE 批量回填；关注事件只唤醒解析器，不再在事件处理中逐个调用 user/info
+    - 每轮先取 Redis 锁，多个 pod 不会同时对同一批记录调用 batchget
+    - 新关注的 openid 记入 Redis 待解析集合（任何 pod 收到的关注事件都可以），每轮优先解析，再用剩余额度回填存量记录
+    - 解析不到 unionid 的 openid 按失败次数指数退避（BACKOFF_BASE 起，最长 BACKOFF_MAX），退避期内扫描到也跳过
+    """
+
+    def __init__(
+        self,
+        session_factory=None,
+        api_client: Optional[WechatApiClient] = None,
+        token_provider: Optional[Callable[[], Awaitable[str]]] = None,
+        config=None,
+    ):
+        if session_factory is None:
+            from db_wrapper import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+        self.session_factory = session_factory
+        self.config = config or settings.wechat_unionid
+        self._api_client = api_client
+        self._token_provider = token_provider
+        # keyset 游标：无法解析的用户（如已取关）不会挡住后面的用户，扫描到末尾后从头开始
+        self._cursor = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def api(self) -> WechatApiClient:
+        if self._api_client is None:
+            self._api_client = WechatApiClient()
+        return self._api_client
+
+    async def _get_token(self) -> str:
+        if self._token_provider is None:
+            from services.weixin import WechatService
+            self._token_provider = WechatService.get_access_token
+        return await self._token_provider()
+
+    async def _batch_get(self, access_token: str, openids: List[str]) -> Optional[Dict[str, str]]:
+        """返回解析到的 openid -> unionid；接口报错时返回 None（不计入这些 openid 的失败次数）"""
+        result = await self.api.batch_get_user_info(access_token, openids)
+        if result.get('errcode'):
+            logger.warning(f"Batch get service user info failed: {result}")
+            return None
+        return {
+            info['openid']: info['unionid']
+            for info in result.get('user_info_list', [])
+            if info.get('openid') and info.get('unionid')
+        }
+
+    async def resolve_once(self) -> Optional[int]:
+        """解析一轮，返回回填的记录数；其它 pod 正在解析时返回 None"""
+        token = uuid.uuid4().hex
+        async with new_asyncio_redis_client() as redis_client:
+            if not await redis_client.set(LOCK_KEY, token, nx=True, ex=self.config.LOCK_TTL):
+                return None
+        try:
+            return await self._resolve()
+        finally:
+            try:
+                async with new_asyncio_redis_client() as redis_client:
+                    await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, LOCK_KEY, token)
+            except Exception as e:
+                # 锁会在 LOCK_TTL 后自动过期
+                logger.warning(f"Failed to release unionid resolver lock: {e}")
+
+    @staticmethod
+    def _backoff_until(state: Optional[bytes]) -> float:
+        if not state:
+            return 0
+        return float(state.decode().split(":", 1)[1])
+
+    async def _select(self, now: float) -> List[str]:
+        """本轮要解析的 openid：新关注的优先，剩余额度按游标扫描存量记录（跳过退避中的）"""
+        limit = self.config.SCAN_LIMIT
+        async with new_asyncio_redis_client() as redis_client:
+            pending = [m.decode() for m in await redis_client.zrangebyscore(PENDING_KEY, 0, float("inf"), start=0, num=limit)]
+        after_id = self._cursor
+        async with self.session_factory() as db:
+            rows = await WechatServiceUserRepository(db).get_openids_missing_unionid(after_id=after_id, limit=limit)
+        if not rows:
+            self._cursor = 0
+            return pending
+
+        async with new_asyncio_redis_client() as redis_client:
+            states = await redis_client.hmget(BACKOFF_KEY, [openid for _, openid in rows])
+        selected = list(pending)
+        seen: Set[str] = set(pending)
+        # 扫描到末尾后从头开始；本轮额度用完时游标停在最后处理的记录
+        self._cursor = rows[-1][0] if len(rows) >= limit else 0
+        last_id = after_id
+        for (row_id, openid), state in zip(rows, states):
+            if len(selected) >= limit:
+                self._cursor = last_id
+                break
+            last_id = row_id
+            if openid in seen or self._backoff_until(state) > now:
+                continue
+            selected.append(openid)
+            seen.add(openid)
+        return selected
+
+    async def _resolve(self) -> int:
+        now = time.time()
+        openids = await self._select(now)
+        if not openids:
+            return 0
+
+        access_token = await self._get_token()
+        unionids: Dict[str, str] = {}
+        failed: List[str] = []
+        for start in range(0, len(openids), self.config.BATCH_SIZE):
+            batch = openids[start:start + self.config.BATCH_SIZE]
+            resolved = await self._batch_get(access_token, batch)
+            if resolved is None:
+                continue
+            unionids.update(resolved)
+            failed.extend(openid for openid in batch if openid not in resolved)
+
+        updated = 0
+        if unionids:
+            async with self.session_factory() as db:
+                updated = await WechatServiceUserRepository(db).bulk_update_unionids(unionids)
+        await self._record(openids, unionids, failed, now)
+        logger.info(f"Resolved service user unionids: {len(unionids)}/{len(openids)}, rows updated: {updated}")
+        return updated
+
+    async def _record(self, openids: List[str], unionids: Dict[str, str], failed: List[str], now: float) -> None:
+        """移出待解析集合，解析成功的清除退避状态，失败的按次数推迟下次重试"""
+        async with new_asyncio_redis_client() as redis_client:
+            states = await redis_client.hmget(BACKOFF_KEY, failed) if failed else []
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zrem(PENDING_KEY, *openids)
+            if unionids:
+                pipe.hdel(BACKOFF_KEY, *unionids)
+            retries = {}
+            for openid, state in zip(failed, states):
+                attempts = int(state.decode().split(":", 1)[0]) + 1 if state else 1
+                delay = min(self.config.BACKOFF_BASE * 2 ** (attempts - 1), self.config.BACKOFF_MAX)
+                retries[openid] = f"{attempts}:{now + delay:.0f}"
+            if retries:
+                pipe.hset(BACKOFF_KEY, mapping=retries)
+            await pipe.execute()
+
+    async def enqueue(self, openid: str) -> None:
+        """记录新关注的 openid（下一轮优先解析）并唤醒解析器"""
+        try:
+            async with new_asyncio_redis_client() as redis_client:
+                await redis_client.zadd(PENDING_KEY, {openid: time.time()})
+        except Exception as e:
+            # 写入失败时由存量扫描兜底
+            logger.warning(f"Failed to enqueue openid for unionid resolving: {e}")
+        self.notify()
+
+    def notify(self) -> None:
+        """有新关注用户时唤醒解析器"""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            resolved = 0
+            try:
+                resolved = await self.resolve_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Service unionid resolver failed: {e}")
+            if resolved is None and self._wakeup.is_set():
+                # 其它 pod 正在解析，可能没取到刚关注的 openid：稍后再抢一次锁
+                await asyncio.sleep(max(self.config.FLUSH_DELAY, 1))
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.config.INTERVAL)
+                # 关注事件往往成片到达，稍等片刻凑成一批
+                await asyncio.sleep(self.config.FLUSH_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="wechat-unionid-resolver")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_resolver: Optional[ServiceUnionidResolver] = None
+
+
+async def notify_unionid_resolver(openid: str) -> bool:
+    """提交新关注的 openid 并唤醒 unionid 解析器；解析器未运行时返回 False，由调用方自行解析"""
+    if _resolver is None:
+        return False
+    await _resolver.enqueue(openid)
+    return True
+
+
+async def start_unionid_resolver() -> None:
+    """启动 unionid 解析器（应用启动时调用）"""
+    global _resolver
+    # 部分环境未配置服务号
+    if not settings.wechat_unionid.RESOLVER_ENABLED or not getattr(settings.wechat, "SERVICE_APPID", None):
+        return
+    _resolver = ServiceUnionidResolver()
+    _resolver.start()
+
+
+async def stop_unionid_resolver() -> None:
+    """停止 unionid 解析器（应用关闭时调用）"""
+    global _resolver
+    if _resolver is not None:
+        await _resolver.stop()
+        _resolver = None
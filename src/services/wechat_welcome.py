@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : wechat_welcome.py
+
+import json
+from typing import Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+from core.config.settings import settings
+from entity.weixin import WechatMiniLink
+from package.cache.lru import LRUCache
+
+# (deviceType, version)；None 表示没有设备信息
+DeviceVariant = Optional[Tuple[str, str]]
+
+DEVICE_TYPES = ("FULL_DUPLEX", "HALF_DUPLEX")
+
+
+def parse_device_scene(scene: str) -> Optional[Dict[str, str]]:
+    """
+    解析二维码 scene 参数获取设备信息（格式：deviceType_version，如 FULL_DUPLEX_v1）
+    注意：FULL_DUPLEX 和 HALF_DUPLEX 本身包含下划线，按前缀匹配
+    """
+    for device_type in DEVICE_TYPES:
+        prefix = f"{device_type}_"
+        if scene.startswith(prefix):
+            version = scene[len(prefix):] or 'v1'
+            return {"deviceType": device_type, "version": version}
+    return None
+
+
+class WelcomeMessageRenderer:
+    """
+    关注欢迎语渲染器
+    欢迎语只取决于小程序 appid 与设备型号 (deviceType, version)，按型号编译一次并缓存 message/custom/send 的
+    JSON 请求体（不含 touser），关注事件只需查表并拼接 openid
+    """
+
+    def __init__(self, appid: Optional[str] = None, maxsize: int = 256):
+        self.appid = appid or settings.wechat.APPID
+        # scene 来自用户扫码，型号取值不可控，用 LRU 限制缓存条目数
+        self._bodies = LRUCache[bytes](maxsize=maxsize)
+
+    @staticmethod
+    def variant(device_info: Optional[Dict[str, str]]) -> DeviceVariant:
+        if not device_info:
+            return None
+        return device_info.get('deviceType', ''), device_info.get('version', 'v1')
+
+    def render_content(self, variant: DeviceVariant = None) -> str:
+        """生成欢迎消息文本"""
+        content = "👋 亲爱的家长，欢迎使用可豆陪陪！\n"
+        for config in WechatMiniLink.FIRST_MINI_LINK:
+            full_query = config['query']
+
+            # 如果是"进入小程序"链接且有设备信息，在query中加上设备信息参数
+            if config['url_text'] == '进入小程序' and variant:
+                device_params = f"deviceType={variant[0]}&version={variant[1]}"
+                full_query = f"{full_query}&{device_params}" if full_query else device_params
+
+            # 构建小程序路径，如果有query参数则加上
+            miniprogram_path = f"{config['path']}?{full_query}" if full_query else config['path']
+
+            content += f"{config['desc']}" \
+                       f"<a href=\"https://kidopally.cn/zh/manual\" data-miniprogram-appid={self.appid} " \
+                       f"data-miniprogram-path=\"{miniprogram_path}\">{config['url_text']}</a>\n"
+        return content.strip()
+
+    def _compile(self, variant: DeviceVariant) -> bytes:
+        body = json.dumps(
+            {"msgtype": "text", "text": {"content": self.render_content(variant)}},
+            ensure_ascii=False,
+        ).encode('utf-8')
+        # 去掉开头的 "{"，发送时在前面拼接 touser
+        return body[1:]
+
+    def _body_suffix(self, variant: DeviceVariant) -> bytes:
+        suffix = self._bodies.get(variant)
+        if suffix is None:
+            suffix = self._compile(variant)
+            self._bodies.set(variant, suffix)
+        return suffix
+
+    def precompile(self, variants: Iterable[DeviceVariant]) -> None:
+        for variant in variants:
+            self._body_suffix(variant)
+
+    def body(self, service_openid: str, device_info: Optional[Dict[str, str]] = None) -> bytes:
+        """message/custom/send 的完整 JSON 请求体"""
+        touser = json.dumps(service_openid, ensure_ascii=False).encode('utf-8')
+        return b'{"touser": ' + touser + b', ' + self._body_suffix(self.variant(device_info))
+
+
+_renderer: Optional[WelcomeMessageRenderer] = None
+
+
+def init_welcome_renderer() -> WelcomeMessageRenderer:
+    """预编译无设备信息及二维码预热场景对应的欢迎语（应用启动时调用）"""
+    global _renderer
+    _renderer = WelcomeMessageRenderer()
+    variants = [None] + [
+        WelcomeMessageRenderer.variant(parse_device_scene(scene)) for scene in settings.wechat_qrcode.PREWARM_SCENES
+    ]
+    _renderer.precompile(variants)
+    logger.info(f"Welcome message renderer ready: {len(set(variants))} variants")
+    return _renderer
+
+
+def get_welcome_renderer() -> WelcomeMessageRenderer:
+    """获取全局欢迎语渲染器（单例）"""
+    global _renderer
+    if _renderer is None:
+        _renderer = WelcomeMessageRenderer()
+    return _renderer
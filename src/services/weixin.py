@@ -7,30 +7,33 @@ import hmac
 import json
 import aiohttp
 import asyncio
-import requests
-import time
-import xml.etree.ElementTree as ET
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.config.settings import settings
 from repositories.userid_unionid_mapping import UseridUnionidMappingRepository
 from repositories.wechat_service_user import WechatServiceUserRepository
 from repositories.user_source import UserSourceRepository
-from entity.weixin import WechatMiniLink, WechatErrorCode, ContentSecurityScene, ContentSecuritySuggest, ContentSecurityLabel, WechatContentSecurityResult
+from entity.weixin import WechatMiniLink, WechatErrorCode, ContentSecurityScene, ContentSecuritySuggest, ContentSecurityLabel, WechatContentSecurityResult, ContentSecurityCheckRequest, ContentSecurityBatchItemResult
 from package.redis.client import new_asyncio_redis_client
+from package.http.client import get_http_session
+from package.wechat_xml.parser import parse_wechat_xml
+from services.wechat_api import WechatApiClient, WechatApiError, TEMPLATE_SEND_PATH
+from services.wechat_ratelimit import RATE_LIMIT_ERRCODES, send_rate_limited
+from services.content_prefilter import PreFilterVerdict, get_content_prefilter
+from services.content_verdict_cache import ContentVerdictCache, get_content_verdict_cache
+from services.wechat_token import get_service_token_manager, get_token_manager
+from services.wechat_qrcode import get_wechat_qrcode_cache
+from services.wechat_welcome import get_welcome_renderer, parse_device_scene
+from services.wechat_unionid import notify_unionid_resolver
 
 
 class WechatService:
 
-    _service_access_token = None
-    _service_token_expires_at = 0
-    
-    _miniprogram_access_token = None
-    _miniprogram_token_expires_at = 0
-
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, http_session: Optional[aiohttp.ClientSession] = None):
         self.db = db
+        self.http = http_session or get_http_session()
+        self.api = WechatApiClient(self.http)
         self.wechat_repo = WechatServiceUserRepository(db)
         self.user_source_repo = UserSourceRepository(db)
         self.mapping_repo = UseridUnionidMappingRepository(db)
@@ -61,20 +64,10 @@ class WechatService:
                 logger.error(f"未找到app_id对应的secret: {app_id}")
                 return None
         
-        request_data = {
-            'appid': app_id,
-            'secret': app_secret,
-            'grant_type': 'authorization_code',
-            'js_code': code
-        }
-
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get("https://api.weixin.qq.com/sns/jscode2session", params=request_data) as response:
-                text = await response.text()
-                data = json.loads(text)
-                logger.info("code2session resp: %s", data)
-                if data.get('openid') is not None:
-                    return data.get('openid')
+        data = await WechatApiClient().code2session(app_id, app_secret, code)
+        logger.info(f"code2session resp: {data}")
+        if data.get('openid') is not None:
+            return data.get('openid')
 
         return None
 
@@ -92,19 +85,9 @@ class WechatService:
                 logger.error(f"未找到app_id对应的secret: {app_id}")
                 return None
         
-        request_data = {
-            'appid': app_id,
-            'secret': app_secret,
-            'grant_type': 'authorization_code',
-            'js_code': code
-        }
-
-        async with aiohttp.ClientSession() as sess:
-            async with sess.get("https://api.weixin.qq.com/sns/jscode2session", params=request_data) as response:
-                text = await response.text()
-                data = json.loads(text)
-                logger.info(f"get_user_info_with_unionid resp: {data}")
-                return data
+        data = await WechatApiClient().code2session(app_id, app_secret, code)
+        logger.info(f"get_user_info_with_unionid resp: {data}")
+        return data
         
 
 
@@ -112,10 +95,7 @@ class WechatService:
     async def test_unionid_available(code: str) -> bool:
         """Test if unionid is available (check if open platform is enabled)"""
         appid, secret = WechatService.get_current_app_config()
-        url = f"https://api.weixin.qq.com/sns/jscode2session?appid={appid}&secret={secret}&js_code={code}&grant_type=authorization_code"
-        
-        response = requests.get(url)
-        data = response.json()
+        data = await WechatApiClient().code2session(appid, secret, code)
         
         # If unionid is returned, it means open platform is enabled
         return 'unionid' in data
@@ -162,22 +142,17 @@ class WechatService:
             access_token = await self._get_miniprogram_access_token(app_id, app_secret)
             
             # 调用获取手机号接口
-            url = f"https://api.weixin.qq.com/wxa/business/getuserphonenumber?access_token={access_token}"
-            payload = {"code": code}
+            data = await self.api.get_user_phone_number(access_token, code)
             
-            async with aiohttp.ClientSession() as sess:
-                async with sess.post(url, json=payload) as response:
-                    data = await response.json()
-                    
-                    if data.get("errcode") == 0:
-                        logger.info(f"成功获取用户手机号: appid={app_id}")
-                        return data
-                    else:
-                        errcode = data.get("errcode", -1)
-                        errmsg = data.get("errmsg", "未知错误")
-                        logger.error(f"获取用户手机号失败: errcode={errcode}, errmsg={errmsg}, appid={app_id}")
-                        return data
-                        
+            if data.get("errcode") == 0:
+                logger.info(f"成功获取用户手机号: appid={app_id}")
+                return data
+            else:
+                errcode = data.get("errcode", -1)
+                errmsg = data.get("errmsg", "未知错误")
+                logger.error(f"获取用户手机号失败: errcode={errcode}, errmsg={errmsg}, appid={app_id}")
+                return data
+                
         except Exception as e:
             logger.error(f"获取用户手机号异常: {str(e)}, code={code}")
             return {"errcode": -1, "errmsg": f"获取手机号异常: {str(e)}"}
@@ -199,67 +174,13 @@ class WechatService:
 
     @staticmethod
     async def get_access_token() -> str:
-        """Get service account access_token"""
-        if WechatService._service_access_token and time.time() < WechatService._service_token_expires_at - 300:
-            return WechatService._service_access_token
-
-        logger.info("Initiating service_access_token refresh via stable_token")
-
-        url = "https://api.weixin.qq.com/cgi-bin/stable_token"
-        payload = {
-            "grant_type": "client_credential",
-            "appid": settings.wechat.SERVICE_APPID,
-            "secret": settings.wechat.SERVICE_SECRET,
-            "force_refresh": False
-        }
-
-        async with aiohttp.ClientSession() as sess:
-            async with sess.post(url, json=payload) as resp:
-                data = await resp.json()
-
-                if "access_token" not in data:
-                    logger.error(f"Access_token acquisition failed: {data}")
-                    raise Exception(f"Access_token acquisition failed: {data}")
-
-                WechatService._service_access_token = data["access_token"]
-                WechatService._service_token_expires_at = time.time() + data["expires_in"]
-                logger.info(f"Stable token refreshed successfully. Expires in: {data['expires_in']}s")
-
-                # Async menu refresh
-                asyncio.create_task(WechatService._safe_create_menu(data["access_token"]))
-                return WechatService._service_access_token
-
-    @staticmethod
-    async def _safe_create_menu(token: str):
-        """Asynchronous menu creation """
-        try:
-            async with aiohttp.ClientSession() as sess:
-                # 使用动态菜单配置
-                menu_config = WechatMiniLink.get_menu_config()
-                # Manually serialize and specify ensure_ascii=False to handle non-ASCII characters
-                json_data = json.dumps(menu_config, ensure_ascii=False)
-                async with sess.post(
-                    f"https://api.weixin.qq.com/cgi-bin/menu/create?access_token={token}",
-                    data=json_data.encode('utf-8'),
-                    headers={'Content-Type': 'application/json; charset=utf-8'},
-                    timeout=10
-                ) as response:
-                    result = await response.json()
-                    if result.get('errcode') == 0:
-                        logger.info("Background menu created successfully")
-                    else:
-                        logger.warning(f"Background menu creation failed: {result}")
-        except Exception as e:
-            logger.error(f"Background menu creation exception: {str(e)}")
+        """Get service account access_token (cluster-shared, refreshed in background)"""
+        return await get_service_token_manager().get_token()
 
     @staticmethod
     def parse_xml(xml_data: str) -> Dict[str, Any]:
         """Parse WeChat XML data"""
-        root = ET.fromstring(xml_data)
-        result = {}
-        for child in root:
-            result[child.tag] = child.text
-        return result
+        return parse_wechat_xml(xml_data)
 
     async def handle_follow_event(self, event_data: Dict[str, Any]) -> str:
         """Handle follow event"""
@@ -271,8 +192,9 @@ class WechatService:
         # Save to database
         await self.save_service_openid(service_openid)
         
-        # Try to get service account user's unionid
-        await self.try_get_service_user_unionid(service_openid)
+        # unionid 由后台解析器批量回填；解析器未运行时逐个获取
+        if not await notify_unionid_resolver(service_openid):
+            await self.try_get_service_user_unionid(service_openid)
         
         logger.info(f"User follow event - service openid: {service_openid} processed")
         
@@ -284,38 +206,7 @@ class WechatService:
             logger.info(f"User followed via QR code with scene: {scene}")
             
             # 解析scene参数获取设备信息（格式：deviceType_version）
-            # 注意：FULL_DUPLEX和HALF_DUPLEX包含下划线，需要特殊处理
-            # scene格式：FULL_DUPLEX_v1 或 HALF_DUPLEX_v1
-            device_info = None
-            if scene.startswith('FULL_DUPLEX_'):
-                # FULL_DUPLEX_v1 -> 提取版本号
-                version = scene.replace('FULL_DUPLEX_', '', 1) if len(scene) > 12 else 'v1'
-                device_info = {
-                    "deviceType": "FULL_DUPLEX",
-                    "version": version
-                }
-            elif scene.startswith('HALF_DUPLEX_'):
-                # HALF_DUPLEX_v1 -> 提取版本号
-                version = scene.replace('HALF_DUPLEX_', '', 1) if len(scene) > 12 else 'v1'
-                device_info = {
-                    "deviceType": "HALF_DUPLEX",
-                    "version": version
-                }
-            else:
-                # 兼容旧格式（如果还有的话）
-                parts = scene.split('_')
-                if len(parts) >= 3:
-                    # 尝试解析 FULL, DUPLEX, version 格式
-                    if parts[0] == 'FULL' and parts[1] == 'DUPLEX':
-                        device_info = {
-                            "deviceType": "FULL_DUPLEX",
-                            "version": parts[2] if len(parts) > 2 else 'v1'
-                        }
-                    elif parts[0] == 'HALF' and parts[1] == 'DUPLEX':
-                        device_info = {
-                            "deviceType": "HALF_DUPLEX",
-                            "version": parts[2] if len(parts) > 2 else 'v1'
-                        }
+            device_info = parse_device_scene(scene)
             
             if device_info:
                 logger.info(f"Device info from scene: {device_info}")
@@ -376,10 +267,7 @@ class WechatService:
         try:
             # Get user info via service account access_token
             access_token = await WechatService.get_access_token()
-            url = f"https://api.weixin.qq.com/cgi-bin/user/info?access_token={access_token}&openid={service_openid}&lang=zh_CN"
-            
-            response = requests.get(url)
-            result = response.json()
+            result = await self.api.get_user_info(access_token, service_openid)
             logger.info(f"Get service user unionid resp: {result}")
             
             if result.get('unionid'):
@@ -446,18 +334,9 @@ class WechatService:
         try:
             access_token = await WechatService.get_access_token()
 
-            url = f"https://api.weixin.qq.com/cgi-bin/message/custom/send?access_token={access_token}"
-            
-            headers = {'Content-Type': 'application/json; charset=utf-8'}
-            data = {
-                "touser": service_openid,
-                "msgtype": "text",
-                "text": {
-                    "content": self._generate_welcome_content(device_info=device_info)
-                }
-            }
-            response = requests.post(url, headers=headers, data=bytes(json.dumps(data, ensure_ascii=False), encoding='utf-8'))
-            result = response.json()
+            # 欢迎语按设备型号预编译，这里只拼接 touser
+            body = get_welcome_renderer().body(service_openid, device_info)
+            result = await self.api.send_custom_message(access_token, body)
             
             if result.get('errcode') == 0:
                 logger.info(f"Welcome message sent successfully: {service_openid}, device_info: {device_info}")
@@ -471,7 +350,7 @@ class WechatService:
     @staticmethod
     async def generate_wechat_qrcode_with_scene(scene_str: str, is_permanent: bool = False) -> str:
         """
-        生成带scene参数的服务号二维码
+        生成带scene参数的服务号二维码（优先返回集群共享缓存中的二维码）
         
         Args:
             scene_str: 场景值字符串（最大64字符），例如 "fullDuplex_v1"
@@ -480,11 +359,18 @@ class WechatService:
         Returns:
             二维码图片URL
         """
+        # 验证scene_str长度
+        if len(scene_str) > 64:
+            raise ValueError("scene_str长度不能超过64字符")
+        
+        return await get_wechat_qrcode_cache().get_or_create(
+            scene_str, is_permanent, WechatService._create_wechat_qrcode
+        )
+
+    @staticmethod
+    async def _create_wechat_qrcode(scene_str: str, is_permanent: bool = False) -> Dict[str, Any]:
+        """调用微信接口生成二维码，返回 url / ticket / expire_seconds"""
         try:
-            # 验证scene_str长度
-            if len(scene_str) > 64:
-                raise ValueError("scene_str长度不能超过64字符")
-            
             # 获取access_token
             access_token = await WechatService.get_access_token()
             
@@ -503,12 +389,10 @@ class WechatService:
             
             # 如果是临时二维码，设置有效期（最长30天）
             if not is_permanent:
-                request_data["expire_seconds"] = 2592000  # 30天
+                request_data["expire_seconds"] = settings.wechat_qrcode.EXPIRE_SECONDS
             
             # 调用微信接口生成二维码
-            url = f"https://api.weixin.qq.com/cgi-bin/qrcode/create?access_token={access_token}"
-            response = requests.post(url, json=request_data)
-            result = response.json()
+            result = await WechatApiClient().create_qrcode(access_token, request_data)
             
             if result.get('errcode') and result.get('errcode') != 0:
                 error_msg = result.get('errmsg', '未知错误')
@@ -520,18 +404,21 @@ class WechatService:
                 raise Exception("未获取到二维码ticket")
             
             # 生成二维码图片URL（ticket需要URL编码）
-            from urllib.parse import quote
-            encoded_ticket = quote(ticket)
-            qr_code_url = f"https://mp.weixin.qq.com/cgi-bin/showqrcode?ticket={encoded_ticket}"
+            qr_code_url = WechatApiClient.qrcode_image_url(ticket)
             
             logger.info(f"二维码生成成功: scene={scene_str}, url={qr_code_url}")
-            return qr_code_url
+            return {
+                "url": qr_code_url,
+                "ticket": ticket,
+                "expire_seconds": result.get('expire_seconds')
+            }
             
         except Exception as e:
             logger.error(f"生成服务号二维码失败: {e}", exc_info=True)
             raise
 
-    def _generate_message_hash(self, service_openid: str, template_id: str, data: Dict[str, Any], url: Optional[str] = None, miniprogram: Optional[Dict] = None) -> str:
+    @staticmethod
+    def _generate_message_hash(service_openid: str, template_id: str, data: Dict[str, Any], url: Optional[str] = None, miniprogram: Optional[Dict] = None) -> str:
         """Generate a unique hash for the message to detect duplicates"""
         # 构建消息的唯一标识：openid + template_id + data内容 + url/miniprogram
         message_content = {
@@ -588,7 +475,6 @@ class WechatService:
                 return False  # 返回 False 表示未发送（因为重复）
             
             access_token = await WechatService.get_access_token()
-            api_url = f"https://api.weixin.qq.com/cgi-bin/message/template/send?access_token={access_token}"
             
             message = {
                 "touser": service_openid,
@@ -603,8 +489,12 @@ class WechatService:
             elif url:
                 message["url"] = url
             
-            response = requests.post(api_url, json=message)
-            result = response.json()
+            # 自适应限流：命中限流码时全局降速，并进入重试队列延迟重发
+            result = await send_rate_limited(
+                TEMPLATE_SEND_PATH,
+                lambda: self.api.send_template_message(access_token, message),
+                message
+            )
             
             if result.get('errcode') == 0:
                 logger.info(f"Template message sent successfully: {service_openid}")
@@ -613,12 +503,11 @@ class WechatService:
                 errcode = result.get('errcode')
                 errmsg = result.get('errmsg', '')
                 
-                # 处理40258错误码（二级限流）
-                if errcode == WechatErrorCode.RATE_LIMIT_SECOND_LEVEL:
+                # 限流错误码（40258 / 45009 / 45011）：已降速并加入重试队列
+                if errcode in RATE_LIMIT_ERRCODES:
                     logger.warning(
-                        f"Template message rate limited ({WechatErrorCode.RATE_LIMIT_SECOND_LEVEL}): service_openid={service_openid}, "
-                        f"template_id={template_id}, errmsg={errmsg}. "
-                        f"This should be prevented by duplicate check, message_hash={message_hash[:8]}..."
+                        f"Template message rate limited ({errcode}), scheduled for retry: service_openid={service_openid}, "
+                        f"template_id={template_id}, errmsg={errmsg}, message_hash={message_hash[:8]}..."
                     )
                 elif errcode == WechatErrorCode.USER_REFUSE_MESSAGE:
                     logger.warning(f"User refused to accept template message: {service_openid}, errmsg: {errmsg}")
@@ -706,37 +595,6 @@ class WechatService:
     #         logger.error(f"Failed to send template message via child_id: {e}")
     #         return False
 
-    def _generate_welcome_content(self, device_info: Optional[Dict[str, str]] = None) -> str:
-        """生成欢迎消息内容
-        
-        Args:
-            device_info: 可选的设备信息，格式：{"deviceType": "fullDuplex", "version": "v1"}
-        """
-        content = "👋 亲爱的家长，欢迎使用可豆陪陪！\n"
-        current_appid, _ = WechatService.get_current_app_config()
-        for config in WechatMiniLink.FIRST_MINI_LINK:
-            full_query = config['query']
-            
-            # 如果是"进入小程序"链接且有设备信息，在query中加上设备信息参数
-            if config['url_text'] == '进入小程序' and device_info:
-                device_params = f"deviceType={device_info.get('deviceType', '')}&version={device_info.get('version', 'v1')}"
-                if full_query:
-                    full_query = f"{full_query}&{device_params}"
-                else:
-                    full_query = device_params
-            
-            # 构建小程序路径，如果有query参数则加上
-            if full_query:
-                miniprogram_path = f"{config['path']}?{full_query}"
-            else:
-                miniprogram_path = config['path']
-            
-            content += f"{config['desc']}" \
-                       f"<a href=\"https://kidopally.cn/zh/manual\" data-miniprogram-appid={current_appid} " \
-                       f"data-miniprogram-path=\"{miniprogram_path}\">{config['url_text']}</a>\n"
-        return content.strip()
-
-
     async def handle_click_event(self, event_data: Dict[str, Any]) -> str:
         event_key = event_data.get('EventKey')
         service_openid = event_data.get('FromUserName')
@@ -754,16 +612,13 @@ class WechatService:
     async def _send_event_response(self, openid: str, config: Dict):
         try:
             access_token = await self.get_access_token()
-            async with aiohttp.ClientSession() as session:
-                await session.post(
-                    f"https://api.weixin.qq.com/cgi-bin/message/custom/send?access_token={access_token}",
-                    data=json.dumps({
-                        "touser": openid,
-                        "msgtype": config["type"],
-                        "text": {"content": config["content"]}
-                    }, ensure_ascii=False).encode('utf-8'),
-                    headers={'Content-Type': 'application/json; charset=utf-8'}
-                )
+            result = await self.api.send_custom_message(access_token, {
+                "touser": openid,
+                "msgtype": config["type"],
+                "text": {"content": config["content"]}
+            })
+            if result.get('errcode') != 0:
+                logger.error(f"Failed to send event response: {result}")
         except Exception as e:
             logger.error(f"Failed to send event response: {e}")
 
@@ -781,7 +636,6 @@ class WechatService:
         """Send auto reply message"""
         try:
             access_token = await WechatService.get_access_token()
-            url = f"https://api.weixin.qq.com/cgi-bin/message/custom/send?access_token={access_token}"
             
             data = {
                 "touser": service_openid,
@@ -789,12 +643,7 @@ class WechatService:
                 "text": {"content": self._generate_auto_reply_content()}
             }
             
-            response = requests.post(
-                url, 
-                headers={'Content-Type': 'application/json; charset=utf-8'},
-                data=bytes(json.dumps(data, ensure_ascii=False), encoding='utf-8')
-            )
-            result = response.json()
+            result = await self.api.send_custom_message(access_token, data)
             
             if result.get('errcode') == 0:
                 logger.info(f"Auto reply message sent successfully: {service_openid}")
@@ -808,6 +657,128 @@ class WechatService:
         """Generate auto reply content"""
         return WechatMiniLink.GENERAL_AUTO_REPLY
         
+    @staticmethod
+    def _content_check_passed() -> WechatContentSecurityResult:
+        return WechatContentSecurityResult(
+            safe=True,
+            suggest=ContentSecuritySuggest.PASS,
+            label=ContentSecurityLabel.NORMAL,
+            detail=[],
+            trace_id=""
+        )
+
+    @staticmethod
+    def _local_content_verdict(
+        content: str,
+        title: Optional[str] = None,
+        nickname: Optional[str] = None,
+        signature: Optional[str] = None
+    ) -> Optional[WechatContentSecurityResult]:
+        """本地预过滤：明确违规的内容直接拒绝，不再查库和调用微信接口"""
+        prefilter = get_content_prefilter()
+        if prefilter is None:
+            return None
+        local_result = prefilter.check(content[:2500], title, nickname, signature)
+        if local_result.verdict == PreFilterVerdict.REVIEW:
+            logger.debug(f"Content tagged by local pre-filter, defer to msg_sec_check - matches: {local_result.matches}")
+        if local_result.verdict != PreFilterVerdict.REJECT:
+            return None
+        logger.info(f"Content rejected by local pre-filter - matches: {local_result.matches}")
+        return WechatContentSecurityResult(
+            safe=False,
+            suggest=ContentSecuritySuggest.RISKY,
+            label=local_result.label,
+            detail=[local_result.detail()],
+            trace_id=""
+        )
+
+    @staticmethod
+    def _content_cache_key(
+        content: str,
+        scene: int,
+        title: Optional[str] = None,
+        nickname: Optional[str] = None,
+        signature: Optional[str] = None
+    ) -> str:
+        return ContentVerdictCache.key(
+            content[:2500], scene, title, nickname,
+            signature if scene == ContentSecurityScene.PROFILE else None
+        )
+
+    @staticmethod
+    async def _cached_content_verdict(cache_key: str) -> Optional[WechatContentSecurityResult]:
+        """相同内容直接复用缓存的检查结果，不消耗微信配额；负缓存命中时抛出异常"""
+        verdict_cache = get_content_verdict_cache()
+        if verdict_cache is None:
+            return None
+        cached = await verdict_cache.get(cache_key)
+        if cached is None:
+            return None
+        if "error" in cached:
+            raise Exception(f"Content security check failed: {cached['error']} (cached)")
+        return WechatContentSecurityResult(**cached["result"])
+
+    async def _resolve_content_openid(self, user_id: str, source: str) -> str:
+        user_source = await self.user_source_repo.get_with_user_id(user_id=user_id, source=source)
+        if not user_source or not user_source.openid:
+            logger.error(f"User openid not found: {user_id}")
+            raise Exception(f"User openid not found: {user_id}")
+        return user_source.openid
+
+    async def _remote_content_verdict(
+        self,
+        access_token: str,
+        openid: str,
+        cache_key: str,
+        content: str,
+        scene: int,
+        title: Optional[str] = None,
+        nickname: Optional[str] = None,
+        signature: Optional[str] = None
+    ) -> WechatContentSecurityResult:
+        """调用微信 msg_sec_check，并把结果（或由内容决定的错误）写入缓存"""
+        verdict_cache = get_content_verdict_cache()
+        payload = {
+            "openid": openid,
+            "scene": scene,
+            "version": 2,
+            "content": content[:2500]
+        }
+        
+        if title:
+            payload["title"] = title
+        if nickname:
+            payload["nickname"] = nickname
+        if signature and scene == ContentSecurityScene.PROFILE:
+            payload["signature"] = signature
+        
+        # 网络 / 熔断等 WechatApiError 与内容无关，不缓存，直接抛出
+        result = await self.api.msg_sec_check(access_token, payload)
+        logger.info(f"Content security check result: {result}")
+        
+        if result.get('errcode') == 0:
+            suggest = result.get('result', {}).get('suggest', 'review')
+            label = result.get('result', {}).get('label', 21000)
+            detail = result.get('detail', [])
+            trace_id = result.get('trace_id', '')
+            
+            security_result = WechatContentSecurityResult(
+                safe=suggest == ContentSecuritySuggest.PASS,
+                suggest=suggest,
+                label=label,
+                detail=detail,
+                trace_id=trace_id
+            )
+            if verdict_cache is not None:
+                await verdict_cache.set_result(cache_key, security_result)
+            return security_result
+        else:
+            logger.error(f"Content security check API error: {result}")
+            errmsg = result.get('errmsg', 'Unknown error')
+            if verdict_cache is not None and verdict_cache.is_cacheable_error(result.get('errcode')):
+                await verdict_cache.set_error(cache_key, errmsg)
+            raise Exception(f"Content security check failed: {errmsg}")
+
     async def check_content_security(
         self, 
         user_id: str, 
@@ -816,107 +787,120 @@ class WechatService:
         title: Optional[str] = None,
         nickname: Optional[str] = None,
         signature: Optional[str] = None,
-        source: str = "mini_program"
+        source: str = "mini_program",
+        force_recheck: bool = False
     ) -> WechatContentSecurityResult:
+        """
+        内容安全检查：本地预过滤 -> 结果缓存 -> 微信 msg_sec_check
+        force_recheck 为 True 时跳过缓存读取，强制调用微信重新检查（结果仍会写回缓存）
+        """
         try:
             if settings.wechat.DISABLE_WECHAT_CONTENT_SECURITY_CHECK:
                 logger.warning("WeChat content security check is disabled")
-                return WechatContentSecurityResult(
-                    safe=True,
-                    suggest=ContentSecuritySuggest.PASS,
-                    label=ContentSecurityLabel.NORMAL,
-                    detail=[],
-                    trace_id=""
-                )
+                return self._content_check_passed()
             
-            user_source = await self.user_source_repo.get_with_user_id(user_id=user_id, source=source)
-            if not user_source or not user_source.openid:
-                logger.error(f"User openid not found: {user_id}")
-                raise Exception(f"User openid not found: {user_id}")
+            local_result = self._local_content_verdict(content, title, nickname, signature)
+            if local_result is not None:
+                return local_result
             
-            openid = user_source.openid
+            cache_key = self._content_cache_key(content, scene, title, nickname, signature)
+            if not force_recheck:
+                cached = await self._cached_content_verdict(cache_key)
+                if cached is not None:
+                    return cached
+            
+            openid = await self._resolve_content_openid(user_id, source)
             logger.info(f"Content security check - user_id: {user_id}, openid: {openid}, content length: {len(content)}")
             app_id, app_secret = WechatService.get_current_app_config()
             access_token = await self._get_miniprogram_access_token(app_id, app_secret)
 
-            url = f"https://api.weixin.qq.com/wxa/msg_sec_check?access_token={access_token}"
-            
-            payload = {
-                "openid": openid,
-                "scene": scene,
-                "version": 2,
-                "content": content[:2500]
-            }
-            
-            if title:
-                payload["title"] = title
-            if nickname:
-                payload["nickname"] = nickname
-            if signature and scene == ContentSecurityScene.PROFILE:
-                payload["signature"] = signature
-            
-            async with aiohttp.ClientSession() as sess:
-                json_data = json.dumps(payload, ensure_ascii=False)
-                async with sess.post(
-                    url,
-                    data=json_data.encode('utf-8'),
-                    headers={'Content-Type': 'application/json; charset=utf-8'}
-                ) as response:
-                    result = await response.json()
-                    logger.info(f"Content security check result: {result}")
+            return await self._remote_content_verdict(
+                access_token, openid, cache_key, content, scene, title, nickname, signature
+            )
                     
-                    if result.get('errcode') == 0:
-                        suggest = result.get('result', {}).get('suggest', 'review')
-                        label = result.get('result', {}).get('label', 21000)
-                        detail = result.get('detail', [])
-                        trace_id = result.get('trace_id', '')
-                        
-                        return WechatContentSecurityResult(
-                            safe=suggest == ContentSecuritySuggest.PASS,
-                            suggest=suggest,
-                            label=label,
-                            detail=detail,
-                            trace_id=trace_id
-                        )
-                    else:
-                        logger.error(f"Content security check API error: {result}")
-                        raise Exception(f"Content security check failed: {result.get('errmsg', 'Unknown error')}")
-                        
         except Exception as e:
             logger.error(f"Content security check failed: {e}")
             raise
 
-    async def _get_miniprogram_access_token(self, app_id: str, app_secret: str) -> str:
-        if WechatService._miniprogram_access_token and time.time() < WechatService._miniprogram_token_expires_at - 300:
-            logger.debug(f"Using cached miniprogram access_token, expires in {int(WechatService._miniprogram_token_expires_at - time.time())}s")
-            return WechatService._miniprogram_access_token
-        
-        logger.info(f"Refreshing miniprogram access_token for appid: {app_id} via stable_token")
-        
-        # 使用稳定版 access_token 接口（推荐）
-        # 参考文档：https://developers.weixin.qq.com/miniprogram/dev/api-backend/open-api/access-token/getStableAccessToken.html
-        url = "https://api.weixin.qq.com/cgi-bin/stable_token"
-        payload = {
-            "grant_type": "client_credential",
-            "appid": app_id,
-            "secret": app_secret,
-            "force_refresh": False  # 不强制刷新，使用缓存的 token
-        }
-        
-        async with aiohttp.ClientSession() as sess:
-            async with sess.post(url, json=payload) as response:
-                data = await response.json()
-                
-                if "access_token" not in data:
-                    errcode = data.get('errcode', -1)
-                    errmsg = data.get('errmsg', '未知错误')
-                    logger.error(f"Failed to get miniprogram access_token: errcode={errcode}, errmsg={errmsg}")
-                    raise Exception(f"Failed to get miniprogram access_token: errcode={errcode}, errmsg={errmsg}")
-                
-                WechatService._miniprogram_access_token = data["access_token"]
-                WechatService._miniprogram_token_expires_at = time.time() + data.get("expires_in", 7200)
-                
-                logger.info(f"Miniprogram access_token refreshed successfully via stable_token. Expires in: {data.get('expires_in', 7200)}s")
-                
-                return WechatService._miniprogram_access_token
+    async def check_content_security_batch(
+        self,
+        user_id: str,
+        items: List[ContentSecurityCheckRequest],
+        source: str = "mini_program",
+        force_recheck: bool = False
+    ) -> List[ContentSecurityBatchItemResult]:
+        """
+        批量内容安全检查（同一用户的多段文本），结果与输入顺序一致
+        - 本地预过滤与缓存先行，相同文本只检查一次
+        - openid 与 access_token 只获取一次，剩余文本以有限并发调用微信接口
+        - 单条失败只影响该条结果，不影响其它条目
+        """
+        if settings.wechat.DISABLE_WECHAT_CONTENT_SECURITY_CHECK:
+            logger.warning("WeChat content security check is disabled")
+            return [ContentSecurityBatchItemResult(index=i, result=self._content_check_passed()) for i in range(len(items))]
+
+        # 相同内容去重：cache_key -> 首次出现的条目
+        unique: Dict[str, ContentSecurityCheckRequest] = {}
+        keys = []
+        for item in items:
+            cache_key = self._content_cache_key(item.content, item.scene, item.title, item.nickname, item.signature)
+            keys.append(cache_key)
+            unique.setdefault(cache_key, item)
+
+        outcomes: Dict[str, Any] = {}
+        pending = []
+        for cache_key, item in unique.items():
+            local_result = self._local_content_verdict(item.content, item.title, item.nickname, item.signature)
+            if local_result is not None:
+                outcomes[cache_key] = local_result
+                continue
+            if not force_recheck:
+                try:
+                    cached = await self._cached_content_verdict(cache_key)
+                except Exception as e:
+                    outcomes[cache_key] = e
+                    continue
+                if cached is not None:
+                    outcomes[cache_key] = cached
+                    continue
+            pending.append(cache_key)
+
+        logger.info(
+            f"Batch content security check - user_id: {user_id}, items: {len(items)}, "
+            f"unique: {len(unique)}, remote: {len(pending)}"
+        )
+        if pending:
+            try:
+                openid = await self._resolve_content_openid(user_id, source)
+                app_id, app_secret = WechatService.get_current_app_config()
+                access_token = await self._get_miniprogram_access_token(app_id, app_secret)
+            except Exception as e:
+                logger.error(f"Batch content security check failed: {e}")
+                outcomes.update((cache_key, e) for cache_key in pending)
+                pending = []
+
+            semaphore = asyncio.Semaphore(settings.content_filter.BATCH_CONCURRENCY)
+
+            async def _check(cache_key: str) -> WechatContentSecurityResult:
+                item = unique[cache_key]
+                async with semaphore:
+                    return await self._remote_content_verdict(
+                        access_token, openid, cache_key,
+                        item.content, item.scene, item.title, item.nickname, item.signature
+                    )
+
+            results = await asyncio.gather(*(_check(cache_key) for cache_key in pending), return_exceptions=True)
+            outcomes.update(zip(pending, results))
 
+        batch_results = []
+        for index, cache_key in enumerate(keys):
+            outcome = outcomes[cache_key]
+            if isinstance(outcome, BaseException):
+                batch_results.append(ContentSecurityBatchItemResult(index=index, error=str(outcome)))
+            else:
+                batch_results.append(ContentSecurityBatchItemResult(index=index, result=outcome))
+        return batch_results
+
+    async def _get_miniprogram_access_token(self, app_id: str, app_secret: str) -> str:
+        """Get miniprogram access_token (cluster-shared, refreshed in background)"""
+        return await get_token_manager(app_id, app_secret).get_token()
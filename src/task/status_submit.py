@@ -1,72 +1,38 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 # @File    : status_submit.py
+"""
+设备状态上报消费进程
+在 src 目录下运行：python -m task.status_submit
+收到 SIGTERM / SIGINT 后停止拉取新消息，写入并确认已收到的消息后退出
+"""
 
-import time
-import threading
-from loguru import logger
-from concurrent.futures import ThreadPoolExecutor
-
-RABBITMQ_USERNAME = "guest"
-RABBITMQ_PASSWORD = "guest"
-RABBITMQ_HOST = "localhost"
-RABBITMQ_PORT = 5672
-
-queue_name = 'KIDO-DEVICE-STATUS-REPORT'
-CELERY_BROKER_URL = f"amqp://{RABBITMQ_USERNAME}:{RABBITMQ_PASSWORD}@{RABBITMQ_HOST}:{RABBITMQ_PORT}/"
-
-import pika
-
-
-# TODO: 工程化
+import asyncio
+import signal
 
-#
-def process_message(ch, method, properties, body):
-    logger.info(f"Thread {threading.current_thread().name} is processing message: {body.decode()}")
-    # TODO: 写入redis
-    ch.basic_ack(delivery_tag=method.delivery_tag)
-
-def create_connection():
-    while True:
-        try:
-            connection = pika.BlockingConnection(pika.ConnectionParameters(host="localhost"))
-            return connection
-        except Exception as e:
-            logger.error(f"Connection error: {e}. Retrying in 5 seconds...")
-            time.sleep(5)
-
-
-def create_consumer_thread():
-    connection = create_connection()
-    channel = connection.channel()
-
-    # 声明队列，确保队列存在
-    channel.queue_declare(queue=queue_name, durable=True)
+from loguru import logger
+from core.rabbitmq import close_rabbitmq
+from package.redis.client import close_redis_connections
+from services.device_status import DeviceStatusConsumer
 
-    # 设置消费者回调函数
-    channel.basic_consume(
-        queue=queue_name,
-        on_message_callback=process_message,
-        auto_ack=False  # 使用手动确认消息
-    )
 
-    try:
-        logger.info("Starting to consume messages...")
-        channel.start_consuming()
-    except Exception as e:
-        logger.error(f"Stream connection lost: {e}")
-        # 重启消费者
-        start_consumers()
+async def main():
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
 
+    consumer = DeviceStatusConsumer()
+    consumer.start()
+    logger.info("Device status consumer started")
+    await stopping.wait()
 
-def start_consumers():
-    # 线程池的大小，可以根据你的需求进行调整
-    THREAD_POOL_SIZE = 5
-    executor = ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE)
-    for i in range(THREAD_POOL_SIZE):
-        executor.submit(create_consumer_thread)
+    logger.info("Stopping device status consumer...")
+    await consumer.stop()
+    await close_rabbitmq()
+    await close_redis_connections()
+    logger.info(f"Device status consumer stopped: {consumer.metrics()}")
 
 
 if __name__ == "__main__":
-    start_consumers()
-
+    asyncio.run(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : bench_device_status.py
+"""
+设备状态消费吞吐基准测试
+在 src 目录下运行：python -m test.benchmark.bench_device_status [--messages 20000] [--redis-ms 0.5]
+
+用本地 broker 替身（按 prefetch 窗口投递，ack 后才继续投递）和带往返延迟的 Redis 替身对比：
+1. 原方式：多个 worker 逐条处理，每条消息 HSET + EXPIRE 两次 Redis 往返后单独 ack
+2. DeviceStatusConsumer：凑批后同一设备合并，一个 pipeline 写完整批，ack(multiple=True) 一次确认
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from services.device_state import DeviceStateStore
+from services.device_status import DeviceStatusConsumer
+
+
+class FakeRedisServer:
+    """Redis 替身：每次往返（单条命令或一个 pipeline）固定延迟"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.roundtrips = 0
+
+    async def _roundtrip(self):
+        self.roundtrips += 1
+        await asyncio.sleep(self.latency)
+
+    async def hset(self, key, mapping=None):
+        await self._roundtrip()
+
+    async def expire(self, key, seconds):
+        await self._roundtrip()
+
+    def pipeline(self, transaction=True):
+        server = self
+
+        class Pipeline:
+            def hset(self, *args, **kwargs):
+                pass
+
+            def expire(self, *args, **kwargs):
+                pass
+
+            async def execute(self):
+                await server._roundtrip()
+
+        return Pipeline()
+
+    @asynccontextmanager
+    async def client(self):
+        yield self
+
+
+class FakeMessage:
+    def __init__(self, broker, tag: int, body: bytes):
+        self.broker = broker
+        self.delivery_tag = tag
+        self.body = body
+
+    async def ack(self, multiple=False):
+        self.broker.settle(self.delivery_tag, multiple)
+
+    async def nack(self, multiple=False, requeue=True):
+        self.broker.settle(self.delivery_tag, multiple)
+
+    async def reject(self, requeue=False):
+        self.broker.settle(self.delivery_tag, False)
+
+
+class FakeBroker:
+    """broker 替身：未确认消息达到 prefetch 时暂停投递，统计确认帧数"""
+
+    def __init__(self, bodies, prefetch: int):
+        self.bodies = bodies
+        self.prefetch = prefetch
+        self.unacked = set()
+        self.acked = 0
+        self.ack_frames = 0
+        self.window = asyncio.Condition()
+        self.done = asyncio.Event()
+
+    def settle(self, tag: int, multiple: bool):
+        self.ack_frames += 1
+        tags = {t for t in self.unacked if t <= tag} if multiple else {tag}
+        self.unacked -= tags
+        self.acked += len(tags)
+        if self.acked == len(self.bodies):
+            self.done.set()
+        asyncio.get_running_loop().create_task(self._notify())
+
+    async def _notify(self):
+        async with self.window:
+            self.window.notify_all()
+
+    async def deliver(self, callback):
+        for tag, body in enumerate(self.bodies, start=1):
+            async with self.window:
+                await self.window.wait_for(lambda: len(self.unacked) < self.prefetch)
+            self.unacked.add(tag)
+            await callback(FakeMessage(self, tag, body))
+
+
+def make_bodies(count: int, devices: int):
+    rng = random.Random(42)
+    return [
+        json.dumps({
+            "device_id": f"dev-{rng.randrange(devices):06d}",
+            "battery": rng.randint(1, 100),
+            "volume": rng.randint(0, 15),
+            "network": rng.choice(["wifi", "4g"]),
+            "playing": rng.random() < 0.3,
+        }).encode()
+        for _ in range(count)
+    ]
+
+
+async def bench_per_message(bodies, redis: FakeRedisServer, prefetch: int, workers: int):
+    broker = FakeBroker(bodies, prefetch)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while True:
+            message = await queue.get()
+            status = json.loads(message.body)
+            key = f"kido:device:state:{status.pop('device_id')}"
+            await redis.hset(key, mapping=status)
+            await redis.expire(key, 300)
+            await message.ack()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    start = time.perf_counter()
+    delivery = asyncio.create_task(broker.deliver(queue.put))
+    await broker.done.wait()
+    elapsed = time.perf_counter() - start
+    for task in tasks + [delivery]:
+        task.cancel()
+    return len(bodies) / elapsed, broker.ack_frames, redis.roundtrips
+
+
+async def bench_batched(bodies, redis: FakeRedisServer, prefetch: int, batch_size: int, flush_ms: int):
+    broker = FakeBroker(bodies, prefetch)
+    config = SimpleNamespace(
+        QUEUE="bench", PREFETCH=prefetch, BATCH_SIZE=batch_size, FLUSH_MS=flush_ms,
+        STATE_TTL=300, RETRY_DELAY=0, RECONNECT_DELAY=1,
+    )
+
+    class Client:
+        async def consume(self, queue_name, callback, prefetch_count):
+            self.delivery = asyncio.create_task(broker.deliver(callback))
+            return "bench"
+
+        async def cancel(self, consumer_tag):
+            self.delivery.cancel()
+
+        async def close(self):
+            pass
+
+    store = DeviceStateStore(redis_factory=redis.client, config=config)
+    consumer = DeviceStatusConsumer(client=Client(), config=config, store=store)
+    start = time.perf_counter()
+    consumer.start()
+    await broker.done.wait()
+    elapsed = time.perf_counter() - start
+    await consumer.stop()
+    return len(bodies) / elapsed, broker.ack_frames, redis.roundtrips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--redis-ms", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--prefetch", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--flush-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    bodies = make_bodies(args.messages, args.devices)
+    latency = args.redis_ms / 1000
+    base_rate, base_acks, base_rtt = asyncio.run(
+        bench_per_message(bodies, FakeRedisServer(latency), args.prefetch, args.workers)
+    )
+    batch_rate, batch_acks, batch_rtt = asyncio.run(
+        bench_batched(bodies, FakeRedisServer(latency), args.prefetch, args.batch_size, args.flush_ms)
+    )
+    print(f"per-message ({args.workers} workers): {base_rate:8.0f} msg/s, {base_acks} ack frames, {base_rtt} redis round trips")
+    print(f"batched consumer:      {batch_rate:8.0f} msg/s ({batch_rate / base_rate:.1f}x), "
+          f"{batch_acks} ack frames, {batch_rtt} redis round trips")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : bench_tracking_codec.py
+"""
+埋点消息编码体积 / CPU 基准测试
+在 src 目录下运行：python -m test.benchmark.bench_tracking_codec [--events 20000] [--batch-size 200]
+
+用接近线上的事件（小程序页面浏览、设备上报、带 event_properties / extra 的点击）对比：
+1. 原方式：每个事件 model_dump_json 一条消息
+2. protobuf 批量消息，以及 gzip / zstd（已安装 zstandard 时）压缩
+输出每个事件的平均线上字节数、编码（含凑批拼接和压缩）与解码耗时
+"""
+
+import argparse
+import random
+import time
+
+from entity.data_track import TrackEventRequest
+from services.tracking_codec import TrackingCodec, decode_message, zstandard
+
+PAGES = ["home", "story_detail", "device_bind", "child_profile", "song_list", "settings"]
+EVENTS = ["page_view", "click", "exposure", "play_start", "play_end", "device_report"]
+
+
+def make_event(rng: random.Random, i: int) -> TrackEventRequest:
+    kind = i % 3
+    common = dict(
+        user_id=f"{rng.getrandbits(64):016x}",
+        event_name=rng.choice(EVENTS),
+        page=rng.choice(PAGES),
+        report_source="miniprogram" if kind != 1 else "device",
+        extra={"client_ip": f"10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}"},
+    )
+    if kind == 0:
+        # 小程序页面浏览
+        return TrackEventRequest(
+            mp_scene=str(rng.choice([1001, 1011, 1047])), mp_version="3.2.1", mp_platform="ios",
+            mp_sdk_version="3.4.10", mp_language="zh_CN", mobile_model="iPhone 14", mobile_brand="Apple",
+            mobile_system="iOS 17.2", **common,
+        )
+    if kind == 1:
+        # 设备上报
+        return TrackEventRequest(
+            device_id=f"dev-{rng.getrandbits(48):012x}", device_network_type="wifi", module="player",
+            event_properties={"battery": rng.randint(1, 100), "volume": rng.randint(0, 15), "rssi": -rng.randint(30, 90)},
+            **common,
+        )
+    # 带业务属性的点击
+    return TrackEventRequest(
+        child_id=f"{rng.getrandbits(64):016x}", agent_id=f"{rng.getrandbits(64):016x}",
+        content_id=f"{rng.getrandbits(64):016x}", position=str(rng.randint(0, 20)), name="card",
+        event_properties={"tab": rng.choice(["story", "song"]), "duration_ms": rng.randint(0, 60000), "auto": False},
+        **common,
+    )
+
+
+def bench(codec: TrackingCodec, events, batch_size: int):
+    """返回 (字节/事件, 编码 µs/事件, 解码 µs/事件)"""
+    start = time.perf_counter()
+    messages = []
+    for offset in range(0, len(events), batch_size):
+        records = [codec.encode_event(event) for event in events[offset:offset + batch_size]]
+        bodies, content_type, content_encoding = codec.frame(records)
+        messages.extend((body, content_type, content_encoding) for body in bodies)
+    encode_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = sum(len(decode_message(*message)) for message in messages)
+    decode_elapsed = time.perf_counter() - start
+    assert decoded == len(events)
+
+    total_bytes = sum(len(body) for body, _, _ in messages)
+    return total_bytes / len(events), encode_elapsed / len(events) * 1e6, decode_elapsed / len(events) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    events = [make_event(rng, i) for i in range(args.events)]
+    codecs = [("json per event", TrackingCodec()), ("protobuf batch", TrackingCodec("protobuf"))]
+    codecs.append(("protobuf batch + gzip", TrackingCodec("protobuf", "gzip")))
+    if zstandard is not None:
+        codecs.append(("protobuf batch + zstd", TrackingCodec("protobuf", "zstd")))
+
+    baseline = None
+    for label, codec in codecs:
+        size, encode_us, decode_us = bench(codec, events, args.batch_size)
+        baseline = baseline or size
+        print(f"{label:<24} {size:8.1f} B/event ({size / baseline:5.1%})  "
+              f"encode {encode_us:6.2f} µs/event  decode {decode_us:6.2f} µs/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : bench_tracking_publisher.py
+"""
+埋点发布吞吐基准测试
+在 src 目录下运行：python -m test.benchmark.bench_tracking_publisher [--requests 2000] [--confirm-ms 2]
+
+用带确认延迟的本地交换机替身代替 RabbitMQ，在同样的请求并发上限（--concurrency，对应 uvicorn --limit-concurrency）下对比：
+1. 原方式：BackgroundTask 在请求结束前逐条 publish 并等待 confirm，期间一直占用请求名额
+2. TrackingPublisher：请求只入队，后台凑批后流水线发布、统一等待 confirm
+"""
+
+import argparse
+import asyncio
+import time
+
+from core.config.settings import settings
+from contextlib import asynccontextmanager
+
+from core.rabbitmq import RabbitMQClient
+from entity.data_track import TrackEventRequest
+from services.tracking_publisher import TrackingPublisher
+
+
+class FakeExchange:
+    """本地交换机替身：每条消息的 broker 确认有固定往返延迟，单连接上串行写入"""
+
+    def __init__(self, confirm_latency: float):
+        self.confirm_latency = confirm_latency
+        self.published = 0
+
+    async def publish(self, message, routing_key):
+        await asyncio.sleep(self.confirm_latency)
+        self.published += 1
+
+
+class FakeManager:
+    """连接管理替身：跳过真实连接，所有 channel 共用同一个交换机替身"""
+
+    def __init__(self, confirm_latency: float):
+        self.fake_exchange = FakeExchange(confirm_latency)
+
+    @asynccontextmanager
+    async def channel(self):
+        yield None
+
+    async def exchange(self, channel, name):
+        return self.fake_exchange
+
+
+def make_client(confirm_latency: float) -> RabbitMQClient:
+    return RabbitMQClient(manager=FakeManager(confirm_latency))
+
+
+def make_requests(count: int, events_per_request: int):
+    return [
+        [TrackEventRequest(event_name="page_view", page=f"page_{i}", extra={"client_ip": "127.0.0.1"})
+         for _ in range(events_per_request)]
+        for i in range(count)
+    ]
+
+
+async def bench_per_event(requests, confirm_latency: float, concurrency: int):
+    """返回 (请求处理速率, 事件发布速率)"""
+    client = make_client(confirm_latency)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def handle(events):
+        async with slots:
+            await client.publish_events(events)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(events) for events in requests))
+    elapsed = time.perf_counter() - start
+    total = sum(len(events) for events in requests)
+    assert client.manager.fake_exchange.published == total
+    return len(requests) / elapsed, total / elapsed
+
+
+async def bench_batched(requests, confirm_latency: float, concurrency: int, batch_size: int, linger_ms: int):
+    """返回 (请求处理速率, 事件发布速率)"""
+    client = make_client(confirm_latency)
+    config = settings.rabbitmq.model_copy(update={
+        "TRACKING_BATCH_SIZE": batch_size,
+        "TRACKING_LINGER_MS": linger_ms,
+        "TRACKING_QUEUE_SIZE": sum(len(events) for events in requests),
+    })
+    publisher = TrackingPublisher(client=client, config=config)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def handle(events):
+        async with slots:
+            publisher.offer(events)
+
+    publisher.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(events) for events in requests))
+    request_elapsed = time.perf_counter() - start
+    # 队列满时被拒绝的事件不计入
+    total = publisher.enqueued
+    while publisher.published < total:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    await publisher.stop()
+    return len(requests) / request_elapsed, total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--events-per-request", type=int, default=5)
+    parser.add_argument("--confirm-ms", type=float, default=2)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--linger-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    requests = make_requests(args.requests, args.events_per_request)
+    latency = args.confirm_ms / 1000
+    base_requests, base_events = asyncio.run(bench_per_event(requests, latency, args.concurrency))
+    batch_requests, batch_events = asyncio.run(
+        bench_batched(requests, latency, args.concurrency, args.batch_size, args.linger_ms)
+    )
+    print(f"per-event publish: {base_requests:.0f} requests/s, {base_events:.0f} events/s")
+    print(f"batched publisher: {batch_requests:.0f} requests/s ({batch_requests / base_requests:.1f}x), "
+          f"{batch_events:.0f} events/s ({batch_events / base_events:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
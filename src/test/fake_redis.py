@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : fake_redis.py
+
+import time
+from contextlib import asynccontextmanager
+
+
+class FakeRedis:
+    """
+    进程内 Redis 替身（仅实现测试用到的命令）
+    与生产连接池一致（decode_responses=False），读出的值为 bytes
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.expire_at = {}
+        self.calls = []
+        self.published = []
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode("utf-8")
+
+    def _alive(self, key) -> bool:
+        deadline = self.expire_at.get(key)
+        if deadline is not None and time.time() >= deadline:
+            self.store.pop(key, None)
+            self.expire_at.pop(key, None)
+        return key in self.store
+
+    async def get(self, key):
+        self.calls.append(("get", key))
+        return self.store.get(key) if self._alive(key) else None
+
+    async def mget(self, keys):
+        self.calls.append(("mget", tuple(keys)))
+        return [self.store.get(key) if self._alive(key) else None for key in keys]
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        self.calls.append(("set", key))
+        if nx and self._alive(key):
+            return None
+        self.store[key] = self._encode(value)
+        self.expire_at.pop(key, None)
+        if ex is not None:
+            self.expire_at[key] = time.time() + ex
+        elif px is not None:
+            self.expire_at[key] = time.time() + px / 1000
+        return True
+
+    async def setex(self, key, seconds, value):
+        return await self.set(key, value, ex=seconds)
+
+    async def exists(self, *keys):
+        self.calls.append(("exists", keys))
+        return sum(1 for key in keys if self._alive(key))
+
+    async def delete(self, *keys):
+        self.calls.append(("delete", keys))
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.store[key]
+                self.expire_at.pop(key, None)
+                removed += 1
+        return removed
+
+    async def expire(self, key, seconds):
+        self.calls.append(("expire", key))
+        if not self._alive(key):
+            return False
+        self.expire_at[key] = time.time() + seconds
+        return True
+
+    async def ttl(self, key):
+        self.calls.append(("ttl", key))
+        if not self._alive(key):
+            return -2
+        deadline = self.expire_at.get(key)
+        return -1 if deadline is None else max(int(deadline - time.time()), 0)
+
+    async def hset(self, name, key=None, value=None, mapping=None):
+        self.calls.append(("hset", name))
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        if not self._alive(name):
+            self.store[name] = {}
+        hash_ = self.store[name]
+        added = 0
+        for field, field_value in items.items():
+            field = self._encode(field)
+            added += field not in hash_
+            hash_[field] = self._encode(field_value)
+        return added
+
+    async def hget(self, name, key):
+        self.calls.append(("hget", name))
+        if not self._alive(name):
+            return None
+        return self.store[name].get(self._encode(key))
+
+    async def hmget(self, name, keys):
+        self.calls.append(("hmget", name))
+        hash_ = self.store[name] if self._alive(name) else {}
+        return [hash_.get(self._encode(key)) for key in keys]
+
+    async def hdel(self, name, *keys):
+        self.calls.append(("hdel", name))
+        if not self._alive(name):
+            return 0
+        return sum(1 for key in keys if self.store[name].pop(self._encode(key), None) is not None)
+
+    async def hgetall(self, name):
+        self.calls.append(("hgetall", name))
+        return dict(self.store[name]) if self._alive(name) else {}
+
+    async def hincrby(self, name, key, amount=1):
+        self.calls.append(("hincrby", name))
+        if not self._alive(name):
+            self.store[name] = {}
+        hash_ = self.store[name]
+        field = self._encode(key)
+        hash_[field] = self._encode(int(hash_.get(field, b"0")) + amount)
+        return int(hash_[field])
+
+    async def zadd(self, name, mapping):
+        self.calls.append(("zadd", name))
+        if not self._alive(name):
+            self.store[name] = {}
+        zset = self.store[name]
+        added = sum(1 for member in mapping if self._encode(member) not in zset)
+        for member, score in mapping.items():
+            zset[self._encode(member)] = float(score)
+        return added
+
+    async def zrangebyscore(self, name, min, max, start=None, num=None, withscores=False):
+        self.calls.append(("zrangebyscore", name))
+        if not self._alive(name):
+            return []
+        items = sorted((score, member) for member, score in self.store[name].items() if min <= score <= max)
+        if start is not None and num is not None:
+            items = items[start:start + num]
+        return [(member, score) if withscores else member for score, member in items]
+
+    async def zrem(self, name, *members):
+        self.calls.append(("zrem", name))
+        if not self._alive(name):
+            return 0
+        zset = self.store[name]
+        return sum(1 for member in members if zset.pop(self._encode(member), None) is not None)
+
+    async def zcard(self, name):
+        self.calls.append(("zcard", name))
+        return len(self.store[name]) if self._alive(name) else 0
+
+    async def publish(self, channel, message):
+        """只记录发布的消息（没有订阅方）"""
+        self.calls.append(("publish", channel))
+        self.published.append((channel, self._encode(message)))
+        return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def eval(self, script, numkeys, *args):
+        """仅支持“值相等才删除”的解锁脚本和 ZSET 间移动成员的脚本"""
+        self.calls.append(("eval", args[:numkeys]))
+        keys, argv = args[:numkeys], args[numkeys:]
+        if "redis.call('get', KEYS[1]) == ARGV[1]" in script:
+            if self._alive(keys[0]) and self.store[keys[0]] == self._encode(argv[0]):
+                return await self.delete(keys[0])
+            return 0
+        if "redis.call('zrem', KEYS[1], ARGV[1]) == 1" in script:
+            if await self.zrem(keys[0], argv[0]) == 1:
+                await self.zadd(keys[1], {argv[0]: argv[1]})
+                return 1
+            return 0
+        raise NotImplementedError(script)
+
+
+class FakePipeline:
+    """命令先缓存，execute 时按顺序执行并返回结果列表（与 redis-py 一致，一次往返）"""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+
+        def _queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+
+        return _queue
+
+    async def execute(self):
+        self.redis.calls.append(("execute", len(self.commands)))
+        commands, self.commands = self.commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.commands = []
+
+
+def patch_redis(monkeypatch, *modules, redis=None) -> FakeRedis:
+    """把给定模块中的 new_asyncio_redis_client 替换为返回同一个 FakeRedis 的上下文管理器"""
+    fake = redis or FakeRedis()
+
+    @asynccontextmanager
+    async def _client():
+        yield fake
+
+    for module in modules:
+        monkeypatch.setattr(module, "new_asyncio_redis_client", _client)
+    return fake
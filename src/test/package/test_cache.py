@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_cache.py
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+
+import pytest
+from entity.devices import DeviceInfo
+from package.redis import cache as cache_module
+from package.redis.cache import KeyedCache, cached, should_refresh
+from package.redis.serializers import get_serializer
+from test.fake_redis import FakeRedis
+
+
+def make_factory(redis):
+    @asynccontextmanager
+    async def factory():
+        yield redis
+
+    return factory
+
+
+class BrokenRedis:
+    async def get(self, key):
+        raise ConnectionError("redis down")
+
+
+class TestKeyedCache:
+    """KeyedCache 单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_set_get_with_default_ttl(self):
+        """测试值经序列化写入并带默认过期时间"""
+        redis = FakeRedis()
+        cache = KeyedCache("device", new_func=make_factory(redis))
+        await cache.set("d1", DeviceInfo(device_id="d1", mode=2))
+
+        assert (await cache.get("d1")).mode == 2
+        assert await cache.get("missing", default="x") == "x"
+        assert 0 < await redis.ttl("kido:cache:device:d1") <= cache_module.DEFAULT_TTL
+
+    @pytest.mark.asyncio
+    async def test_get_many_set_many_single_round_trip(self):
+        """测试批量读写各只有一次往返，只返回命中的 key"""
+        redis = FakeRedis()
+        cache = KeyedCache("n", ttl=60, new_func=make_factory(redis))
+        await cache.set_many({"a": 1, "b": {"x": [1, 2]}})
+        assert redis.calls == [("execute", 2), ("set", "kido:cache:n:a"), ("set", "kido:cache:n:b")]
+
+        redis.calls.clear()
+        assert await cache.get_many(["a", "b", "c"]) == {"a": 1, "b": {"x": [1, 2]}}
+        assert [call[0] for call in redis.calls] == ["mget"]
+
+    @pytest.mark.asyncio
+    async def test_undecodable_entry_is_miss(self):
+        """测试无法解码的旧值按未命中处理"""
+        redis = FakeRedis()
+        cache = KeyedCache("n", new_func=make_factory(redis))
+        await redis.set("kido:cache:n:a", b"legacy")
+        assert await cache.get_entry("a") is None
+
+    def test_unknown_serializer(self):
+        """测试不支持的序列化方式直接报错"""
+        with pytest.raises(ValueError):
+            get_serializer("yaml")
+
+
+class TestShouldRefresh:
+    """XFetch 提前刷新单元测试"""
+
+    def test_probability_grows_near_expiry(self):
+        """测试离过期越近越容易提前刷新，过期后必定刷新"""
+        now = time.time()
+        far = sum(should_refresh(0.1, now + 60, now=now) for _ in range(1000))
+        near = sum(should_refresh(0.1, now + 0.05, now=now) for _ in range(1000))
+        assert far == 0
+        assert 0 < near < 1000
+        assert should_refresh(0.0, now - 1, now=now)
+
+
+class TestCachedDecorator:
+    """@cached 装饰器单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_key_template_and_hit(self):
+        """测试按参数模板生成 key，命中后不再调用原函数"""
+        redis = FakeRedis()
+        loader = AsyncMock(return_value={"name": "kido"})
+
+        @cached(key="{device_id}:{lang}", ttl=60, namespace="device", new_func=make_factory(redis))
+        async def get_device(device_id, lang="zh"):
+            return await loader(device_id)
+
+        assert await get_device("d1") == {"name": "kido"}
+        assert await get_device(device_id="d1") == {"name": "kido"}
+        loader.assert_awaited_once_with("d1")
+        assert "kido:cache:device:d1:zh" in redis.store
+        assert get_device.stats()["hits"] == 1
+
+        await get_device.invalidate("d1")
+        await get_device("d1")
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_none_not_cached_by_default(self):
+        """测试返回 None 默认不缓存"""
+        redis = FakeRedis()
+        loader = AsyncMock(return_value=None)
+
+        @cached(key="{uid}", new_func=make_factory(redis))
+        async def load(uid):
+            return await loader()
+
+        await load(1)
+        await load(1)
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_coalesced(self):
+        """测试同一 key 的并发未命中只回源一次"""
+        redis = FakeRedis()
+        calls = 0
+
+        @cached(key="{uid}", new_func=make_factory(redis))
+        async def load(uid):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return uid * 2
+
+        assert await asyncio.gather(*(load(3) for _ in range(20))) == [6] * 20
+        assert calls == 1
+        assert load.stats()["coalesced"] == 19
+        assert not any(key.startswith("kido:cache:lock:") for key in redis.store)
+
+    @pytest.mark.asyncio
+    async def test_leader_cancellation_does_not_cancel_waiters(self):
+        """测试发起回源的调用方被取消时，等待同一 key 的调用方仍拿到结果，回源结果照常写入缓存"""
+        redis = FakeRedis()
+        calls = 0
+
+        @cached(key="{uid}", new_func=make_factory(redis))
+        async def load(uid):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return uid * 2
+
+        leader = asyncio.create_task(load(3))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(load(3)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert await asyncio.gather(*waiters) == [6, 6, 6]
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert calls == 1
+        assert await load.cache.get("3") == 6
+
+    @pytest.mark.asyncio
+    async def test_waits_for_other_process_holding_lock(self):
+        """测试其它进程持有回源锁时等待其写入结果，而不是重复回源"""
+        redis = FakeRedis()
+        loader = AsyncMock(return_value="mine")
+
+        @cached(key="{uid}", new_func=make_factory(redis))
+        async def load(uid):
+            return await loader()
+
+        await load.cache.acquire_lock("1", "other", 5)
+
+        async def other_process():
+            await asyncio.sleep(0.1)
+            await load.cache.set("1", "theirs")
+            await load.cache.release_lock("1", "other")
+
+        result, _ = await asyncio.gather(load(1), other_process())
+        assert result == "theirs"
+        loader.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_early_refresh_serves_stale_when_locked(self):
+        """测试提前刷新时未抢到锁的调用方继续返回旧值，抢到锁的调用方回源"""
+        redis = FakeRedis()
+        loader = AsyncMock(return_value="new")
+
+        @cached(key="{uid}", ttl=60, new_func=make_factory(redis))
+        async def load(uid):
+            return await loader()
+
+        # 逻辑过期时间已到，必定触发提前刷新
+        await redis.set(load.cache.key("1"), cache_module._ENVELOPE.pack(0.1, time.time() - 1) + load.cache.serializer.dumps("old"))
+        await load.cache.acquire_lock("1", "other", 5)
+        assert await load(1) == "old"
+        loader.assert_not_awaited()
+
+        await load.cache.release_lock("1", "other")
+        assert await load(1) == "new"
+        assert await load.cache.get("1") == "new"
+        assert load.stats()["early_refreshes"] == 2
+
+    @pytest.mark.asyncio
+    async def test_loader_error_propagates_to_waiters(self):
+        """测试回源异常传给所有等待方，且不写缓存"""
+        redis = FakeRedis()
+
+        @cached(key="{uid}", new_func=make_factory(redis))
+        async def load(uid):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(load(1), load(1), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await load.cache.get("1") is None
+
+    @pytest.mark.asyncio
+    async def test_redis_unavailable_falls_back(self):
+        """测试 Redis 不可用时直接调用原函数"""
+        loader = AsyncMock(return_value=1)
+
+        @cached(key="{uid}", new_func=make_factory(BrokenRedis()))
+        async def load(uid):
+            return await loader()
+
+        assert await load(1) == 1
+        assert load.stats()["errors"] == 1
+
+    def test_rejects_sync_function(self):
+        """测试只能装饰异步函数"""
+        with pytest.raises(TypeError):
+            @cached(key="{uid}")
+            def load(uid):
+                return uid
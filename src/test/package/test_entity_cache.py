@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_entity_cache.py
+
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock
+
+import pytest
+from entity.devices import DeviceInfo
+from package.redis.entity_cache import EntityCache
+from test.fake_redis import FakeRedis
+
+
+def make_cache(redis=None):
+    redis = redis or FakeRedis()
+
+    @asynccontextmanager
+    async def factory():
+        yield redis
+
+    return EntityCache("device_info", DeviceInfo, ttl=600, negative_ttl=30, new_func=factory), redis
+
+
+class TestEntityCache:
+    """实体缓存单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_read_through(self):
+        """测试未命中时回源并回填，之后命中缓存不再回源"""
+        cache, redis = make_cache()
+        loader = AsyncMock(return_value=DeviceInfo(device_id="d1", device_name="kido", mode=2))
+
+        first = await cache.get_or_load("d1", loader)
+        second = await cache.get_or_load("d1", loader)
+        assert first == second and second.mode == 2
+        loader.assert_awaited_once()
+        assert 0 < await redis.ttl("kido:cache:device_info:d1") <= 600
+        assert cache.stats()["hit_ratio"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_negative_cache(self):
+        """测试不存在的 id 写入短期负缓存"""
+        cache, redis = make_cache()
+        loader = AsyncMock(return_value=None)
+
+        assert await cache.get_or_load("missing", loader) is None
+        assert await cache.get_or_load("missing", loader) is None
+        loader.assert_awaited_once()
+        assert 0 < await redis.ttl("kido:cache:device_info:missing") <= 30
+        assert cache.stats()["negative_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_write_through_replaces_negative_entry(self):
+        """测试写穿透覆盖负缓存，invalidate 后重新回源"""
+        cache, _ = make_cache()
+        await cache.get_or_load("d1", AsyncMock(return_value=None))
+        await cache.set("d1", DeviceInfo(device_id="d1", device_name="new"))
+        assert (await cache.get_or_load("d1", AsyncMock())).device_name == "new"
+
+        await cache.invalidate("d1")
+        loader = AsyncMock(return_value=DeviceInfo(device_id="d1", device_name="db"))
+        assert (await cache.get_or_load("d1", loader)).device_name == "db"
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_falls_back_to_loader(self):
+        """测试 Redis 不可用时直接回源"""
+        redis = FakeRedis()
+        redis.get = AsyncMock(side_effect=ConnectionError("down"))
+        cache, _ = make_cache(redis)
+        loader = AsyncMock(return_value=DeviceInfo(device_id="d1"))
+
+        assert (await cache.get_or_load("d1", loader)).device_id == "d1"
+        assert cache.stats()["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fill_does_not_overwrite_concurrent_set(self):
+        """测试回源期间写穿透的新值不会被回填的旧值覆盖"""
+        cache, _ = make_cache()
+
+        async def loader():
+            await cache.set("d1", DeviceInfo(device_id="d1", device_name="new"))
+            return DeviceInfo(device_id="d1", device_name="old")
+
+        await cache.get_or_load("d1", loader)
+        assert (await cache.get_or_load("d1", AsyncMock())).device_name == "new"
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_replaced_by_fill(self):
+        """测试无法解析的旧缓存被删除后由回填覆盖"""
+        cache, redis = make_cache()
+        await redis.set("kido:cache:device_info:d1", b'{"mode": "not-an-int"}')
+        loader = AsyncMock(return_value=DeviceInfo(device_id="d1", device_name="db"))
+
+        assert (await cache.get_or_load("d1", loader)).device_name == "db"
+        assert (await cache.get_or_load("d1", AsyncMock())).device_name == "db"
+        loader.assert_awaited_once()
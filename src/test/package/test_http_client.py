@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_http_client.py
+
+import pytest
+
+from core.config.settings import settings
+from package.http import client as http_client
+
+
+class TestHttpClient:
+    """全局 HTTP 会话生命周期单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_session_is_shared_and_pooled(self):
+        """测试 lifespan 初始化后所有调用方共享同一个带连接池的会话"""
+        session = await http_client.init_http_session()
+        try:
+            assert http_client.get_http_session() is session
+            connector = session.connector
+            assert connector.limit == settings.http_client.LIMIT
+            assert connector.limit_per_host == settings.http_client.LIMIT_PER_HOST
+            assert session.timeout.total == settings.http_client.TOTAL_TIMEOUT
+        finally:
+            await http_client.close_http_session()
+        assert session.closed
+
+    @pytest.mark.asyncio
+    async def test_get_after_close_recreates_session(self):
+        """测试关闭后再次获取会惰性重建会话"""
+        first = http_client.get_http_session()
+        await http_client.close_http_session()
+        second = http_client.get_http_session()
+        try:
+            assert second is not first
+            assert not second.closed
+        finally:
+            await http_client.close_http_session()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_near_cache.py
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from entity.devices import DeviceInfo
+from package.redis.entity_cache import EntityCache
+from package.redis.near_cache import MISSING, CacheInvalidator, LocalCache
+from test.fake_redis import FakeRedis
+
+CONFIG = SimpleNamespace(CHANNEL="kido:cache:invalidate", RECONNECT_DELAY=0.01)
+
+
+class FakePubSub:
+    """订阅确认后依次返回 queue 中的消息"""
+
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+        self.closed = False
+
+    async def subscribe(self, channel):
+        await self.queue.put({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def get_message(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        self.closed = True
+
+
+class PubSubRedis(FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.queue = asyncio.Queue()
+
+    def pubsub(self):
+        return FakePubSub(self.queue)
+
+
+def make_factory(redis):
+    @asynccontextmanager
+    async def factory():
+        yield redis
+
+    return factory
+
+
+def make_pod(redis, ready=True):
+    """模拟一个 pod：独立的本地缓存和失效广播，共享同一个 Redis"""
+    factory = make_factory(redis)
+    invalidator = CacheInvalidator(redis_factory=factory, config=CONFIG)
+    invalidator.ready = ready
+    local = LocalCache(max_entries=100, max_bytes=1024 * 1024, ttl=30)
+    cache = EntityCache(
+        "device_info", DeviceInfo, ttl=600, negative_ttl=30, new_func=factory, local=local, invalidator=invalidator
+    )
+    return cache, invalidator
+
+
+def deliver(redis, invalidator):
+    """把 Redis 上发布过的失效消息投递给某个 pod"""
+    for _, message in redis.published:
+        invalidator.handle(message)
+
+
+class TestLocalCache:
+    """进程内 LRU 缓存单元测试"""
+
+    def test_lru_eviction_by_entries(self):
+        """测试超过条数上限时淘汰最久未使用的条目"""
+        local = LocalCache(max_entries=2, max_bytes=1000, ttl=30)
+        local.put("a", 1, 10)
+        local.put("b", 2, 10)
+        assert local.get("a") == 1
+        local.put("c", 3, 10)
+        assert local.get("b") is MISSING
+        assert local.get("a") == 1 and local.get("c") == 3
+        assert local.stats()["evictions"] == 1
+
+    def test_eviction_by_bytes(self):
+        """测试按字节数限制，超大的值不缓存"""
+        local = LocalCache(max_entries=100, max_bytes=100, ttl=30)
+        local.put("a", "x", 60)
+        local.put("b", "y", 60)
+        assert local.get("a") is MISSING
+        assert local.stats()["bytes"] == 60
+        local.put("huge", "z", 101)
+        assert local.get("huge") is MISSING
+
+    def test_ttl_and_cached_none(self):
+        """测试条目过期，None 可以作为缓存值"""
+        local = LocalCache(max_entries=10, max_bytes=100, ttl=30)
+        local.put("none", None, 4)
+        local.put("short", 1, 1, ttl=0)
+        assert local.get("none") is None
+        assert local.get("short") is MISSING
+
+
+class TestNearEntityCache:
+    """带近端缓存的 EntityCache 单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_local_hit_skips_redis(self):
+        """测试第二次读取直接命中本地缓存，不访问 Redis"""
+        redis = FakeRedis()
+        cache, _ = make_pod(redis)
+        loader = AsyncMock(return_value=DeviceInfo(device_id="d1", device_name="kido"))
+
+        await cache.get_or_load("d1", loader)
+        redis.calls.clear()
+        assert (await cache.get_or_load("d1", loader)).device_name == "kido"
+        assert redis.calls == []
+        assert cache.stats()["local"]["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_write_invalidates_other_pods(self):
+        """测试一个 pod 写入后，其它 pod 收到广播删除本地旧值"""
+        redis = FakeRedis()
+        pod_a, invalidator_a = make_pod(redis)
+        pod_b, invalidator_b = make_pod(redis)
+        await pod_a.set("d1", DeviceInfo(device_id="d1", device_name="old"))
+        assert (await pod_b.get_or_load("d1", AsyncMock())).device_name == "old"
+
+        redis.published.clear()
+        await pod_a.set("d1", DeviceInfo(device_id="d1", device_name="new"))
+        deliver(redis, invalidator_a)
+        deliver(redis, invalidator_b)
+        assert invalidator_a.received == 0
+        assert invalidator_b.received == 1
+        assert (await pod_b.get_or_load("d1", AsyncMock())).device_name == "new"
+
+    @pytest.mark.asyncio
+    async def test_invalidation_during_read_not_cached_locally(self):
+        """测试读 Redis 期间发生失效时，读到的值不放进本地缓存"""
+        redis = FakeRedis()
+        cache, invalidator = make_pod(redis)
+
+        async def loader():
+            await invalidator.invalidate("device_info", ["d1"])
+            return DeviceInfo(device_id="d1", device_name="racing")
+
+        await cache.get_or_load("d1", loader)
+        assert cache.local.get("d1") is MISSING
+
+    @pytest.mark.asyncio
+    async def test_not_ready_bypasses_local(self):
+        """测试失效订阅未就绪时不使用本地缓存"""
+        redis = FakeRedis()
+        cache, _ = make_pod(redis, ready=False)
+        loader = AsyncMock(return_value=DeviceInfo(device_id="d1"))
+
+        await cache.get_or_load("d1", loader)
+        await cache.get_or_load("d1", loader)
+        assert len(cache.local) == 0
+        assert cache.stats()["hits"] == 1
+
+
+class TestCacheInvalidator:
+    """失效广播订阅单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_subscribe_clears_and_applies_messages(self):
+        """测试订阅成功后清空本地缓存并处理其它 pod 的失效消息"""
+        redis = PubSubRedis()
+        invalidator = CacheInvalidator(redis_factory=make_factory(redis), config=CONFIG)
+        local = LocalCache(max_entries=10, max_bytes=1000, ttl=30)
+        invalidator.register("device_info", local)
+        local.put("stale", 1, 1)
+
+        invalidator.start()
+        await asyncio.sleep(0.01)
+        assert invalidator.ready
+        assert len(local) == 0
+
+        local.put("d1", 1, 1)
+        local.put("d2", 2, 1)
+        await redis.queue.put({"type": "message", "data": b'{"origin": "other", "namespace": "device_info", "keys": ["d1"]}'})
+        await redis.queue.put({"type": "message", "data": b"not json"})
+        await asyncio.sleep(0.01)
+        assert local.get("d1") is MISSING
+        assert local.get("d2") == 2
+
+        await invalidator.stop()
+        assert not invalidator.ready
+        assert len(local) == 0
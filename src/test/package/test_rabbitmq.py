@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_rabbitmq.py
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from core import rabbitmq
+from core.rabbitmq import RabbitMQClient, RabbitMQConnectionManager
+
+
+def make_config(pool_size=2):
+    return SimpleNamespace(
+        HOST="localhost", PORT=5672, USERNAME="guest", PASSWORD="guest",
+        CONNECT_TIMEOUT=1, RECONNECT_BACKOFF=60, CHANNEL_POOL_SIZE=pool_size, CLOSE_DRAIN_TIMEOUT=1,
+    )
+
+
+def make_channel():
+    exchange = MagicMock(publish=AsyncMock())
+    return MagicMock(
+        is_closed=False,
+        declare_exchange=AsyncMock(return_value=exchange),
+        declare_queue=AsyncMock(),
+        close=AsyncMock(),
+    )
+
+
+def make_connection():
+    connection = MagicMock(is_closed=False, close=AsyncMock())
+    connection.channel = AsyncMock(side_effect=lambda **kwargs: make_channel())
+    return connection
+
+
+class TestRabbitMQConnectionManager:
+    """RabbitMQ 连接管理单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_connect_opens_one_connection(self, monkeypatch):
+        """测试并发 connect 只建立一条连接"""
+        async def slow_connect(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return make_connection()
+
+        connect = AsyncMock(side_effect=slow_connect)
+        monkeypatch.setattr(rabbitmq.aio_pika, "connect_robust", connect)
+        manager = RabbitMQConnectionManager(make_config())
+
+        connections = await asyncio.gather(*(manager.connect() for _ in range(10)))
+        assert connect.await_count == 1
+        assert len({id(c) for c in connections}) == 1
+
+    @pytest.mark.asyncio
+    async def test_fail_fast_during_reconnect_backoff(self, monkeypatch):
+        """测试连接失败后退避期内直接失败，不再重复连接"""
+        connect = AsyncMock(side_effect=OSError("refused"))
+        monkeypatch.setattr(rabbitmq.aio_pika, "connect_robust", connect)
+        manager = RabbitMQConnectionManager(make_config())
+
+        with pytest.raises(OSError):
+            await manager.connect()
+        with pytest.raises(ConnectionError):
+            await manager.connect()
+        assert connect.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_channel_pool_parallel_and_bounded(self, monkeypatch):
+        """测试并发发布使用不同 channel，数量不超过池大小，交换机每个 channel 只声明一次"""
+        connection = make_connection()
+        monkeypatch.setattr(rabbitmq.aio_pika, "connect_robust", AsyncMock(return_value=connection))
+        manager = RabbitMQConnectionManager(make_config(pool_size=2))
+        client = RabbitMQClient(manager=manager, exchange_name="ex", queue_name="q")
+        monkeypatch.setattr(rabbitmq, "get_dependency_policy", lambda name: MagicMock(call=lambda f: f()))
+
+        await asyncio.gather(*(client.publish_batch([b"x"]) for _ in range(6)))
+        await asyncio.gather(*(client.publish_batch([b"y"]) for _ in range(6)))
+
+        assert connection.channel.await_count == 2
+        channels = manager._idle
+        assert all(channel.declare_exchange.await_count == 1 for channel in channels)
+        assert manager.snapshot()["channels_idle"] == 2
+
+    @pytest.mark.asyncio
+    async def test_closed_channel_is_replaced(self, monkeypatch):
+        """测试被 broker 关闭的 channel 不再放回池中"""
+        connection = make_connection()
+        monkeypatch.setattr(rabbitmq.aio_pika, "connect_robust", AsyncMock(return_value=connection))
+        manager = RabbitMQConnectionManager(make_config(pool_size=1))
+
+        async with manager.channel() as channel:
+            channel.is_closed = True
+        async with manager.channel() as replacement:
+            assert replacement is not channel
+        assert connection.channel.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_close_drains_in_flight_publishes(self, monkeypatch):
+        """测试关闭时等待借出的 channel 归还后再关闭连接，关闭期间不再借出"""
+        connection = make_connection()
+        monkeypatch.setattr(rabbitmq.aio_pika, "connect_robust", AsyncMock(return_value=connection))
+        manager = RabbitMQConnectionManager(make_config())
+        release = asyncio.Event()
+
+        async def publisher():
+            async with manager.channel():
+                await release.wait()
+
+        task = asyncio.create_task(publisher())
+        await asyncio.sleep(0)
+        closing = asyncio.create_task(manager.close())
+        await asyncio.sleep(0.01)
+        assert not connection.close.await_count
+        with pytest.raises(ConnectionError):
+            async with manager.channel():
+                pass
+
+        release.set()
+        await asyncio.gather(task, closing)
+        connection.close.assert_awaited_once()
+        assert manager.connection is None
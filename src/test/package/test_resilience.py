@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_resilience.py
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+import package.resilience.breaker as breaker_module
+from package.resilience.breaker import CircuitBreaker, CircuitState
+from package.resilience.bulkhead import Bulkhead
+from package.resilience.deadline import deadline_scope, no_deadline, remaining
+from package.resilience.errors import BulkheadFullError, CircuitOpenError, DeadlineExceededError
+from package.resilience.policy import ResiliencePolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def make_policy(timeout=1.0, max_concurrent=10, failure_threshold=2, is_failure=None):
+    breaker = CircuitBreaker("dep", failure_threshold=failure_threshold, recovery_timeout=30)
+    kwargs = {"is_failure": is_failure} if is_failure else {}
+    return ResiliencePolicy("dep", breaker, Bulkhead("dep", max_concurrent, max_wait=0), timeout, **kwargs)
+
+
+class TestCircuitBreaker:
+    """熔断器单元测试"""
+
+    def test_open_half_open_close(self, monkeypatch):
+        """测试连续失败后熔断，恢复时间后半开探测，成功后关闭"""
+        clock = FakeClock()
+        monkeypatch.setattr(breaker_module, "time", clock)
+        breaker = CircuitBreaker("dep", failure_threshold=2, recovery_timeout=30)
+
+        breaker.record_failure()
+        breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitState.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+        clock.now += 30
+        breaker.allow()
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.snapshot()["opened_count"] == 1
+
+    def test_half_open_failure_reopens(self, monkeypatch):
+        """测试半开探测失败后立即重新熔断"""
+        clock = FakeClock()
+        monkeypatch.setattr(breaker_module, "time", clock)
+        breaker = CircuitBreaker("dep", failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure()
+
+        clock.now += 30
+        breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.opened_count == 2
+
+
+class TestResiliencePolicy:
+    """依赖调用策略单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_fast_fail_with_fallback(self):
+        """测试熔断后不再调用下游，直接返回降级结果"""
+        policy = make_policy()
+        func = AsyncMock(side_effect=ConnectionError("down"))
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await policy.call(func)
+
+        assert await policy.call(func, fallback=lambda e: "cached") == "cached"
+        assert func.await_count == 2
+        assert policy.snapshot()["fallbacks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_ignored_errors_do_not_trip(self):
+        """测试 is_failure 排除的异常不计入熔断"""
+        policy = make_policy(is_failure=lambda e: not isinstance(e, KeyError))
+        for _ in range(3):
+            with pytest.raises(KeyError):
+                await policy.call(AsyncMock(side_effect=KeyError("x")))
+        assert policy.breaker.state == CircuitState.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_bulkhead_rejects_when_full(self):
+        """测试舱壁满时立即拒绝，不影响已在途的调用"""
+        policy = make_policy(max_concurrent=1)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        first = asyncio.create_task(policy.call(slow))
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadFullError):
+            await policy.call(slow)
+        release.set()
+
+        assert await first == "ok"
+        assert policy.bulkhead.snapshot() == {"max_concurrent": 1, "in_flight": 0, "rejected": 1}
+
+    @pytest.mark.asyncio
+    async def test_deadline_bounds_timeout(self):
+        """测试调用超时受请求剩余时间约束，时间耗尽后直接拒绝"""
+        policy = make_policy(timeout=10)
+        with deadline_scope(0.01):
+            with pytest.raises(DeadlineExceededError):
+                await policy.call(asyncio.sleep, 1)
+            with pytest.raises(DeadlineExceededError):
+                await policy.call(asyncio.sleep, 0)
+            with no_deadline():
+                assert remaining() is None
+
+    @pytest.mark.asyncio
+    async def test_deadline_timeouts_do_not_trip_breaker(self):
+        """测试请求截止时间导致的超时不计入熔断，自身超时才计入"""
+        policy = make_policy(timeout=0.01, failure_threshold=2)
+        for _ in range(6):
+            with deadline_scope(0.001):
+                with pytest.raises(DeadlineExceededError):
+                    await policy.call(asyncio.sleep, 1)
+        assert policy.breaker.state == CircuitState.CLOSED
+        assert policy.timeouts == 0
+        assert await policy.call(AsyncMock(return_value="ok")) == "ok"
+
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await policy.call(asyncio.sleep, 1)
+        assert policy.breaker.state == CircuitState.OPEN
+        assert policy.timeouts == 2
+
+    def test_nested_deadline_only_tightens(self):
+        """测试嵌套截止时间只会收紧"""
+        with deadline_scope(1):
+            with deadline_scope(60):
+                assert remaining() <= 1
+            with deadline_scope(None):
+                assert 0 < remaining() <= 1
+        assert remaining() is None
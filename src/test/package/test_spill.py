@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_spill.py
+
+import os
+
+from package.spill.segment_log import SegmentLog
+
+
+def segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".seg"))
+
+
+class TestSegmentLog:
+    """磁盘段日志单元测试"""
+
+    def test_read_commit_in_order(self, tmp_path):
+        """测试按写入顺序读取，commit 之后不再重复读取"""
+        log = SegmentLog(str(tmp_path))
+        log.append([b"a", b"b", b"c"])
+        log.append([b"d"])
+
+        records, position = log.read(3)
+        assert records == [b"a", b"b", b"c"]
+        # 未 commit 时重复读取同样的记录
+        assert log.read(3)[0] == records
+        log.commit(position)
+        records, position = log.read(10)
+        assert records == [b"d"]
+        log.commit(position)
+        assert not log.has_pending()
+
+    def test_roll_segments_and_delete_consumed(self, tmp_path):
+        """测试按大小滚动段文件，读完的段被删除"""
+        log = SegmentLog(str(tmp_path), segment_bytes=10)
+        for i in range(5):
+            log.append([b"x" * 10 + str(i).encode()])
+        assert len(segments(tmp_path)) == 5
+
+        records, position = log.read(4)
+        assert [r[-1:] for r in records] == [b"0", b"1", b"2", b"3"]
+        log.commit(position)
+        assert len(segments(tmp_path)) <= 2
+        assert log.read(10)[0] == [b"x" * 10 + b"4"]
+
+    def test_cap_drops_oldest_segment(self, tmp_path):
+        """测试超过总大小上限时丢弃最旧的段"""
+        log = SegmentLog(str(tmp_path), max_bytes=60, segment_bytes=10)
+        for i in range(6):
+            log.append([b"x" * 10 + str(i).encode()])
+
+        assert log.size_bytes <= 60
+        assert log.dropped_records == 3
+        assert [r[-1:] for r in log.read(10)[0]] == [b"3", b"4", b"5"]
+
+    def test_resume_from_checkpoint_and_ignore_torn_tail(self, tmp_path):
+        """测试重启后从 checkpoint 继续读取，崩溃留下的半条记录被忽略"""
+        log = SegmentLog(str(tmp_path))
+        log.append([b"a", b"b"])
+        records, position = log.read(1)
+        log.commit(position)
+        log.close()
+        with open(os.path.join(tmp_path, segments(tmp_path)[-1]), "ab") as f:
+            f.write(b"\x00\x00\x00\x10\x00")
+
+        reopened = SegmentLog(str(tmp_path))
+        assert reopened.read(10)[0] == [b"b"]
+        reopened.append([b"c"])
+        assert reopened.read(10)[0] == [b"b", b"c"]
+
+    def test_append_after_fully_consumed(self, tmp_path):
+        """测试全部读完（段已删除）后继续追加和读取"""
+        log = SegmentLog(str(tmp_path))
+        log.append([b"a"])
+        log.commit(log.read(10)[1])
+        assert segments(tmp_path) == [] and log.size_bytes == 0
+
+        log.append([b"b"])
+        assert log.has_pending()
+        assert log.read(10)[0] == [b"b"]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_textfilter.py
+
+from package.textfilter.aho_corasick import AhoCorasick
+from package.textfilter.domain import WildcardDomainMatcher
+
+
+class TestAhoCorasick:
+    """Aho-Corasick 多模式匹配单元测试"""
+
+    def test_finds_overlapping_words(self):
+        """测试重叠、嵌套关键词都能在一次扫描中找出"""
+        automaton = AhoCorasick()
+        for word in ("he", "she", "his", "hers"):
+            automaton.add(word, word.upper())
+        automaton.build()
+
+        found = [(end, word) for end, word, _ in automaton.iter("ushers")]
+
+        assert sorted(found) == [(3, "he"), (3, "she"), (5, "hers")]
+
+    def test_case_insensitive_with_values(self):
+        """测试不区分大小写并返回关键词附加值"""
+        automaton = AhoCorasick()
+        automaton.add("QQ群", "contact_info")
+        automaton.add("赌博", "sensitive_words")
+        automaton.build()
+
+        assert automaton.find_first("加qq群领资料") == (3, "qq群", "contact_info")
+        assert automaton.find_first("今天天气不错") is None
+        assert len(automaton) == 2
+
+
+class TestWildcardDomainMatcher:
+    """域名通配匹配单元测试"""
+
+    def test_wildcard_exact_and_glob(self):
+        """测试后缀通配、精确匹配与 fnmatch 回退"""
+        matcher = WildcardDomainMatcher(["*.bit.ly", "*.tk", "evil.com", "ads*.example.com"])
+
+        assert matcher.match_host("bit.ly")
+        assert matcher.match_host("x.Bit.ly")
+        assert matcher.match_host("free.tk")
+        assert matcher.match_host("evil.com")
+        assert not matcher.match_host("www.evil.com")
+        assert matcher.match_host("ads01.example.com")
+        assert not matcher.match_host("example.com")
+
+    def test_find_host_in_text(self):
+        """测试从中文文本中提取网址并匹配"""
+        matcher = WildcardDomainMatcher(["*.bit.ly"])
+
+        assert matcher.find_first("点这里https://bit.ly/abc领红包") == "bit.ly"
+        assert matcher.find_first("访问 www.qq.com 查看") is None
+        assert matcher.find_first("版本 1.5 很好用") is None
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_xml.py
+
+import xml.etree.ElementTree as ET
+
+import pytest
+from package.wechat_xml.parser import WechatXmlError, parse_wechat_event, parse_wechat_xml
+
+SUBSCRIBE_XML = (
+    "<xml><ToUserName><![CDATA[gh_123]]></ToUserName>"
+    "<FromUserName><![CDATA[o-openid]]></FromUserName>"
+    "<CreateTime>1700000000</CreateTime>"
+    "<MsgType><![CDATA[event]]></MsgType>"
+    "<Event><![CDATA[subscribe]]></Event>"
+    "<EventKey><![CDATA[qrscene_FULL_DUPLEX_v1]]></EventKey></xml>"
+)
+
+
+def element_tree_parse(xml_data):
+    return {child.tag: child.text for child in ET.fromstring(xml_data)}
+
+
+class TestWechatXmlParser:
+    """微信推送 XML 快速解析单元测试"""
+
+    def test_typed_event_fields(self):
+        """测试常用字段解析为带类型的事件属性"""
+        event = parse_wechat_event(SUBSCRIBE_XML.encode("utf-8"))
+
+        assert (event.msg_type, event.event, event.event_key) == ("event", "subscribe", "qrscene_FULL_DUPLEX_v1")
+        assert event.from_user_name == "o-openid"
+        assert event.create_time == 1700000000
+        assert not hasattr(event, "__dict__")
+
+    @pytest.mark.parametrize("xml_data", [
+        SUBSCRIBE_XML,
+        '<?xml version="1.0" encoding="utf-8"?>\n<xml>\n  <MsgType><![CDATA[text]]></MsgType>\n'
+        "  <Content><![CDATA[a <b> & ]] 宝宝]]></Content>\n  <MsgId>2345</MsgId>\n</xml>\n",
+        "<xml><Content>1 &lt; 2 &amp;&#x4e2d;&#25991;</Content><EventKey></EventKey><Status/></xml>",
+        "<xml><Content>&#9;&#xA;&#x1F600;&#xFFFD;</Content></xml>",
+        "<xml><MsgType>event</MsgType><ScanCodeInfo><ScanType>qrcode</ScanType></ScanCodeInfo></xml>",
+    ])
+    def test_matches_element_tree(self, xml_data):
+        """测试解析结果与 ElementTree 一致（含 CDATA、实体、空元素与嵌套元素回退）"""
+        assert parse_wechat_xml(xml_data) == element_tree_parse(xml_data)
+
+    @pytest.mark.parametrize("xml_data", [
+        '<?xml version="1.0"?><!DOCTYPE lolz [<!ENTITY lol "lol"><!ENTITY lol2 "&lol;&lol;">]>'
+        "<xml><Content>&lol2;</Content></xml>",
+        "<xml><Content>&lol;</Content></xml>",
+        "<xml><MsgType>event</MsgType>",
+        "<root><MsgType>event</MsgType></root>",
+        "<xml>" + "<F>1</F>" * 2 + "".join(f"<F{i}>1</F{i}>" for i in range(100)) + "</xml>",
+        "<xml><Content>&#99999999999;</Content></xml>",
+        "<xml><Content>&#x110000;</Content></xml>",
+        "<xml><Content>&#0;</Content></xml>",
+        "<xml><Content>&#xD800;</Content></xml>",
+        "<xml><Content>&#xFFFE;</Content></xml>",
+        "<xml><Content>&#" + "9" * 5000 + ";</Content></xml>",
+    ])
+    def test_rejects_malicious_or_malformed(self, xml_data):
+        """测试拒绝 DTD / 未定义实体 / 不完整报文 / 字段过多 / 非法字符引用"""
+        with pytest.raises(WechatXmlError):
+            parse_wechat_xml(xml_data)
+
+    def test_rejects_oversized_payload(self):
+        """测试超过大小限制的报文直接拒绝"""
+        payload = f"<xml><Content>{'a' * 1024}</Content></xml>".encode()
+        with pytest.raises(WechatXmlError, match="too large"):
+            parse_wechat_xml(payload, max_size=512)
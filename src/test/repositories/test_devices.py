@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_devices.py
+
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import repositories.devices as devices_module
+from package.redis.entity_cache import EntityCache
+from entity.devices import DeviceInfo as DeviceInfoEntity
+from repositories.devices import DeviceRepository
+from repositories.model.device_info import DeviceInfo
+from test.fake_redis import FakeRedis
+
+
+class TestDeviceRepositoryCache:
+    """DeviceRepository 缓存单元测试"""
+
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        redis = FakeRedis()
+
+        @asynccontextmanager
+        async def factory():
+            yield redis
+
+        cache = EntityCache("device_info", DeviceInfoEntity, ttl=600, negative_ttl=30, new_func=factory)
+        monkeypatch.setattr(devices_module, "_device_cache", cache)
+        return cache
+
+    @pytest.fixture
+    def mock_session(self):
+        session = AsyncMock(spec=AsyncSession)
+        session.add = MagicMock()
+        return session
+
+    def mock_query(self, session, device):
+        result = MagicMock()
+        result.scalars.return_value.first.return_value = device
+        session.execute = AsyncMock(return_value=result)
+
+    @pytest.mark.asyncio
+    async def test_get_info_hits_db_once(self, cache, mock_session):
+        """测试重复读取设备信息只查询一次数据库"""
+        self.mock_query(mock_session, DeviceInfo(device_id="d1", device_name="kido", mode=1))
+        repository = DeviceRepository(mock_session)
+
+        for _ in range(3):
+            info = await repository.get_info("d1")
+        assert info.device_name == "kido"
+        assert mock_session.execute.await_count == 1
+        assert cache.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_create_overwrites_negative_cache(self, cache, mock_session):
+        """测试创建设备后立即可读到，不受之前的负缓存影响"""
+        self.mock_query(mock_session, None)
+        repository = DeviceRepository(mock_session)
+        assert await repository.get_info("d1") is None
+
+        await repository.create(device_id="d1", device_name="kido", mode=2)
+        info = await repository.get_info("d1")
+        assert (info.device_name, info.mode) == ("kido", 2)
+        assert mock_session.execute.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_update_writes_through(self, cache, mock_session):
+        """测试更新设备后缓存同步为新值"""
+        self.mock_query(mock_session, DeviceInfo(device_id="d1", device_name="old", mode=1))
+        repository = DeviceRepository(mock_session)
+        assert (await repository.get_info("d1")).device_name == "old"
+
+        await repository.update("d1", device_name="new")
+        assert (await repository.get_info("d1")).device_name == "new"
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_content_prefilter.py
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import services.weixin as weixin
+from core.config.settings import settings
+from entity.weixin import ContentSecuritySuggest
+from services.content_prefilter import ContentPreFilter, PreFilterVerdict
+from services.weixin import WechatService
+
+
+@pytest.fixture(scope="module")
+def prefilter():
+    return ContentPreFilter.load(settings.content_filter.RULES_DIR, settings.content_filter.REJECT_CATEGORIES)
+
+
+class TestContentPreFilter:
+    """内容安全本地预过滤单元测试"""
+
+    def test_rules_loaded_from_all_files(self, prefilter):
+        """测试 rules 目录下的关键词与域名规则均被加载"""
+        categories = {category for outputs in prefilter.keywords._output for _, category in outputs}
+        assert categories == {"high_risk", "sensitive_words", "advertisement", "contact_info", "political_sensitive"}
+        assert prefilter.domains.match_host("free.tk")
+
+    def test_reject_review_clean(self, prefilter):
+        """测试高风险词本地拒绝、宽泛规则只做标记交给微信、无命中为 clean"""
+        rejected = prefilter.check("这里有赌博网站")
+        assert rejected.verdict == PreFilterVerdict.REJECT
+        assert rejected.category == "high_risk"
+
+        link = prefilter.check("宝宝今天很开心", None, "看这个 https://x.bit.ly/1")
+        assert link.verdict == PreFilterVerdict.REVIEW
+        assert "url_filter" in link.matches
+
+        review = prefilter.check("有问题可以加我微信")
+        assert review.verdict == PreFilterVerdict.REVIEW
+        assert "contact_info" in review.matches
+
+        assert prefilter.check("宝宝今天学会了唱歌").verdict == PreFilterVerdict.CLEAN
+
+    def test_broad_words_not_rejected(self, prefilter):
+        """测试宽泛词表和顶级域名规则不会在本地误拒正常内容"""
+        for text in ["我最喜欢黄色的小鸭子", "今天是我的成人礼", "不要伤害小动物", "看了一部恐怖片", "官网是 example.link"]:
+            assert prefilter.check(text).verdict == PreFilterVerdict.REVIEW, text
+
+    @pytest.mark.asyncio
+    async def test_check_content_security_short_circuits(self, prefilter, monkeypatch):
+        """测试命中强规则时不查库、不调用 msg_sec_check"""
+        monkeypatch.setattr(settings.wechat, "DISABLE_WECHAT_CONTENT_SECURITY_CHECK", False)
+        monkeypatch.setattr(weixin, "get_content_prefilter", lambda: prefilter)
+        service = WechatService(MagicMock(), http_session=MagicMock())
+        service.user_source_repo = MagicMock(get_with_user_id=AsyncMock())
+        service.api = MagicMock(msg_sec_check=AsyncMock())
+
+        result = await service.check_content_security("user-1", "有人在做代开发票")
+
+        assert not result.safe
+        assert result.suggest == ContentSecuritySuggest.RISKY
+        assert result.detail[0]["strategy"] == "local_prefilter"
+        service.user_source_repo.get_with_user_id.assert_not_awaited()
+        service.api.msg_sec_check.assert_not_awaited()
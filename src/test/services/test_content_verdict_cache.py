@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_content_verdict_cache.py
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import services.content_verdict_cache as content_verdict_cache
+import services.weixin as weixin
+from core.config.settings import settings
+from entity.weixin import ContentSecurityCheckRequest
+from services.content_verdict_cache import ContentVerdictCache
+from services.wechat_api import WechatApiError
+from services.weixin import WechatService
+from test.fake_redis import patch_redis
+
+PASS_RESULT = {"errcode": 0, "result": {"suggest": "pass", "label": 100}, "detail": [], "trace_id": "t1"}
+RISKY_RESULT = {"errcode": 0, "result": {"suggest": "risky", "label": 20001}, "detail": [], "trace_id": "t2"}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings.wechat, "DISABLE_WECHAT_CONTENT_SECURITY_CHECK", False)
+    monkeypatch.setattr(weixin, "get_content_prefilter", lambda: None)
+    redis = patch_redis(monkeypatch, content_verdict_cache)
+    cache = ContentVerdictCache()
+    monkeypatch.setattr(weixin, "get_content_verdict_cache", lambda: cache)
+
+    service = WechatService(MagicMock(), http_session=MagicMock())
+    service.user_source_repo = MagicMock(get_with_user_id=AsyncMock(return_value=MagicMock(openid="openid-1")))
+    service._get_miniprogram_access_token = AsyncMock(return_value="token")
+    service.api = MagicMock(msg_sec_check=AsyncMock(return_value=PASS_RESULT))
+    service.cache, service.redis = cache, redis
+    return service
+
+
+class TestContentVerdictCache:
+    """内容安全检查结果缓存单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_content_hits_cache(self, service):
+        """测试相同内容只调用一次微信接口，依次命中本地与 Redis 缓存"""
+        first = await service.check_content_security("u1", "宝宝好可爱")
+        second = await service.check_content_security("u2", "宝宝好可爱")
+        service.cache.local.clear()
+        third = await service.check_content_security("u3", "宝宝好可爱")
+
+        assert first == second == third
+        assert first.safe
+        service.api.msg_sec_check.assert_awaited_once()
+        stats = service.cache.stats()
+        assert (stats["misses"], stats["local_hits"], stats["redis_hits"]) == (1, 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_ttl_depends_on_suggest(self, service):
+        """测试 pass 与 risky 结果使用不同 TTL"""
+        await service.check_content_security("u1", "ok")
+        service.api.msg_sec_check.return_value = RISKY_RESULT
+        await service.check_content_security("u1", "bad")
+
+        pass_ttl = await service.redis.ttl(ContentVerdictCache.key("ok", 2))
+        risky_ttl = await service.redis.ttl(ContentVerdictCache.key("bad", 2))
+        assert settings.content_verdict_cache.PASS_TTL - 2 <= pass_ttl <= settings.content_verdict_cache.PASS_TTL
+        assert settings.content_verdict_cache.RISKY_TTL - 2 <= risky_ttl <= settings.content_verdict_cache.RISKY_TTL
+
+    @pytest.mark.asyncio
+    async def test_negative_cache_on_content_error(self, service):
+        """测试由内容决定的错误短时间内相同内容直接失败，不再调用微信"""
+        service.api.msg_sec_check.return_value = {"errcode": 87014, "errmsg": "risky content"}
+
+        for user_id in ("u1", "u2"):
+            with pytest.raises(Exception, match="risky content"):
+                await service.check_content_security(user_id, "hello")
+
+        service.api.msg_sec_check.assert_awaited_once()
+        assert service.cache.stats()["negative_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_user_and_transport_errors_not_cached(self, service):
+        """测试 openid / token / 限频错误和网络、熔断错误不缓存，其他用户提交相同内容仍会调用微信"""
+        service.api.msg_sec_check.side_effect = [
+            {"errcode": 40003, "errmsg": "invalid openid"},
+            {"errcode": 40001, "errmsg": "invalid credential"},
+            {"errcode": 45009, "errmsg": "quota"},
+            WechatApiError("wxa/msg_sec_check", "circuit open"),
+            PASS_RESULT,
+        ]
+        for _ in range(4):
+            with pytest.raises(Exception):
+                await service.check_content_security("u1", "hello")
+
+        assert (await service.check_content_security("u2", "hello")).safe
+        assert service.api.msg_sec_check.await_count == 5
+        assert service.cache.stats()["negative_hits"] == 0
+
+    @pytest.mark.asyncio
+    async def test_force_recheck_bypasses_cache(self, service):
+        """测试 force_recheck 跳过缓存并刷新缓存结果"""
+        await service.check_content_security("u1", "text")
+        service.api.msg_sec_check.return_value = RISKY_RESULT
+
+        result = await service.check_content_security("u1", "text", force_recheck=True)
+        cached = await service.check_content_security("u1", "text")
+
+        assert not result.safe and not cached.safe
+        assert service.api.msg_sec_check.await_count == 2
+
+
+class TestContentSecurityBatch:
+    """批量内容安全检查单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_batch_dedupes_and_keeps_order(self, service, monkeypatch):
+        """测试相同文本只检查一次、openid 只查一次，结果按请求顺序返回"""
+        monkeypatch.setattr(settings.content_filter, "BATCH_CONCURRENCY", 2)
+        in_flight = {"now": 0, "max": 0}
+
+        async def msg_sec_check(access_token, payload):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.001)
+            in_flight["now"] -= 1
+            return RISKY_RESULT if payload["content"] == "bad" else PASS_RESULT
+
+        service.api.msg_sec_check = AsyncMock(side_effect=msg_sec_check)
+        texts = ["a", "bad", "a", "b", "c", "bad"]
+        items = [ContentSecurityCheckRequest(content=text) for text in texts]
+
+        results = await service.check_content_security_batch("u1", items)
+
+        assert [r.index for r in results] == list(range(len(texts)))
+        assert [r.result.safe for r in results] == [text != "bad" for text in texts]
+        assert service.api.msg_sec_check.await_count == 4
+        assert in_flight["max"] <= 2
+        service.user_source_repo.get_with_user_id.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_batch_cached_items_skip_openid_lookup(self, service):
+        """测试全部命中缓存时不查库，单条失败不影响其它条目"""
+        await service.check_content_security("u1", "cached")
+        service.user_source_repo.get_with_user_id.reset_mock()
+
+        results = await service.check_content_security_batch(
+            "u1", [ContentSecurityCheckRequest(content="cached")] * 3
+        )
+        assert all(r.result.safe for r in results)
+        service.user_source_repo.get_with_user_id.assert_not_awaited()
+
+        service.api.msg_sec_check = AsyncMock(side_effect=[{"errcode": -1, "errmsg": "system error"}, PASS_RESULT])
+        results = await service.check_content_security_batch(
+            "u1", [ContentSecurityCheckRequest(content="x"), ContentSecurityCheckRequest(content="y")]
+        )
+        assert results[0].error and results[0].result is None
+        assert results[1].result.safe
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_device_state.py
+
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import services.device as device_module
+from entity.login import TokenData
+from services.device import DeviceService
+from services.device_state import DeviceStateStore
+from test.fake_redis import FakeRedis
+
+
+def make_store():
+    redis = FakeRedis()
+
+    @asynccontextmanager
+    async def factory():
+        yield redis
+
+    config = SimpleNamespace(STATE_TTL=3600, ONLINE_TIMEOUT=60)
+    return DeviceStateStore(redis_factory=factory, config=config), redis
+
+
+class TestDeviceStateStore:
+    """设备状态存储单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_round_trip_keeps_types(self):
+        """测试写入后读出的字段类型不变"""
+        store, _ = make_store()
+        await store.put_many([{"device_id": "d1", "battery": 80, "network": "wifi", "playing": True, "ext": {"a": [1]}}])
+
+        state = await store.get_state("d1")
+        assert state.online
+        assert state.status == {"battery": 80, "network": "wifi", "playing": True, "ext": {"a": [1]}}
+
+    @pytest.mark.asyncio
+    async def test_get_states_single_round_trip(self):
+        """测试批量读取只用一个 pipeline，未上报的设备为离线空状态，重复 id 只查一次"""
+        store, redis = make_store()
+        await store.put_many([{"device_id": "d1", "battery": 1}, {"device_id": "d2", "battery": 2}])
+        redis.calls.clear()
+
+        states = await store.get_states(["d2", "d1", "missing", "d1"])
+        assert [s for s in redis.calls if s[0] == "execute"] == [("execute", 3)]
+        assert (states["d1"].status["battery"], states["d2"].status["battery"]) == (1, 2)
+        assert not states["missing"].online and states["missing"].last_seen is None
+
+    @pytest.mark.asyncio
+    async def test_offline_after_timeout(self):
+        """测试超过 ONLINE_TIMEOUT 未上报视为离线，但仍保留最后状态"""
+        store, redis = make_store()
+        await store.put_many([{"device_id": "d1", "battery": 5}], now=int(time.time()) - 120)
+
+        state = await store.get_state("d1")
+        assert not state.online
+        assert state.status == {"battery": 5}
+        assert 0 < await redis.ttl(store.key("d1")) <= 3600
+
+
+class TestDeviceServiceStates:
+    """DeviceService 批量设备状态单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_only_bound_devices_returned(self, monkeypatch):
+        """测试只查询并返回当前用户已绑定的设备，未绑定的设备不访问 Redis"""
+        store, redis = make_store()
+        await store.put_many([{"device_id": "d1", "battery": 1}, {"device_id": "other", "battery": 2}])
+        monkeypatch.setattr(device_module, "get_device_state_store", lambda: store)
+        service = DeviceService(TokenData(user_id="u1"))
+        service.user_device_map_repo = MagicMock(get_bound_device_ids=AsyncMock(return_value={"d1"}))
+        redis.calls.clear()
+
+        states = await service.get_device_states(["other", "d1", "d1"])
+        assert [state.device_id for state in states] == ["d1"]
+        service.user_device_map_repo.get_bound_device_ids.assert_awaited_once_with("u1", ["other", "d1"])
+        assert ("hgetall", store.key("other")) not in redis.calls
+
+        service.user_device_map_repo.get_bound_device_ids.return_value = set()
+        redis.calls.clear()
+        assert await service.get_device_states(["other"]) == []
+        assert redis.calls == []
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_device_status.py
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from services.device_state import DeviceStateStore
+from services.device_status import DeviceStatusConsumer
+from test.fake_redis import FakeRedis
+
+
+def make_config(batch_size=3, flush_ms=20):
+    return SimpleNamespace(
+        QUEUE="device-status", PREFETCH=10, BATCH_SIZE=batch_size, FLUSH_MS=flush_ms,
+        STATE_TTL=300, ONLINE_TIMEOUT=60, RETRY_DELAY=0, RECONNECT_DELAY=0.01,
+    )
+
+
+def make_message(body):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    return MagicMock(body=body, ack=AsyncMock(), nack=AsyncMock(), reject=AsyncMock())
+
+
+def make_consumer(redis=None, **kwargs):
+    redis = redis or FakeRedis()
+
+    @asynccontextmanager
+    async def factory():
+        yield redis
+
+    client = MagicMock(consume=AsyncMock(return_value="ctag"), cancel=AsyncMock(), close=AsyncMock())
+    config = make_config(**kwargs)
+    store = DeviceStateStore(redis_factory=factory, config=config)
+    return DeviceStatusConsumer(client=client, config=config, store=store), redis
+
+
+class TestDeviceStatusConsumer:
+    """设备状态消费者单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_batch_write_and_single_ack(self):
+        """测试整批一个 pipeline 写入，同一设备合并，最后一条 multiple ack"""
+        consumer, redis = make_consumer()
+        messages = [
+            make_message({"device_id": "d1", "battery": 80}),
+            make_message({"device_id": "d2", "online": True}),
+            make_message({"device_id": "d1", "battery": 79, "volume": 5}),
+        ]
+        await consumer.flush(messages)
+
+        state = await redis.hgetall("kido:device:state:d1")
+        assert state[b"battery"] == b"79" and state[b"volume"] == b"5" and b"last_seen" in state
+        assert (await redis.hgetall("kido:device:state:d2"))[b"online"] == b"true"
+        assert 0 < await redis.ttl("kido:device:state:d1") <= 300
+        assert [call for call in redis.calls if call[0] == "execute"] == [("execute", 4)]
+        messages[-1].ack.assert_awaited_once_with(multiple=True)
+        assert not messages[0].ack.await_count
+
+    @pytest.mark.asyncio
+    async def test_malformed_rejected_and_last_valid_acked(self):
+        """测试无法解析的消息单独拒绝，批量确认落在最后一条有效消息上"""
+        consumer, _ = make_consumer()
+        messages = [make_message({"device_id": "d1"}), make_message(b"not json"), make_message({"x": 1})]
+        await consumer.flush(messages)
+
+        messages[1].reject.assert_awaited_once_with(requeue=False)
+        messages[2].reject.assert_awaited_once_with(requeue=False)
+        messages[0].ack.assert_awaited_once_with(multiple=True)
+        assert consumer.metrics()["rejected"] == 2
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_requeues_batch(self):
+        """测试 Redis 写入失败时整批 nack 重新投递"""
+        redis = FakeRedis()
+        redis.pipeline = MagicMock(side_effect=ConnectionError("redis down"))
+        consumer, _ = make_consumer(redis=redis)
+        messages = [make_message({"device_id": "d1"}), make_message({"device_id": "d2"})]
+        await consumer.flush(messages)
+
+        messages[-1].nack.assert_awaited_once_with(multiple=True, requeue=True)
+        assert not messages[-1].ack.await_count
+        assert consumer.metrics()["requeued"] == 2
+
+    @pytest.mark.asyncio
+    async def test_subscribe_retries_and_graceful_stop(self):
+        """测试 broker 不可用时循环重试订阅，停止时先取消订阅再写完缓冲区"""
+        consumer, redis = make_consumer(batch_size=100, flush_ms=10000)
+        consumer.client.consume.side_effect = [ConnectionError("down"), "ctag"]
+        consumer.start()
+        await asyncio.sleep(0.05)
+        assert consumer.client.consume.await_count == 2
+
+        message = make_message({"device_id": "d1"})
+        await consumer._on_message(message)
+        await consumer.stop()
+
+        consumer.client.cancel.assert_awaited_once_with("ctag")
+        message.ack.assert_awaited_once_with(multiple=True)
+        assert await redis.hget("kido:device:state:d1", "last_seen")
+        consumer.client.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_flush_when_batch_full(self):
+        """测试缓冲区凑满一批时立即写入，不等 FLUSH_MS"""
+        consumer, redis = make_consumer(batch_size=2, flush_ms=10000)
+        consumer.start()
+        for device_id in ("d1", "d2"):
+            await consumer._on_message(make_message({"device_id": device_id}))
+        await asyncio.sleep(0.02)
+        assert consumer.metrics()["batches"] == 1
+        await consumer.stop()
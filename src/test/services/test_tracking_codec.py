@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_tracking_codec.py
+
+import pytest
+from entity.data_track import TrackEventRequest
+from services.tracking_codec import CONTENT_TYPE_JSON, CONTENT_TYPE_PROTOBUF_BATCH, TrackingCodec, decode_message
+
+
+def make_event(**kwargs):
+    return TrackEventRequest(
+        device_id="d-1", event_name="page_view", page="home",
+        event_properties={"duration": 12, "tags": ["a", "b"], "ratio": 0.5}, extra={"client_ip": "127.0.0.1"},
+        **kwargs,
+    )
+
+
+class TestTrackingCodec:
+    """埋点事件编解码单元测试"""
+
+    def test_json_format_is_backward_compatible(self):
+        """测试 json 格式与原 model_dump_json 完全一致，每个事件一条消息"""
+        codec = TrackingCodec()
+        event = make_event()
+        record = codec.encode_event(event)
+        assert record == event.model_dump_json().encode()
+
+        bodies, content_type, content_encoding = codec.frame([record, record])
+        assert (len(bodies), content_type, content_encoding) == (2, CONTENT_TYPE_JSON, None)
+
+    @pytest.mark.parametrize("compression", [None, "gzip"])
+    def test_protobuf_batch_round_trip(self, compression):
+        """测试 protobuf 批量编码可还原，None 字段不编码，字典中的整数不变成浮点数"""
+        codec = TrackingCodec("protobuf", compression)
+        events = [make_event(user_id=f"u{i}") for i in range(3)]
+        bodies, content_type, content_encoding = codec.frame([codec.encode_event(e) for e in events])
+
+        assert (len(bodies), content_type, content_encoding) == (1, CONTENT_TYPE_PROTOBUF_BATCH, compression)
+        decoded = decode_message(bodies[0], content_type, content_encoding)
+        assert decoded == [e.model_dump(exclude_none=True) for e in events]
+        assert isinstance(decoded[0]["event_properties"]["duration"], int)
+
+    def test_protobuf_is_smaller_than_json(self):
+        """测试 protobuf 单个事件比 JSON 小（不输出大量 null 字段）"""
+        codec = TrackingCodec("protobuf")
+        event = make_event()
+        assert len(codec.encode_event(event)) * 2 < len(event.model_dump_json())
+
+    def test_decode_legacy_json_message(self):
+        """测试消费端解码旧格式消息（无 content_type）"""
+        body = make_event().model_dump_json().encode()
+        assert decode_message(body) == [make_event().model_dump(exclude_none=True)]
+
+    def test_reject_unknown_options(self):
+        """测试不支持的格式 / 压缩方式在启动时报错"""
+        with pytest.raises(ValueError):
+            TrackingCodec("avro")
+        with pytest.raises(ValueError):
+            TrackingCodec("protobuf", "brotli")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_tracking_publisher.py
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from entity.data_track import TrackEventRequest
+from package.resilience.errors import CircuitOpenError
+from package.spill.segment_log import SegmentLog
+from services.tracking_codec import TrackingCodec, decode_message
+from services.tracking_publisher import TrackingPublisher
+
+
+def make_publisher(queue_size=100, batch_size=10, linger_ms=20, retries=1, spill=None, codec=None):
+    config = SimpleNamespace(
+        TRACKING_QUEUE_SIZE=queue_size,
+        TRACKING_BATCH_SIZE=batch_size,
+        TRACKING_LINGER_MS=linger_ms,
+        TRACKING_PUBLISH_RETRIES=retries,
+        TRACKING_REPLAY_INTERVAL=0.01,
+        TRACKING_REPLAY_BATCH=4,
+    )
+    return TrackingPublisher(
+        client=MagicMock(publish_batch=AsyncMock(), close=AsyncMock()), config=config, spill=spill, codec=codec
+    )
+
+
+def make_events(count):
+    return [TrackEventRequest(event_name=f"e{i}") for i in range(count)]
+
+
+class TestTrackingPublisher:
+    """埋点批量发布器单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_coalesces_by_size_and_time(self):
+        """测试按条数凑满一批立即发布，不足一批时等待 linger 后发布"""
+        publisher = make_publisher(batch_size=10)
+        publisher.start()
+        assert publisher.offer(make_events(25))
+        await asyncio.sleep(0.1)
+        await publisher.stop()
+
+        sizes = [len(call.args[0]) for call in publisher.client.publish_batch.await_args_list]
+        assert sizes == [10, 10, 5]
+        first = json.loads(publisher.client.publish_batch.await_args_list[0].args[0][0])
+        assert first["event_name"] == "e0"
+        assert publisher.metrics()["published"] == 25
+
+    @pytest.mark.asyncio
+    async def test_backpressure_rejects_whole_request(self):
+        """测试队列容量不足时整批拒绝"""
+        publisher = make_publisher(queue_size=5)
+
+        assert publisher.offer(make_events(4))
+        assert not publisher.offer(make_events(2))
+        assert publisher.queue.qsize() == 4
+        assert publisher.metrics()["rejected"] == 2
+        assert publisher.pressure == 0.8
+
+    @pytest.mark.asyncio
+    async def test_retry_then_count_failed(self, monkeypatch):
+        """测试发布失败后重试，重试耗尽计入失败"""
+        monkeypatch.setattr(asyncio, "sleep", AsyncMock())
+        publisher = make_publisher(retries=2)
+        publisher.client.publish_batch.side_effect = [ConnectionError("down"), None]
+        assert await publisher.publish_batch([b"a"])
+
+        publisher.client.publish_batch.side_effect = ConnectionError("down")
+        assert not await publisher.publish_batch([b"b", b"c"])
+        assert (publisher.published, publisher.failed) == (1, 2)
+
+    @pytest.mark.asyncio
+    async def test_stop_drains_pending_events(self):
+        """测试停止时发出队列和正在凑批的事件"""
+        publisher = make_publisher(linger_ms=10000)
+        publisher.start()
+        publisher.offer(make_events(3))
+        await asyncio.sleep(0.01)
+        publisher.offer(make_events(2))
+
+        await publisher.stop()
+
+        sent = [body for call in publisher.client.publish_batch.await_args_list for body in call.args[0]]
+        assert len(sent) == 5
+
+    @pytest.mark.asyncio
+    async def test_spill_when_broker_down_and_replay_in_order(self, tmp_path):
+        """测试 broker 不可用时落盘，恢复后按顺序回放，积压期间的新批次排在后面"""
+        publisher = make_publisher(retries=0, spill=SegmentLog(str(tmp_path)))
+        publisher.client.publish_batch.side_effect = CircuitOpenError("rabbitmq", "circuit open")
+        assert await publisher.publish_batch([b"1", b"2", b"3"])
+        assert (publisher.spilled, publisher.failed) == (3, 0)
+
+        # 恢复后、回放前到达的批次也先落盘
+        publisher.client.publish_batch.side_effect = None
+        assert await publisher.publish_batch([b"4", b"5"])
+        publisher.client.publish_batch.assert_awaited_once()
+
+        publisher.start()
+        await asyncio.sleep(0.1)
+        await publisher.stop()
+
+        sent = [body for call in publisher.client.publish_batch.await_args_list[1:] for body in call.args[0]]
+        assert sent == [b"1", b"2", b"3", b"4", b"5"]
+        metrics = publisher.metrics()
+        assert (metrics["spilling"], metrics["replayed"], metrics["spill_bytes"]) == (False, 5, 0)
+
+    @pytest.mark.asyncio
+    async def test_spilled_events_survive_restart(self, tmp_path):
+        """测试进程重启后回放上次未发出的落盘事件"""
+        publisher = make_publisher(spill=SegmentLog(str(tmp_path)))
+        publisher.client.publish_batch.side_effect = CircuitOpenError("rabbitmq", "circuit open")
+        await publisher.publish_batch([b"a", b"b"])
+        publisher.spill.close()
+
+        restarted = make_publisher(spill=SegmentLog(str(tmp_path)))
+        assert restarted.metrics()["spilling"]
+        assert await restarted.replay_once() == 2
+        assert restarted.client.publish_batch.await_args.args[0] == [b"a", b"b"]
+
+    @pytest.mark.asyncio
+    async def test_protobuf_format_publishes_one_message_per_batch(self):
+        """测试 protobuf 格式下一批事件合成一条压缩消息，并带上 content_type / content_encoding"""
+        publisher = make_publisher(batch_size=10, codec=TrackingCodec("protobuf", "gzip"))
+        publisher.start()
+        publisher.offer(make_events(10))
+        await asyncio.sleep(0.05)
+        await publisher.stop()
+
+        call = publisher.client.publish_batch.await_args
+        assert len(call.args[0]) == 1
+        events = decode_message(call.args[0][0], call.kwargs["content_type"], call.kwargs["content_encoding"])
+        assert [event["event_name"] for event in events] == [f"e{i}" for i in range(10)]
+        assert publisher.metrics()["bytes_published"] == len(call.args[0][0])
+
+    @pytest.mark.asyncio
+    async def test_replay_uses_format_records_were_spilled_with(self, tmp_path):
+        """测试重启后格式配置变更时，落盘记录仍按写入时的格式组装消息"""
+        publisher = make_publisher(retries=0, spill=SegmentLog(str(tmp_path)))
+        publisher.client.publish_batch.side_effect = CircuitOpenError("rabbitmq", "circuit open")
+        await publisher.publish_batch([publisher.serialize(event) for event in make_events(2)])
+        publisher.spill.close()
+
+        restarted = make_publisher(spill=SegmentLog(str(tmp_path)), codec=TrackingCodec("protobuf", "gzip"))
+        await restarted.publish_batch([restarted.serialize(event) for event in make_events(3)])
+        while await restarted.replay_once():
+            pass
+
+        names = []
+        for call in restarted.client.publish_batch.await_args_list:
+            for body in call.args[0]:
+                events = decode_message(body, call.kwargs["content_type"], call.kwargs["content_encoding"])
+                names.extend(event["event_name"] for event in events)
+        assert names == ["e0", "e1", "e0", "e1", "e2"]
+        assert restarted.client.publish_batch.await_args_list[0].kwargs["content_type"] == "application/json"
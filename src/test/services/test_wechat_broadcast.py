@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_broadcast.py
+
+import asyncio
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import services.wechat_broadcast as wechat_broadcast
+from core.config.settings import settings
+from package.ratelimit.token_bucket import TokenBucket
+from services.wechat_broadcast import BroadcastStatus, TemplateBroadcastEngine
+from test.fake_redis import patch_redis
+
+TEMPLATE_DATA = {"thing1": {"value": "作业已批改"}}
+
+
+class FakeApi:
+    """模板消息接口替身，记录并发度与收件人"""
+
+    def __init__(self, errcodes=None, fail_openids=()):
+        self.errcodes = errcodes or {}
+        self.fail_openids = set(fail_openids)
+        self.hang_openids = set()
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send_template_message(self, access_token, message):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        openid = message["touser"]
+        if openid in self.hang_openids:
+            await asyncio.Event().wait()
+        if openid in self.fail_openids:
+            raise RuntimeError("network down")
+        self.sent.append(openid)
+        return {"errcode": self.errcodes.get(openid, 0)}
+
+
+def make_engine(monkeypatch, api, openids, concurrency=4):
+    monkeypatch.setattr(settings.wechat_ratelimit, "ENABLED", False)
+    repo = MagicMock()
+    repo.get_service_openids_by_user_ids = AsyncMock(
+        side_effect=lambda user_ids: {u: openids[u] for u in user_ids if u in openids}
+    )
+    monkeypatch.setattr(wechat_broadcast, "WechatServiceUserRepository", lambda db: repo)
+
+    @asynccontextmanager
+    async def session_factory():
+        yield MagicMock()
+
+    engine = TemplateBroadcastEngine(
+        session_factory=session_factory,
+        api_client=api,
+        token_provider=AsyncMock(return_value="token"),
+        rate=10000,
+        concurrency=concurrency,
+    )
+    return engine, repo
+
+
+class TestTemplateBroadcastEngine:
+    """模板消息群发引擎单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_broadcast_records_per_recipient_results(self, monkeypatch):
+        """测试批量解析 openid、并发受限发送并记录每个接收者的结果"""
+        redis = patch_redis(monkeypatch, wechat_broadcast)
+        monkeypatch.setattr(wechat_broadcast, "RESOLVE_BATCH_SIZE", 10)
+        user_ids = [f"u{i}" for i in range(25)]
+        openids = {u: f"o-{u}" for u in user_ids if u != "u3"}
+        api = FakeApi(errcodes={"o-u5": 43101})
+        engine, repo = make_engine(monkeypatch, api, openids)
+
+        job_id = await engine.create_job(user_ids, "tpl", TEMPLATE_DATA)
+        job = await engine.run(job_id)
+
+        # 25 个用户按 10 个一批，只查 3 次库
+        assert repo.get_service_openids_by_user_ids.await_count == 3
+        assert api.max_in_flight <= 4
+        assert job["status"] == "finished"
+        assert job["total"] == 25
+        assert job[BroadcastStatus.SENT] == 23
+        assert job[BroadcastStatus.NO_OPENID] == 1
+        assert job[BroadcastStatus.REFUSED] == 1
+        results = redis.store[engine.results_key(job_id)]
+        assert results[b"u3"] == b"no_openid"
+        assert results[b"u5"] == b"refused"
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_terminal_recipients(self, monkeypatch):
+        """测试恢复任务只重发失败的接收者"""
+        patch_redis(monkeypatch, wechat_broadcast)
+        user_ids = ["u1", "u2", "u3"]
+        openids = {u: f"o-{u}" for u in user_ids}
+        api = FakeApi(fail_openids={"o-u2"})
+        engine, _ = make_engine(monkeypatch, api, openids)
+
+        job_id = await engine.create_job(user_ids, "tpl", TEMPLATE_DATA)
+        job = await engine.run(job_id)
+        assert job[BroadcastStatus.FAILED] == 1
+        assert sorted(api.sent) == ["o-u1", "o-u3"]
+
+        api.fail_openids.clear()
+        job = await engine.run(job_id)
+
+        assert sorted(api.sent) == ["o-u1", "o-u2", "o-u3"]
+        assert job[BroadcastStatus.SENT] == 3
+        assert job[BroadcastStatus.FAILED] == 0
+
+    @pytest.mark.asyncio
+    async def test_resume_after_crash_mid_batch(self, monkeypatch):
+        """测试批次中途崩溃后恢复：已发送的不重发，本任务占位未发出的继续发送，停在 sending 的记为 uncertain"""
+        redis = patch_redis(monkeypatch, wechat_broadcast)
+        user_ids = ["u1", "u2", "u3"]
+        openids = {u: f"o-{u}" for u in user_ids}
+        api = FakeApi()
+        engine, _ = make_engine(monkeypatch, api, openids, concurrency=1)
+        job_id = await engine.create_job(user_ids, "tpl", TEMPLATE_DATA)
+
+        # 上次执行：u1 已发送，u2 请求发出后进程崩溃（任务被取消），u3 已占位防重键但还没发
+        api.hang_openids = {"o-u2"}
+        task = asyncio.create_task(engine.run(job_id))
+        while redis.store.get(engine.results_key(job_id), {}).get(b"u2") != b"sending":
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert api.sent == ["o-u1"]
+        assert b"u3" not in redis.store[engine.results_key(job_id)]
+
+        # 防重键仍在有效期内恢复
+        api.hang_openids = set()
+        job = await engine.run(job_id)
+
+        assert api.sent == ["o-u1", "o-u3"]
+        results = redis.store[engine.results_key(job_id)]
+        assert results[b"u1"] == b"sent"
+        assert results[b"u2"] == b"uncertain"
+        assert results[b"u3"] == b"sent"
+        assert job[BroadcastStatus.SENT] == 2
+        assert job[BroadcastStatus.UNCERTAIN] == 1
+        assert BroadcastStatus.DUPLICATE not in job
+
+    @pytest.mark.asyncio
+    async def test_run_skipped_while_lease_held(self, monkeypatch):
+        """测试任务正在其它进程执行时不会重复执行"""
+        redis = patch_redis(monkeypatch, wechat_broadcast)
+        api = FakeApi()
+        engine, _ = make_engine(monkeypatch, api, {"u1": "o-u1"})
+        job_id = await engine.create_job(["u1"], "tpl", TEMPLATE_DATA)
+        await redis.set(engine.lease_key(job_id), "other", nx=True, ex=60)
+
+        assert await engine.is_running(job_id)
+        assert await engine.run(job_id) is None
+        assert api.sent == []
+
+    @pytest.mark.asyncio
+    async def test_duplicates_claimed_in_single_pipeline(self, monkeypatch):
+        """测试防重键通过 pipeline 批量占位，近期发过的消息不会重发"""
+        redis = patch_redis(monkeypatch, wechat_broadcast)
+        user_ids = ["u1", "u2"]
+        openids = {u: f"o-{u}" for u in user_ids}
+        api = FakeApi()
+        engine, _ = make_engine(monkeypatch, api, openids)
+
+        await engine.run(await engine.create_job(user_ids, "tpl", TEMPLATE_DATA))
+        redis.calls.clear()
+        job = await engine.run(await engine.create_job(user_ids, "tpl", TEMPLATE_DATA))
+
+        assert api.sent == ["o-u1", "o-u2"]
+        assert job[BroadcastStatus.DUPLICATE] == 2
+        assert not any(name in ("exists", "setex") for name, _ in redis.calls)
+
+
+class TestTokenBucket:
+    """令牌桶单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits_for_refill(self):
+        """测试令牌耗尽后按速率等待"""
+        bucket = TokenBucket(rate=100, capacity=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(6):
+            await bucket.acquire()
+        assert loop.time() - start >= 0.045
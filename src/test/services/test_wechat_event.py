@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_event.py
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+import services.wechat_dedup as wechat_dedup
+import services.wechat_event as wechat_event
+from api.routers.wx_router import wechat_webhook_event
+from services.wechat_dedup import WechatEventDeduplicator
+from services.wechat_event import InMemoryEventQueue, WechatEventPipeline, WechatEventWorkerPool
+from test.fake_redis import patch_redis
+
+SUBSCRIBE_XML = """<xml>
+<ToUserName><![CDATA[gh_test]]></ToUserName>
+<FromUserName><![CDATA[openid-1]]></FromUserName>
+<CreateTime>1700000000</CreateTime>
+<MsgType><![CDATA[event]]></MsgType>
+<Event><![CDATA[subscribe]]></Event>
+<EventKey><![CDATA[qrscene_FULL_DUPLEX_v1]]></EventKey>
+</xml>"""
+
+
+class RecordingDispatcher:
+    """记录处理顺序与并发度的 dispatcher 替身"""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.handled = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def dispatch(self, event):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.handled.append((event["FromUserName"], event["seq"]))
+        self.in_flight -= 1
+        return "success"
+
+
+class TestWechatEventPipeline:
+    """公众号推送事件管道单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_per_openid_ordering_with_concurrency(self):
+        """测试同一 openid 顺序处理，不同 openid 并发处理"""
+        dispatcher = RecordingDispatcher()
+        pool = WechatEventWorkerPool(dispatcher.dispatch, workers=4)
+        pool.start()
+        openids = [f"openid-{i}" for i in range(8)]
+        for seq in range(5):
+            for openid in openids:
+                await pool.submit({"FromUserName": openid, "seq": seq})
+        await pool.stop()
+
+        assert len(dispatcher.handled) == 40
+        for openid in openids:
+            assert [seq for oid, seq in dispatcher.handled if oid == openid] == list(range(5))
+        assert dispatcher.max_in_flight > 1
+
+    @pytest.mark.asyncio
+    async def test_events_consumed_from_queue_and_acked(self):
+        """测试事件经队列消费处理并在处理完成后 ack"""
+        queue = InMemoryEventQueue()
+        dispatcher = RecordingDispatcher(delay=0)
+        pipeline = WechatEventPipeline(queue, dispatcher=dispatcher, workers=2)
+        await pipeline.start()
+        for seq in range(10):
+            await pipeline.publish({"FromUserName": "openid-1", "seq": seq})
+        while queue.acked < 10:
+            await asyncio.sleep(0.01)
+        await pipeline.stop()
+
+        assert [seq for _, seq in dispatcher.handled] == list(range(10))
+
+    @pytest.mark.asyncio
+    async def test_subscribe_retried_until_broker_available(self):
+        """测试启动时 broker 不可用，恢复后仍会开始消费"""
+        queue = InMemoryEventQueue()
+        start_consuming = queue.start_consuming
+        failures = [ConnectionError("broker down")] * 2
+
+        async def flaky_start_consuming(on_event):
+            if failures:
+                raise failures.pop()
+            await start_consuming(on_event)
+
+        queue.start_consuming = AsyncMock(side_effect=flaky_start_consuming)
+        dispatcher = RecordingDispatcher(delay=0)
+        pipeline = WechatEventPipeline(queue, dispatcher=dispatcher, workers=2, reconnect_delay=0.01)
+
+        await pipeline.start()
+        await pipeline.publish({"FromUserName": "openid-1", "seq": 0})
+        while queue.acked < 1:
+            await asyncio.sleep(0.01)
+        await pipeline.stop()
+
+        assert queue.start_consuming.await_count == 3
+        assert dispatcher.handled == [("openid-1", 0)]
+
+    @pytest.mark.asyncio
+    async def test_publish_failure_processes_locally(self):
+        """测试队列不可用时退化为本地处理"""
+        queue = InMemoryEventQueue()
+        queue.publish = AsyncMock(side_effect=ConnectionError("broker down"))
+        dispatcher = RecordingDispatcher(delay=0)
+        pipeline = WechatEventPipeline(queue, dispatcher=dispatcher, workers=2)
+
+        await pipeline.publish({"FromUserName": "openid-1", "seq": 0})
+        await pipeline.stop()
+
+        assert dispatcher.handled == [("openid-1", 0)]
+
+
+class TestWechatWebhookRouter:
+    """webhook 接口立即 ACK 测试"""
+
+    @pytest.fixture
+    def queue(self, monkeypatch):
+        patch_redis(monkeypatch, wechat_dedup)
+        monkeypatch.setattr(wechat_dedup, "_deduplicator", WechatEventDeduplicator())
+        queue = InMemoryEventQueue()
+        monkeypatch.setattr(wechat_event, "_pipeline", WechatEventPipeline(queue, dispatcher=RecordingDispatcher()))
+        return queue
+
+    @staticmethod
+    async def _push(xml: str):
+        request = AsyncMock()
+        request.body = AsyncMock(return_value=xml.encode("utf-8"))
+        return await wechat_webhook_event(request)
+
+    @pytest.mark.asyncio
+    async def test_webhook_acks_and_enqueues(self, queue):
+        """测试关注事件直接入队并立即回复 success"""
+        response = await self._push(SUBSCRIBE_XML)
+
+        assert response.status_code == 200
+        assert response.body == b"success"
+        event = queue.queue.get_nowait()
+        assert event["FromUserName"] == "openid-1"
+        assert event["EventKey"] == "qrscene_FULL_DUPLEX_v1"
+
+    @pytest.mark.asyncio
+    async def test_webhook_retry_is_deduplicated(self, queue, monkeypatch):
+        """测试微信重推的同一事件只入队一次"""
+        for _ in range(3):
+            response = await self._push(SUBSCRIBE_XML)
+            assert response.body == b"success"
+        assert queue.queue.qsize() == 1
+
+        # 其它 pod 已处理过（仅 Redis 中有记录）时同样跳过
+        monkeypatch.setattr(wechat_dedup, "_deduplicator", WechatEventDeduplicator())
+        await self._push(SUBSCRIBE_XML)
+        assert queue.queue.qsize() == 1
+
+    @pytest.mark.asyncio
+    async def test_invalid_character_reference_rejected(self, queue):
+        """测试非法字符引用返回 400（微信不会重推），而不是 500"""
+        response = await self._push("<xml><Content>&#99999999999;</Content></xml>")
+        assert response.status_code == 400
+        assert queue.queue.qsize() == 0
+
+    @pytest.mark.asyncio
+    async def test_enqueue_failure_clears_dedup_mark(self, queue):
+        """测试事件入队失败时返回 fail 并撤销去重占位，微信重推时重新入队"""
+        pipeline = wechat_event._pipeline
+        publish = pipeline.publish
+        pipeline.publish = AsyncMock(side_effect=RuntimeError("pool stopped"))
+        response = await self._push(SUBSCRIBE_XML)
+        assert response.status_code == 500
+
+        pipeline.publish = publish
+        response = await self._push(SUBSCRIBE_XML)
+        assert response.body == b"success"
+        assert queue.queue.qsize() == 1
+
+
+class TestWechatEventDeduplicator:
+    """去重键计算单元测试"""
+
+    def test_dedup_key_prefers_msg_id(self):
+        """测试优先使用 MsgId，缺失时使用 FromUserName + CreateTime + Event"""
+        assert WechatEventDeduplicator.dedup_key({"MsgId": "123", "FromUserName": "o"}) == "kido:wechat:event:msg:123"
+        assert WechatEventDeduplicator.dedup_key(
+            {"FromUserName": "o", "CreateTime": "1700000000", "Event": "subscribe"}
+        ) == "kido:wechat:event:o:1700000000:subscribe"
+        assert WechatEventDeduplicator.dedup_key({"MsgType": "event"}) is None
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_menu.py
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import services.wechat_menu as wechat_menu
+from entity.weixin import WechatMiniLink
+from services.wechat_menu import WechatMenuSync
+from test.fake_redis import patch_redis
+
+
+def make_sync(result=None):
+    api = MagicMock(create_menu=AsyncMock(return_value=result or {"errcode": 0, "errmsg": "ok"}))
+    return WechatMenuSync(appid="wx-service", api_client=api, token_provider=AsyncMock(return_value="token"))
+
+
+class TestWechatMenuSync:
+    """服务号菜单同步单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_publish_once_for_same_menu(self, monkeypatch):
+        """测试菜单未变化时只发布一次，其它节点也不会重复发布"""
+        patch_redis(monkeypatch, wechat_menu)
+        sync = make_sync()
+
+        assert await sync.sync_once()
+        assert await sync.sync_once()
+        other_pod = make_sync()
+        assert await other_pod.sync_once()
+
+        sync.api.create_menu.assert_awaited_once_with("token", WechatMiniLink.get_menu_config())
+        other_pod.api.create_menu.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_republish_when_menu_changes(self, monkeypatch):
+        """测试菜单内容变化后重新发布"""
+        redis = patch_redis(monkeypatch, wechat_menu)
+        sync = make_sync()
+        await sync.sync_once()
+        assert await redis.get(sync.lock_key) is None
+
+        monkeypatch.setattr(WechatMiniLink, "get_menu_config", staticmethod(lambda: {"button": []}))
+        assert await sync.sync_once()
+
+        assert sync.api.create_menu.await_count == 2
+        assert (await redis.get(sync.hash_key)).decode() == WechatMenuSync.menu_hash({"button": []})
+
+    @pytest.mark.asyncio
+    async def test_failed_publish_is_retried(self, monkeypatch):
+        """测试发布失败时不记录哈希，下次同步会重试"""
+        redis = patch_redis(monkeypatch, wechat_menu)
+        sync = make_sync({"errcode": 40001, "errmsg": "invalid credential"})
+
+        assert not await sync.sync_once()
+        assert await redis.get(sync.hash_key) is None
+
+        sync.api.create_menu.return_value = {"errcode": 0}
+        assert await sync.sync_once()
+        assert sync.api.create_menu.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_lock_held_by_other_instance_not_released(self, monkeypatch):
+        """测试其它节点持有发布锁时跳过本轮，且不会删除对方的锁"""
+        redis = patch_redis(monkeypatch, wechat_menu)
+        sync = make_sync()
+        await redis.set(sync.lock_key, "other", nx=True, ex=60)
+
+        assert not await sync.sync_once()
+        sync.api.create_menu.assert_not_awaited()
+        assert await redis.get(sync.lock_key) == b"other"
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_qrcode.py
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+import services.wechat_qrcode as wechat_qrcode
+from core.config.settings import settings
+from services.wechat_qrcode import WechatQrcodeCache
+from test.fake_redis import patch_redis
+
+
+def make_creator():
+    async def create(scene_str, is_permanent):
+        await asyncio.sleep(0.001)
+        return {"url": f"https://mp/{scene_str}", "ticket": f"ticket-{scene_str}", "expire_seconds": 7200}
+    return AsyncMock(side_effect=create)
+
+
+class TestWechatQrcodeCache:
+    """服务号二维码缓存单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_create_once(self, monkeypatch):
+        """测试并发未命中只生成一次，之后命中进程内缓存"""
+        redis = patch_redis(monkeypatch, wechat_qrcode)
+        cache = WechatQrcodeCache()
+        creator = make_creator()
+
+        urls = await asyncio.gather(*(cache.get_or_create("FULL_DUPLEX_v1", True, creator) for _ in range(5)))
+        redis.calls.clear()
+        again = await cache.get_or_create("FULL_DUPLEX_v1", True, creator)
+
+        assert set(urls) == {again} == {"https://mp/FULL_DUPLEX_v1"}
+        creator.assert_awaited_once()
+        assert redis.calls == []
+        assert cache._locks == {}
+
+    @pytest.mark.asyncio
+    async def test_scene_lock_removed_after_failure(self, monkeypatch):
+        """测试生成失败时等待者依次重试，之后场景锁被移除，锁表不会随场景数增长"""
+        patch_redis(monkeypatch, wechat_qrcode)
+        cache = WechatQrcodeCache()
+        creator = AsyncMock(side_effect=RuntimeError("api down"))
+
+        results = await asyncio.gather(
+            *(cache.get_or_create(f"scene-{i % 2}", False, creator) for i in range(4)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert creator.await_count == 4
+        assert cache._locks == {}
+
+    @pytest.mark.asyncio
+    async def test_permanent_and_temporary_ttl(self, monkeypatch):
+        """测试永久二维码不过期，临时二维码在有效期前提前失效"""
+        redis = patch_redis(monkeypatch, wechat_qrcode)
+        cache = WechatQrcodeCache()
+        creator = make_creator()
+
+        await cache.get_or_create("HALF_DUPLEX_v1", True, creator)
+        await cache.get_or_create("HALF_DUPLEX_v1", False, creator)
+
+        assert await redis.ttl(cache.key("HALF_DUPLEX_v1", True)) == -1
+        temp_ttl = await redis.ttl(cache.key("HALF_DUPLEX_v1", False))
+        assert 0 < temp_ttl <= 7200 - settings.wechat_qrcode.EXPIRE_MARGIN
+        assert creator.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_shared_across_pods_via_redis(self, monkeypatch):
+        """测试其它节点生成的二维码通过 Redis 复用，过期条目会重新生成"""
+        redis = patch_redis(monkeypatch, wechat_qrcode)
+        creator = make_creator()
+        await WechatQrcodeCache().get_or_create("FULL_DUPLEX_v1", False, creator)
+
+        other_pod = WechatQrcodeCache()
+        assert await other_pod.get_or_create("FULL_DUPLEX_v1", False, creator) == "https://mp/FULL_DUPLEX_v1"
+        creator.assert_awaited_once()
+
+        key = other_pod.key("FULL_DUPLEX_v1", False)
+        redis.store[key] = json.dumps({"url": "old", "ticket": "t", "expires_at": time.time() - 1}).encode()
+        assert await WechatQrcodeCache().get_or_create("FULL_DUPLEX_v1", False, creator) == "https://mp/FULL_DUPLEX_v1"
+        assert creator.await_count == 2
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_ratelimit.py
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+import package.ratelimit.adaptive as adaptive
+import services.wechat_ratelimit as wechat_ratelimit
+from core.config.settings import settings
+from package.ratelimit.adaptive import AdaptiveRateLimiter
+from services.wechat_api import TEMPLATE_SEND_PATH
+from services.wechat_ratelimit import WechatRetryQueue, send_rate_limited
+from test.fake_redis import FakeRedis, patch_redis
+
+
+class UnavailableRedis(FakeRedis):
+    """eval 总是失败的 Redis，用于验证进程内降级"""
+
+    async def eval(self, script, numkeys, *args):
+        raise ConnectionError("redis down")
+
+
+class TestAdaptiveRateLimiter:
+    """自适应限流器单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_acquire_sleeps_for_shared_bucket_wait(self, monkeypatch):
+        """测试共享令牌桶返回等待时间时先等待再重新申请"""
+        redis = patch_redis(monkeypatch, adaptive)
+        redis.eval = AsyncMock(side_effect=[b"0.02", b"0"])
+        sleep = AsyncMock()
+        monkeypatch.setattr(adaptive.asyncio, "sleep", sleep)
+        limiter = AdaptiveRateLimiter("test", max_rate=10)
+
+        await limiter.acquire("/send")
+
+        sleep.assert_awaited_once_with(0.02)
+        metrics = limiter.metrics()["/send"]
+        assert metrics["requests"] == 1
+        assert metrics["waited"] == 1
+
+    @pytest.mark.asyncio
+    async def test_aimd_when_redis_unavailable(self, monkeypatch):
+        """测试 Redis 不可用时在进程内执行乘性减、加性增"""
+        patch_redis(monkeypatch, adaptive, redis=UnavailableRedis())
+        limiter = AdaptiveRateLimiter(
+            "test", max_rate=40, min_rate=5, increase_step=2, increase_interval=0, decrease_factor=0.5
+        )
+
+        await limiter.on_throttle("/send")
+        await limiter.on_throttle("/send")
+        assert limiter.metrics_for("/send").rate == 10
+        await limiter.on_throttle("/send")
+        await limiter.on_throttle("/send")
+        assert limiter.metrics_for("/send").rate == 5
+
+        await limiter.on_success("/send")
+        assert limiter.metrics_for("/send").rate == 7
+        assert limiter.metrics()["/send"]["throttled"] == 4
+
+        # 降级为本地令牌桶，仍能正常申请
+        await limiter.acquire("/send")
+
+
+class TestWechatRetryQueue:
+    """限流重试队列单元测试"""
+
+    def make_queue(self, monkeypatch, api):
+        # 限流器走进程内降级，重试队列使用正常的 Redis
+        patch_redis(monkeypatch, adaptive, redis=UnavailableRedis())
+        redis = patch_redis(monkeypatch, wechat_ratelimit)
+        limiter = AdaptiveRateLimiter("test", max_rate=1000)
+        queue = WechatRetryQueue(limiter=limiter, api_client=api, token_provider=AsyncMock(return_value="token"))
+        return queue, redis
+
+    def test_backoff_is_jittered_and_capped(self, monkeypatch):
+        """测试退避时间指数增长、带抖动且不超过上限"""
+        queue = WechatRetryQueue(limiter=AdaptiveRateLimiter("test", max_rate=10))
+        base, cap = settings.wechat_ratelimit.RETRY_BASE_DELAY, settings.wechat_ratelimit.RETRY_MAX_DELAY
+        for attempt in range(4):
+            delay = base * 2 ** attempt
+            assert delay / 2 <= queue.backoff(attempt) <= delay
+        assert queue.backoff(30) <= cap
+        assert len({queue.backoff(3) for _ in range(20)}) > 1
+
+    @pytest.mark.asyncio
+    async def test_due_messages_are_resent_and_rescheduled(self, monkeypatch):
+        """测试到期消息被重发，再次限流时重新入队并增加重试次数"""
+        api = AsyncMock()
+        api.send_template_message = AsyncMock(side_effect=[{"errcode": 45009}, {"errcode": 0}])
+        queue, redis = self.make_queue(monkeypatch, api)
+        message = {"touser": "openid-1", "template_id": "tpl", "data": {}}
+
+        await queue.schedule(TEMPLATE_SEND_PATH, message)
+        # 模拟已到期
+        zset = redis.store[queue.key]
+        for member in zset:
+            zset[member] = time.time() - 1
+
+        assert await queue.poll_once() == 1
+        assert await queue.size() == 1
+        (raw,) = redis.store[queue.key]
+        assert json.loads(raw)["attempt"] == 1
+
+        for member in zset:
+            zset[member] = time.time() - 1
+        assert await queue.poll_once() == 1
+        assert await queue.size() == 0
+        assert api.send_template_message.await_count == 2
+        metrics = queue.limiter.metrics()[TEMPLATE_SEND_PATH]
+        assert metrics["throttled"] == 1
+        assert metrics["retried"] == 2
+
+    @pytest.mark.asyncio
+    async def test_cancel_mid_batch_requeues_unsent(self, monkeypatch):
+        """测试批次发送中途被取消时，已发送的不再保留，正在发送和尚未发送的消息都留在队列中"""
+        release = asyncio.Event()
+        sent = []
+
+        async def send(token, message):
+            if message["touser"] == "o2":
+                await release.wait()
+            sent.append(message["touser"])
+            return {"errcode": 0}
+
+        api = AsyncMock()
+        api.send_template_message = AsyncMock(side_effect=send)
+        queue, redis = self.make_queue(monkeypatch, api)
+        for touser in ("o1", "o2", "o3"):
+            await queue.schedule(TEMPLATE_SEND_PATH, {"touser": touser})
+        for i, member in enumerate(sorted(redis.store[queue.key], key=lambda m: json.loads(m)["message"]["touser"])):
+            redis.store[queue.key][member] = time.time() - 10 + i
+
+        task = asyncio.create_task(queue.poll_once())
+        while api.send_template_message.await_count < 2:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert sent == ["o1"]
+        assert await queue.size() == 2
+        assert redis.store.get(queue.processing_key, {}) == {}
+        release.set()
+        assert await queue.poll_once() == 2
+        assert sorted(sent) == ["o1", "o2", "o3"]
+        assert await queue.size() == 0
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_requeued_after_crash(self, monkeypatch):
+        """测试节点崩溃留在处理中集合的消息，租约过期后被放回队列并重发"""
+        api = AsyncMock()
+        api.send_template_message = AsyncMock(return_value={"errcode": 0})
+        queue, redis = self.make_queue(monkeypatch, api)
+        await queue.schedule(TEMPLATE_SEND_PATH, {"touser": "o1"})
+        (raw,) = redis.store[queue.key]
+        # 模拟其它节点抢占后崩溃：消息停在处理中集合，租约已过期
+        await redis.zrem(queue.key, raw)
+        await redis.zadd(queue.processing_key, {raw: time.time() - 1})
+
+        assert await queue.poll_once() == 1
+        api.send_template_message.assert_awaited_once()
+        assert await queue.size() == 0
+
+    @pytest.mark.asyncio
+    async def test_drop_after_max_attempts(self, monkeypatch):
+        """测试超过最大重试次数后丢弃"""
+        queue, _ = self.make_queue(monkeypatch, AsyncMock())
+
+        assert not await queue.schedule(TEMPLATE_SEND_PATH, {"touser": "o"}, settings.wechat_ratelimit.RETRY_MAX_ATTEMPTS)
+        assert await queue.size() == 0
+        assert queue.limiter.metrics()[TEMPLATE_SEND_PATH]["dropped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_send_rate_limited_schedules_throttled_message(self, monkeypatch):
+        """测试命中限流码时降速并加入重试队列"""
+        queue, _ = self.make_queue(monkeypatch, AsyncMock())
+        monkeypatch.setattr(wechat_ratelimit, "_limiter", queue.limiter)
+        monkeypatch.setattr(wechat_ratelimit, "_retry_queue", queue)
+
+        result = await send_rate_limited(
+            TEMPLATE_SEND_PATH, AsyncMock(return_value={"errcode": 40258}), {"touser": "o"}
+        )
+
+        assert result["errcode"] == 40258
+        assert await queue.size() == 1
+        assert queue.limiter.metrics_for(TEMPLATE_SEND_PATH).rate < 1000
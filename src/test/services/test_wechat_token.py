@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_token.py
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+import services.wechat_token as wechat_token
+from services.wechat_token import WechatTokenManager
+from test.fake_redis import patch_redis
+
+
+def _api_client(token="token-1", expires_in=7200, delay=0.0):
+    async def get_stable_token(appid, secret, force_refresh=False):
+        await asyncio.sleep(delay)
+        return {"access_token": token, "expires_in": expires_in}
+
+    client = AsyncMock()
+    client.get_stable_token = AsyncMock(side_effect=get_stable_token)
+    return client
+
+
+class TestWechatTokenManager:
+    """WechatTokenManager 单元测试"""
+
+    @pytest.fixture
+    def redis(self, monkeypatch):
+        return patch_redis(monkeypatch, wechat_token)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_refresh_once(self, redis):
+        """测试过期瞬间的并发请求只触发一次刷新"""
+        api = _api_client(delay=0.05)
+        manager = WechatTokenManager("appid", "secret", api_client=api)
+
+        tokens = await asyncio.gather(*[manager.get_token() for _ in range(20)])
+
+        assert set(tokens) == {"token-1"}
+        assert api.get_stable_token.await_count == 1
+        shared = json.loads(redis.store[manager.token_key])
+        assert shared["access_token"] == "token-1"
+        # 刷新完成后释放分布式锁
+        assert manager.lock_key not in redis.store
+
+    @pytest.mark.asyncio
+    async def test_uses_token_shared_by_other_pod(self, redis):
+        """测试其它节点写入 Redis 的 token 被直接复用，不请求微信"""
+        await redis.set(
+            "kido:wechat:access_token:appid",
+            json.dumps({"access_token": "shared", "expires_at": time.time() + 3600}),
+        )
+        api = _api_client()
+        manager = WechatTokenManager("appid", "secret", api_client=api)
+
+        assert await manager.get_token() == "shared"
+        # 第二次直接命中进程内副本
+        redis.calls.clear()
+        assert await manager.get_token() == "shared"
+        assert redis.calls == []
+        api.get_stable_token.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_waits_for_peer_holding_lock(self, redis, monkeypatch):
+        """测试分布式锁被其它节点持有时等待对方刷新结果"""
+        monkeypatch.setattr(wechat_token, "LOCK_WAIT_INTERVAL", 0.01)
+        api = _api_client()
+        manager = WechatTokenManager("appid", "secret", api_client=api)
+        await redis.set(manager.lock_key, "peer", px=10000)
+
+        async def peer_refresh():
+            await asyncio.sleep(0.05)
+            await redis.set(
+                manager.token_key,
+                json.dumps({"access_token": "from-peer", "expires_at": time.time() + 7200}),
+            )
+
+        token, _ = await asyncio.gather(manager.get_token(), peer_refresh())
+
+        assert token == "from-peer"
+        api.get_stable_token.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_background_refresh_before_expiry(self, redis):
+        """测试后台任务在过期前主动刷新，请求路径直接命中内存"""
+        api = _api_client()
+        manager = WechatTokenManager("appid", "secret", api_client=api)
+        manager.start()
+        try:
+            await asyncio.sleep(0.05)
+            assert manager._is_valid()
+            assert await manager.get_token() == "token-1"
+            assert api.get_stable_token.await_count == 1
+        finally:
+            await manager.stop()
+        assert manager._task is None
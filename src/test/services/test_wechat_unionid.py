@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_unionid.py
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import mysql
+import services.wechat_unionid as wechat_unionid
+from repositories.wechat_service_user import WechatServiceUserRepository
+from services.wechat_unionid import BACKOFF_KEY, LOCK_KEY, PENDING_KEY, ServiceUnionidResolver
+from test.fake_redis import patch_redis
+
+
+def make_resolver(monkeypatch, rows, batch_size=2, scan_limit=10):
+    repo = MagicMock()
+    repo.get_openids_missing_unionid = AsyncMock(
+        side_effect=lambda after_id, limit: [r for r in rows if r[0] > after_id][:limit]
+    )
+    repo.bulk_update_unionids = AsyncMock(side_effect=lambda unionids: len(unionids))
+    monkeypatch.setattr(wechat_unionid, "WechatServiceUserRepository", lambda db: repo)
+    redis = patch_redis(monkeypatch, wechat_unionid)
+
+    async def batch_get_user_info(access_token, openids):
+        return {"user_info_list": [
+            {"openid": openid, "subscribe": 1, "unionid": f"u-{openid}"} if openid != "gone" else {"openid": openid, "subscribe": 0}
+            for openid in openids
+        ]}
+
+    @asynccontextmanager
+    async def session_factory():
+        yield MagicMock()
+
+    resolver = ServiceUnionidResolver(
+        session_factory=session_factory,
+        api_client=MagicMock(batch_get_user_info=AsyncMock(side_effect=batch_get_user_info)),
+        token_provider=AsyncMock(return_value="token"),
+        config=SimpleNamespace(
+            SCAN_LIMIT=scan_limit, BATCH_SIZE=batch_size, INTERVAL=300, FLUSH_DELAY=0,
+            LOCK_TTL=120, BACKOFF_BASE=600, BACKOFF_MAX=86400,
+        ),
+    )
+    resolver.redis = redis
+    return resolver, repo
+
+
+class TestServiceUnionidResolver:
+    """服务号 unionid 批量回填单元测试"""
+
+    @pytest.mark.asyncio
+    async def test_batches_and_single_bulk_update(self, monkeypatch):
+        """测试按批调用 batchget，并一次性批量回填"""
+        rows = [(1, "a"), (2, "gone"), (3, "b"), (4, "c"), (5, "d")]
+        resolver, repo = make_resolver(monkeypatch, rows)
+
+        assert await resolver.resolve_once() == 4
+
+        assert [c.args[1] for c in resolver.api.batch_get_user_info.await_args_list] == [["a", "gone"], ["b", "c"], ["d"]]
+        repo.bulk_update_unionids.assert_awaited_once_with({"a": "u-a", "b": "u-b", "c": "u-c", "d": "u-d"})
+
+    @pytest.mark.asyncio
+    async def test_cursor_skips_unresolvable_rows(self, monkeypatch):
+        """测试游标分页，无法解析的用户不会挡住后面的用户，扫描到末尾后从头开始"""
+        rows = [(1, "gone"), (2, "gone"), (3, "a")]
+        resolver, repo = make_resolver(monkeypatch, rows, scan_limit=2)
+
+        assert await resolver.resolve_once() == 0
+        assert await resolver.resolve_once() == 1
+        await resolver.resolve_once()
+
+        assert [c.kwargs["after_id"] for c in repo.get_openids_missing_unionid.await_args_list] == [0, 2, 0]
+
+    @pytest.mark.asyncio
+    async def test_skipped_while_other_pod_holds_lock(self, monkeypatch):
+        """测试其它 pod 持有解析锁时本轮跳过，不调用 batchget"""
+        resolver, repo = make_resolver(monkeypatch, [(1, "a")])
+        await resolver.redis.set(LOCK_KEY, "other", nx=True, ex=120)
+
+        assert await resolver.resolve_once() is None
+        resolver.api.batch_get_user_info.assert_not_awaited()
+        repo.get_openids_missing_unionid.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_unresolvable_openids_backed_off(self, monkeypatch):
+        """测试解析不到 unionid 的 openid 进入退避，下一轮扫描到也不再调用 batchget"""
+        rows = [(1, "gone"), (2, "a")]
+        resolver, _ = make_resolver(monkeypatch, rows)
+
+        assert await resolver.resolve_once() == 1
+        rows.remove((2, "a"))
+        assert await resolver.resolve_once() == 0
+
+        assert resolver.api.batch_get_user_info.await_count == 1
+        attempts, _ = resolver.redis.store[BACKOFF_KEY][b"gone"].decode().split(":")
+        assert attempts == "1"
+        assert b"a" not in resolver.redis.store[BACKOFF_KEY]
+
+    @pytest.mark.asyncio
+    async def test_new_followers_resolved_before_backfill(self, monkeypatch):
+        """测试新关注的 openid 优先解析，存量记录只用剩余额度"""
+        rows = [(i, f"old{i}") for i in range(1, 6)]
+        resolver, _ = make_resolver(monkeypatch, rows, batch_size=10, scan_limit=3)
+
+        await resolver.enqueue("new")
+        assert await resolver.resolve_once() == 3
+
+        assert resolver.api.batch_get_user_info.await_args.args[1] == ["new", "old1", "old2"]
+        assert resolver.redis.store[PENDING_KEY] == {}
+        # 游标停在本轮最后处理的记录，下一轮从 old3 继续
+        await resolver.resolve_once()
+        assert resolver.api.batch_get_user_info.await_args.args[1] == ["old3", "old4", "old5"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_update_is_single_case_statement(self):
+        """测试批量回填生成单条 UPDATE ... CASE 语句"""
+        session = MagicMock()
+        session.execute = AsyncMock(return_value=MagicMock(rowcount=2))
+        session.begin = MagicMock(return_value=MagicMock(__aenter__=AsyncMock(), __aexit__=AsyncMock(return_value=False)))
+        repo = WechatServiceUserRepository(session)
+        assert await repo.bulk_update_unionids({"a": "u1", "b": "u2"}) == 2
+
+        session.execute.assert_awaited_once()
+        sql = str(session.execute.await_args.args[0].compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+        assert "CASE wechat_service_users.service_openid WHEN 'a' THEN 'u1' WHEN 'b' THEN 'u2' END" in sql
+        assert "unionid IS NULL" in sql
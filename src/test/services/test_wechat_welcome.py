@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_wechat_welcome.py
+
+import json
+from unittest.mock import patch
+
+import pytest
+from services.wechat_welcome import WelcomeMessageRenderer, parse_device_scene
+
+
+class TestWelcomeMessageRenderer:
+    """关注欢迎语渲染器单元测试"""
+
+    def test_body_is_valid_custom_message(self):
+        """测试请求体为合法 JSON，设备信息只出现在“进入小程序”链接中"""
+        renderer = WelcomeMessageRenderer(appid="wx-mini")
+        body = renderer.body('o-"openid', {"deviceType": "FULL_DUPLEX", "version": "v2"})
+
+        message = json.loads(body)
+        assert message["touser"] == 'o-"openid'
+        assert message["msgtype"] == "text"
+        content = message["text"]["content"]
+        assert content.startswith("👋 亲爱的家长，欢迎使用可豆陪陪！")
+        assert content.count("data-miniprogram-appid=wx-mini") == 5
+        assert content.count("deviceType=FULL_DUPLEX&version=v2") == 1
+        assert "可豆陪陪".encode("utf-8") in body
+
+    def test_compiles_once_per_variant(self):
+        """测试每个设备型号只编译一次，不同型号互不影响"""
+        renderer = WelcomeMessageRenderer(appid="wx-mini")
+        with patch.object(renderer, "render_content", wraps=renderer.render_content) as render:
+            renderer.precompile([None, ("FULL_DUPLEX", "v1")])
+            for openid in ("a", "b", "c"):
+                renderer.body(openid)
+                renderer.body(openid, {"deviceType": "FULL_DUPLEX", "version": "v1"})
+            plain = json.loads(renderer.body("d"))["text"]["content"]
+
+        assert render.call_count == 2
+        assert "deviceType=" not in plain
+
+    @pytest.mark.parametrize("scene, expected", [
+        ("FULL_DUPLEX_v1", {"deviceType": "FULL_DUPLEX", "version": "v1"}),
+        ("HALF_DUPLEX_v2_beta", {"deviceType": "HALF_DUPLEX", "version": "v2_beta"}),
+        ("HALF_DUPLEX_", {"deviceType": "HALF_DUPLEX", "version": "v1"}),
+        ("promo_2024", None),
+    ])
+    def test_parse_device_scene(self, scene, expected):
+        """测试二维码 scene 参数解析为设备信息"""
+        assert parse_device_scene(scene) == expected
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_weixin_async_io.py
+
+import ast
+import inspect
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import services.wechat_api as wechat_api_module
+import services.weixin as weixin_module
+from services.wechat_api import WechatApiClient
+from services.weixin import WechatService
+
+# 会阻塞事件循环的同步 HTTP 库
+BLOCKING_HTTP_MODULES = {"requests", "urllib.request", "urllib3", "http.client", "pycurl"}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    async def json(self, content_type="application/json"):
+        return self._data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeSession:
+    """记录请求的 aiohttp 会话替身"""
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else {"errcode": 0}
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(("GET", url, kwargs))
+        return FakeResponse(self.data)
+
+    def post(self, url, **kwargs):
+        self.calls.append(("POST", url, kwargs))
+        return FakeResponse(self.data)
+
+
+def _imported_modules(module) -> set:
+    tree = ast.parse(Path(inspect.getfile(module)).read_text(encoding="utf-8"))
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.add(node.module)
+    return names
+
+
+class TestWechatAsyncIO:
+    """微信调用链不得使用阻塞式 HTTP 库的回归测试"""
+
+    @pytest.mark.parametrize("module", [weixin_module, wechat_api_module])
+    def test_no_blocking_http_imports(self, module):
+        """测试微信服务模块不导入阻塞式 HTTP 库"""
+        imported = _imported_modules(module)
+        assert not imported & BLOCKING_HTTP_MODULES
+
+    @pytest.fixture
+    def service(self):
+        session = FakeSession()
+        svc = WechatService(MagicMock(), http_session=session)
+        svc.wechat_repo = AsyncMock()
+        return svc, session
+
+    @pytest.mark.asyncio
+    async def test_follow_flow_uses_async_client(self, service):
+        """测试关注流程中的外部调用全部走异步会话"""
+        svc, session = service
+        with patch("requests.sessions.Session.request") as blocking_request, \
+                patch.object(WechatService, "get_access_token", AsyncMock(return_value="token")), \
+                patch.object(WechatService, "_check_duplicate_message", AsyncMock(return_value=False)):
+            await svc.try_get_service_user_unionid("openid-1")
+            await svc.send_welcome_message("openid-1")
+            await svc.send_auto_reply_message("openid-1")
+            await svc.send_template_message("openid-1", "tpl", {"k": {"value": "v"}})
+
+        blocking_request.assert_not_called()
+        paths = [url for _, url, _ in session.calls]
+        assert paths == [
+            "https://api.weixin.qq.com/cgi-bin/user/info",
+            "https://api.weixin.qq.com/cgi-bin/message/custom/send",
+            "https://api.weixin.qq.com/cgi-bin/message/custom/send",
+            "https://api.weixin.qq.com/cgi-bin/message/template/send",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_post_sends_utf8_json_with_token(self):
+        """测试 POST 请求以 UTF-8 JSON 发送且携带 access_token"""
+        session = FakeSession()
+        client = WechatApiClient(session)
+        await client.send_custom_message("token", {"text": {"content": "你好"}})
+
+        method, _, kwargs = session.calls[0]
+        assert method == "POST"
+        assert kwargs["params"] == {"access_token": "token"}
+        assert "你好".encode("utf-8") in kwargs["data"]